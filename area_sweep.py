@@ -0,0 +1,121 @@
+import numpy as np
+import pandas as pd
+
+from kinematics import DEFAULT_RAPID_SPEED, move_times
+from line_geometry import area_scale_offset, lines_to_array
+
+# "What-if" sweep of candidate working areas for the Line Scaling tool.
+# Every scaling mode is a per-axis scale plus offset, so each candidate only needs the
+# per-line extents and the x/y components of every cut and idle move. Those are
+# broadcast against blocks of candidates at once, so no (M, N, 2, 2) stack of scaled
+# lines is ever materialised.
+
+DEFAULT_SWEEP_BLOCK = 256  # Candidates per broadcast block; bounds memory at ~block x N floats
+
+
+def candidate_areas(widths, heights):
+    """
+    Returns the (M, 2) grid of every (width, height) combination.
+    """
+    w, h = np.meshgrid(np.asarray(widths, dtype=np.float64), np.asarray(heights, dtype=np.float64), indexing="ij")
+    return np.column_stack([w.ravel(), h.ravel()])
+
+
+def sweep_working_areas(arr, old_area, areas, speed, mode="stretch", margin=(0.0, 0.0),
+                        preserve="none", rapid_speed=DEFAULT_RAPID_SPEED, acceleration=None, block_size=DEFAULT_SWEEP_BLOCK):
+    """
+    Scores every candidate working area for a toolpath and ranks them.
+
+    For each candidate the lines are scaled with the given mode, then the number of lines
+    leaving the candidate area and the estimated cycle time (cutting plus idle travel, as in
+    kinematics.toolpath_metrics) are computed.
+
+    Args:
+        arr: Lines of shape (N, 2, 2) or in the tuple format, in old_area coordinates.
+        old_area (tuple): (width, height) of the original working area.
+        areas: (M, 2) candidate (width, height) pairs, e.g. from candidate_areas().
+        speed: Cutting speed per line (mm/s), shape (N,).
+        mode, margin: Scaling mode and margin, see line_geometry.area_scale_offset.
+        preserve (str): "none" keeps speeds; "time"/"spacing" scale speed with line length
+            (see kinematics.rescale_process_parameters).
+        rapid_speed (float): Idle move speed (mm/s).
+        acceleration (float): Optional acceleration limit (mm/s^2).
+        block_size (int): Candidates evaluated per broadcast block.
+
+    Returns:
+        pd.DataFrame: One row per candidate, best first: fewest out-of-bounds lines, then
+        shortest cycle time, then largest area.
+    """
+    arr = lines_to_array(arr)
+    areas = np.asarray(areas, dtype=np.float64).reshape(-1, 2)
+    speed = np.broadcast_to(np.asarray(speed, dtype=np.float64), (len(arr),))
+    factors, offsets = area_scale_offset(old_area, areas, mode=mode, margin=margin)
+
+    # Per-line extents and squared per-move components, computed once
+    lo = arr.min(axis=1)  # (N, 2) lower x/y of each line
+    hi = arr.max(axis=1)
+    cut_sq = (arr[:, 1] - arr[:, 0]) ** 2  # (N, 2)
+    gap_sq = (arr[1:, 0] - arr[:-1, 1]) ** 2  # (N - 1, 2)
+    original_lengths = np.sqrt(cut_sq.sum(axis=1))
+    simple_timing = preserve == "none" and not acceleration
+    if simple_timing:
+        with np.errstate(divide='ignore'):
+            inverse_speed = np.where(speed > 0, 1.0 / speed, 0.0)
+
+    m = len(areas)
+    oob_lines = np.zeros(m, dtype=np.int64)
+    cutting_time = np.zeros(m)
+    idle_time = np.zeros(m)
+    path_length = np.zeros(m)
+    for start in range(0, m, block_size):
+        sl = slice(start, start + block_size)
+        f = factors[sl]  # (B, 2)
+        o = offsets[sl]
+        a = areas[sl]
+
+        if np.all(f > 0):
+            # Line i leaves candidate b if lo < -o / f or hi > (a - o) / f on either axis
+            lower = -o / f
+            upper = (a - o) / f
+            out = (lo[:, None, 0] < lower[:, 0]) | (hi[:, None, 0] > upper[:, 0])
+            out |= (lo[:, None, 1] < lower[:, 1]) | (hi[:, None, 1] > upper[:, 1])
+        else:
+            low = np.minimum(lo[:, None] * f, hi[:, None] * f) + o  # (N, B, 2)
+            high = np.maximum(lo[:, None] * f, hi[:, None] * f) + o
+            out = ((low < 0) | (high > a)).any(axis=2)
+        oob_lines[sl] = out.sum(axis=0)
+
+        f_sq = (f ** 2).T  # (2, B)
+        lengths = np.sqrt(cut_sq @ f_sq)  # (N, B) via one matrix product
+        path_length[sl] = lengths.sum(axis=0)
+        if simple_timing:
+            cutting_time[sl] = inverse_speed @ lengths
+        else:
+            if preserve == "none":
+                line_speed = speed[:, None]
+            else:
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    line_speed = speed[:, None] * np.where(original_lengths[:, None] > 0, lengths / original_lengths[:, None], 1.0)
+            cutting_time[sl] = np.nansum(move_times(lengths, line_speed, acceleration), axis=0)
+        if len(gap_sq):
+            idle = np.sqrt(gap_sq @ f_sq)
+            if acceleration:
+                idle_time[sl] = move_times(idle, rapid_speed, acceleration).sum(axis=0)
+            else:
+                idle_time[sl] = idle.sum(axis=0) / rapid_speed
+
+    results = pd.DataFrame({
+        "Width (mm)": areas[:, 0],
+        "Height (mm)": areas[:, 1],
+        "Scale X": factors[:, 0],
+        "Scale Y": factors[:, 1],
+        "Out-of-bounds lines": oob_lines,
+        "Path length (mm)": path_length,
+        "Cutting time (s)": cutting_time,
+        "Idle time (s)": idle_time,
+        "Cycle time (s)": cutting_time + idle_time,
+    })
+    order = np.lexsort((-(areas[:, 0] * areas[:, 1]), results["Cycle time (s)"].to_numpy(), oob_lines))
+    results = results.iloc[order].reset_index(drop=True)
+    results.insert(0, "Rank", np.arange(1, m + 1))
+    return results
@@ -0,0 +1,38 @@
+"""
+Benchmark: sweep_working_areas over 10k candidate areas for a 10k-segment toolpath.
+
+Run from the repository root:
+    python benchmarks/bench_area_sweep.py
+"""
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from area_sweep import candidate_areas, sweep_working_areas  # noqa: E402
+
+SEGMENTS = 10_000
+GRID = 100  # GRID x GRID candidate areas
+
+
+def main():
+    rng = np.random.default_rng(0)
+    lines = rng.uniform((0, 0), (1300, 1100), size=(SEGMENTS, 2, 2))
+    speed = rng.uniform(50, 300, SEGMENTS)
+    areas = candidate_areas(np.linspace(300, 1500, GRID), np.linspace(300, 1300, GRID))
+
+    for label, kwargs in (("stretch", {}),
+                          ("uniform_center", {"mode": "uniform_center"}),
+                          ("stretch, preserve time, a=2000", {"preserve": "time", "acceleration": 2000.0})):
+        start = time.perf_counter()
+        results = sweep_working_areas(lines, (1300, 1100), areas, speed, **kwargs)
+        elapsed = time.perf_counter() - start
+        best = results.iloc[0]
+        print(f"{label:>32}: {len(areas):,} areas x {SEGMENTS:,} segments in {elapsed:.2f}s; "
+              f"best {best['Width (mm)']:.0f} x {best['Height (mm)']:.0f} mm, cycle {best['Cycle time (s)']:.0f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Benchmark: renaming 100k files in one folder, including swaps, one os.rename at a time
+as the File Management tab used to, and with bulk_rename (plan, execute, roll back).
+The target is 100k files per minute (about 1,667 files/s).
+
+Run from the repository root:
+    python benchmarks/bench_bulk_rename.py
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from bulk_rename import execute_renames, plan_renames, rollback_renames  # noqa: E402
+
+FILES = 100_000
+SWAPS = 1_000  # Pairs of files that trade names, so they go through temporary names
+TARGET_PER_SECOND = 100_000 / 60
+
+
+def make_files(folder):
+    names = [f"PD-SA000301A-01-04-JS-{i:06d}.tif" for i in range(FILES)]
+    for name in names:
+        open(os.path.join(folder, name), "w").close()
+    return names
+
+
+def renames_for(folder, names):
+    # The first SWAPS pairs swap names, the rest get a prefix
+    renames = []
+    for i in range(0, 2 * SWAPS, 2):
+        renames.append((os.path.join(folder, names[i]), names[i + 1]))
+        renames.append((os.path.join(folder, names[i + 1]), names[i]))
+    renames.extend((os.path.join(folder, name), f"Run1_{name}") for name in names[2 * SWAPS:])
+    return renames
+
+
+def report(label, files, elapsed):
+    rate = files / elapsed
+    print(f"{label:>18}: {elapsed:6.2f} s ({rate:,.0f} files/s, {rate / TARGET_PER_SECOND:.1f}x target)")
+
+
+def main():
+    with tempfile.TemporaryDirectory() as folder:
+        names = make_files(folder)
+        start = time.perf_counter()
+        for name in names[2 * SWAPS:]:  # Sequential renames cannot swap without clobbering
+            os.rename(os.path.join(folder, name), os.path.join(folder, f"Run1_{name}"))
+        report("per-file os.rename", FILES - 2 * SWAPS, time.perf_counter() - start)
+
+    with tempfile.TemporaryDirectory() as folder, tempfile.TemporaryDirectory() as journal_dir:
+        names = make_files(folder)
+        start = time.perf_counter()
+        plan = plan_renames(renames_for(folder, names))
+        report("plan_renames", len(plan.moves), time.perf_counter() - start)
+        print(f"{'':>18}  {len(plan.moves):,} moves, {plan.cycles:,} cycles, {len(plan.conflicts)} conflicts")
+
+        result = execute_renames(plan, journal_dir=journal_dir)
+        report("execute_renames", len(result.renamed), result.elapsed)
+        if result.errors:
+            print(f"{'':>18}  {len(result.errors)} errors, rolled back: {result.rolled_back}")
+
+        undo = rollback_renames(result.journal_path, journal_dir=journal_dir)
+        report("rollback_renames", len(undo.renamed), undo.elapsed)
+        restored = sum(os.path.exists(os.path.join(folder, name)) for name in names)
+        print(f"{'':>18}  {restored:,} of {FILES:,} original names restored")
+
+
+if __name__ == "__main__":
+    main()
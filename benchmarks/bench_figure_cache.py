@@ -0,0 +1,59 @@
+"""
+Benchmark: memory of repeated Line Scaling renders with and without FigureCache.
+
+Simulates hundreds of "Scale Lines and Visualize" reruns and reports process memory
+and the number of open Matplotlib figures. Run from the repository root:
+    python benchmarks/bench_figure_cache.py
+"""
+import os
+import sys
+import time
+
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt  # noqa: E402
+import numpy as np  # noqa: E402
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from line_geometry import scale_lines_array  # noqa: E402
+from line_rendering import FigureCache, draw_lines_collection, geometry_hash, process_memory_bytes  # noqa: E402
+
+RERUNS = 300
+AREAS = [(650, 550), (700, 600), (800, 650)]  # Operators flip between a few sizes
+
+
+def mb(value):
+    return f"{value / (1024 * 1024):.1f} MB" if value else "N/A"
+
+
+def main():
+    lines = np.random.default_rng(0).uniform(0, 1100, size=(2_000, 2, 2))
+
+    # Old behaviour: a fresh figure per rerun, never closed
+    start_mem = process_memory_bytes()
+    start = time.perf_counter()
+    leaked = []
+    for i in range(RERUNS // 10):  # Fewer reruns; the leak is obvious quickly
+        leaked.append(draw_lines_collection(scale_lines_array(lines, (1300, 1100), AREAS[i % 3]), AREAS[i % 3]))
+    print(f"uncached, unclosed x{RERUNS // 10}: {time.perf_counter() - start:.2f}s, "
+          f"open figures {len(plt.get_fignums())}, memory {mb(start_mem)} -> {mb(process_memory_bytes())}")
+    plt.close('all')
+    del leaked
+
+    cache = FigureCache(max_entries=8)
+    start_mem = process_memory_bytes()
+    start = time.perf_counter()
+    for i in range(RERUNS):
+        area = AREAS[i % 3]
+        scaled = scale_lines_array(lines, (1300, 1100), area)
+        key = geometry_hash(scaled, area, None, "Scaled Lines")
+        cache.get_or_render(key, lambda: draw_lines_collection(scaled, area))
+        if i in (0, RERUNS // 2, RERUNS - 1):
+            stats = cache.stats()
+            print(f"cached rerun {i + 1:>4}: entries {stats['entries']}, hits {stats['hits']}, "
+                  f"open figures {stats['open_figures']}, memory {mb(stats['process_memory_bytes'])}")
+    print(f"cached x{RERUNS}: {time.perf_counter() - start:.2f}s, memory {mb(start_mem)} -> {mb(process_memory_bytes())}")
+
+
+if __name__ == "__main__":
+    main()
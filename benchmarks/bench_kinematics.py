@@ -0,0 +1,35 @@
+"""
+Benchmark: toolpath_metrics over 1e6 segments, with and without acceleration limits.
+
+Run from the repository root:
+    python benchmarks/bench_kinematics.py
+"""
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from kinematics import toolpath_metrics  # noqa: E402
+
+SEGMENTS = 1_000_000
+
+
+def main():
+    rng = np.random.default_rng(0)
+    lines = rng.uniform(0, 1300, size=(SEGMENTS, 2, 2))
+    speed = rng.uniform(50, 300, SEGMENTS)
+    t_cycle = np.full(SEGMENTS, 5.0)
+    t_pulse = np.full(SEGMENTS, 2.0)
+
+    for label, acceleration in (("constant speed", None), ("trapezoidal a=2000", 2000.0)):
+        start = time.perf_counter()
+        metrics = toolpath_metrics(lines, speed, t_cycle, t_pulse, acceleration=acceleration)
+        elapsed = time.perf_counter() - start
+        print(f"{label:>20}: {elapsed * 1e3:.0f} ms for {SEGMENTS:,} segments, "
+              f"cycle time {metrics['cycle_time_s'] / 3600:.1f} h, {metrics['pulse_count']:,} pulses")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Benchmark: status updates per second through machine_store.MachineStore (SQLite in WAL
+mode), one transaction per update and batched with update_many, plus how long a
+MachineStateHub in the same process takes to see a write made on another connection.
+
+Run from the repository root:
+    python benchmarks/bench_machine_store.py
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from machine_state import MachineStateHub  # noqa: E402
+from machine_store import DEFAULT_MACHINES, MachineStore  # noqa: E402
+
+UPDATES = 20000
+BATCH = 100
+STATUSES = ("Running", "Idle", "Maintenance")
+
+
+def bench_single(store):
+    start = time.perf_counter()
+    for i in range(UPDATES):
+        store.update_machine(i % len(DEFAULT_MACHINES) + 1, uptime=f"{i}s")
+    return UPDATES / (time.perf_counter() - start)
+
+
+def bench_batched(store):
+    start = time.perf_counter()
+    for first in range(0, UPDATES, BATCH):
+        store.update_many([(i % len(DEFAULT_MACHINES) + 1, {"uptime": f"{i}b"}) for i in range(first, first + BATCH)])
+    return UPDATES / (time.perf_counter() - start)
+
+
+def bench_propagation(path, rounds=20):
+    hub = MachineStateHub(MachineStore(path))
+    writer = MachineStore(path)
+    delays = []
+    for i in range(rounds):
+        since = hub.version
+        start = time.perf_counter()
+        writer.update_machine(1, status=STATUSES[i % len(STATUSES)], uptime=f"p{i}")
+        hub.wait_for_update(since, timeout=5)
+        delays.append(time.perf_counter() - start)
+    hub.close()
+    writer.close()
+    delays.sort()
+    return delays[len(delays) // 2], delays[-1]
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "machine_state.sqlite")
+        store = MachineStore(path)
+        print(f"{UPDATES} status updates on {len(DEFAULT_MACHINES)} machines")
+        print(f"  one transaction per update: {bench_single(store):10.0f} updates/s")
+        print(f"  update_many, {BATCH} per batch: {bench_batched(store):10.0f} updates/s")
+        median, worst = bench_propagation(path)
+        print(f"Write on another connection -> hub: median {median * 1000:.0f} ms, max {worst * 1000:.0f} ms")
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+"""
+Benchmark: idle travel saved by optimize_segment_order on synthetic toolpaths.
+
+Run from the repository root:
+    python benchmarks/bench_path_order.py
+"""
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from path_order import optimize_segment_order  # noqa: E402
+
+SIZES = [1_000, 10_000, 100_000]
+TIME_BUDGET = 10.0
+
+
+def main():
+    rng = np.random.default_rng(0)
+    print(f"{'segments':>10} {'flip':>5} {'original':>14} {'optimized':>14} {'saved':>7} {'2-opt':>7} {'time':>7}")
+    for n in SIZES:
+        # Short hatch-like segments scattered over a 1300 x 1100 working area, in random order
+        starts = rng.uniform((0, 0), (1300, 1100), size=(n, 2))
+        lines = np.stack([starts, starts + rng.normal(0, 5, size=(n, 2))], axis=1)
+        for allow_flip in (True, False):
+            result = optimize_segment_order(lines, allow_flip=allow_flip, time_budget=TIME_BUDGET)
+            saved = 1 - result.optimized_travel / result.original_travel
+            print(f"{n:>10} {str(allow_flip):>5} {result.original_travel:>12,.0f}mm {result.optimized_travel:>12,.0f}mm "
+                  f"{saved:>6.1%} {result.two_opt_moves:>7} {result.elapsed:>6.2f}s")
+
+
+if __name__ == "__main__":
+    main()
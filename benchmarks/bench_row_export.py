@@ -0,0 +1,49 @@
+"""
+Benchmark: exporting 20k spreadsheet rows to one CSV file each, row by row as the
+Excel Row Exporter used to, and with row_export.export_rows.
+
+Run from the repository root:
+    python benchmarks/bench_row_export.py
+"""
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from row_export import export_rows  # noqa: E402
+
+ROWS = 20_000
+
+
+def per_row_export(df, output_folder):
+    # One DataFrame and one to_csv call per row
+    for index in range(len(df)):
+        row = df.iloc[index]
+        pd.DataFrame([row.values], columns=df.columns).to_csv(os.path.join(output_folder, f"{row.iloc[0]}.csv"), index=False)
+
+
+def main():
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({"Sample Name": [f"PD-SA000301A-01-04-JS-{i}" for i in range(ROWS)]})
+    for col in range(20):
+        df[f"Param {col}"] = rng.uniform(0, 100, ROWS)
+    df["Comments"] = "ok"
+
+    with tempfile.TemporaryDirectory() as folder:
+        start = time.perf_counter()
+        per_row_export(df, folder)
+        elapsed = time.perf_counter() - start
+        print(f"{'per-row to_csv':>16}: {elapsed:6.2f} s ({ROWS / elapsed:,.0f} rows/s)")
+
+    for fmt in ("csv", "zip", "tar"):
+        with tempfile.TemporaryDirectory() as folder:
+            result = export_rows(df, folder, 1, ROWS, fmt=fmt)
+            print(f"{'export_rows ' + fmt:>16}: {result.elapsed:6.2f} s ({result.rows_per_second:,.0f} rows/s)")
+
+
+if __name__ == "__main__":
+    main()
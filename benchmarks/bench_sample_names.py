@@ -0,0 +1,44 @@
+"""
+Benchmark: minting sample names in bulk across many combinations, with and without a
+uniqueness check against existing names.
+
+Run from the repository root:
+    python benchmarks/bench_sample_names.py
+"""
+import itertools
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from sample_names import (FAB_MATERIALS_MAPPING, FAB_RESIN_MAPPING, FAB_RESIST_MAPPING,  # noqa: E402
+                          SampleNameRegistry, generate_sample_name_batch)
+
+SAMPLES_PER_COMBINATION = 100
+
+
+def main():
+    combinations = [
+        {"material": material, "master_id": master_id, "salinisation": "A", "anti_sticking": "OP-F17G163",
+         "resin": resin, "resist": resist, "initials": "JS", "num_samples": SAMPLES_PER_COMBINATION}
+        for material, master_id, resin, resist in itertools.product(
+            FAB_MATERIALS_MAPPING, range(20), FAB_RESIN_MAPPING, FAB_RESIST_MAPPING)
+    ]
+
+    start = time.perf_counter()
+    names = generate_sample_name_batch(combinations)
+    elapsed = time.perf_counter() - start
+    print(f"{'fresh batch':>22}: {len(names):,} names in {elapsed * 1e3:.0f} ms "
+          f"({len(names) / elapsed:,.0f} names/s)")
+
+    # Second night: every combination already has its first half of names issued
+    registry = SampleNameRegistry(names[i] for i in range(len(names)) if i % SAMPLES_PER_COMBINATION < 50)
+    start = time.perf_counter()
+    new_names = registry.mint_batch(combinations)
+    elapsed = time.perf_counter() - start
+    print(f"{'batch vs existing set':>22}: {len(new_names):,} names in {elapsed * 1e3:.0f} ms "
+          f"({len(new_names) / elapsed:,.0f} names/s), {len(registry):,} names registered")
+
+
+if __name__ == "__main__":
+    main()
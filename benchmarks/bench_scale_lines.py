@@ -0,0 +1,59 @@
+"""
+Benchmark: list-comprehension scale_lines vs the NumPy line_geometry core.
+
+Run from the repository root:
+    python benchmarks/bench_scale_lines.py
+"""
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from line_geometry import lines_to_array, array_to_lines, scale_lines_array  # noqa: E402
+
+OLD_AREA = (1300, 1100)
+NEW_AREA = (650, 550)
+SIZES = [1_000, 100_000, 1_000_000]
+
+
+def scale_lines_listcomp(lines, old_area, new_area):
+    # The original list-comprehension implementation from streamlit_app.py
+    scale_x = new_area[0] / old_area[0]
+    scale_y = new_area[1] / old_area[1]
+    return [
+        ((x1 * scale_x, y1 * scale_y), (x2 * scale_x, y2 * scale_y))
+        for ((x1, y1), (x2, y2)) in lines
+    ]
+
+
+def best_of(fn, repeats=3):
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    rng = np.random.default_rng(0)
+    print(f"{'segments':>10} {'list-comp':>12} {'tuples->np->tuples':>20} {'array only':>12} {'speed-up':>10}")
+    for n in SIZES:
+        arr = rng.uniform(0, 1300, size=(n, 2, 2))
+        lines = array_to_lines(arr)
+
+        t_list = best_of(lambda: scale_lines_listcomp(lines, OLD_AREA, NEW_AREA))
+        t_edges = best_of(lambda: array_to_lines(scale_lines_array(lines_to_array(lines), OLD_AREA, NEW_AREA)))
+        t_array = best_of(lambda: scale_lines_array(arr, OLD_AREA, NEW_AREA))
+
+        # Both paths must agree
+        assert np.allclose(lines_to_array(scale_lines_listcomp(lines[:100], OLD_AREA, NEW_AREA)),
+                           scale_lines_array(arr[:100], OLD_AREA, NEW_AREA))
+
+        print(f"{n:>10} {t_list * 1e3:>10.2f}ms {t_edges * 1e3:>18.2f}ms {t_array * 1e3:>10.2f}ms {t_list / t_array:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+"""
+Load test: requests per second and latency percentiles for GET /api/machine-status on
+server.py at 1, 50 and 500 concurrent keep-alive clients, in threaded and single mode.
+
+Each mode runs server.py in a subprocess on a free port, so the clients do not share the
+server's interpreter. Point it at a running server with --url instead. With --conditional
+the clients revalidate with If-None-Match, as a browser polling an unchanged floor does,
+and 304 Not Modified counts as a successful request.
+
+Before the load runs, each server is checked for request smuggling: a POST to an unknown
+path and a request with an unsupported method, each carrying a body that is itself a
+request, must get exactly one response and a closed connection.
+
+Run from the repository root:
+    python benchmarks/bench_server_load.py
+    python benchmarks/bench_server_load.py --clients 1 50 500 --duration 10 --modes threaded
+    python benchmarks/bench_server_load.py --url http://tablet-gateway:8080
+    python benchmarks/bench_server_load.py --modes threaded --conditional
+"""
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+from urllib.parse import urlparse
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PATH = "/api/machine-status"
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_for_server(host, port, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection((host, port), timeout=0.5):
+                return True
+        except OSError:
+            time.sleep(0.05)
+    return False
+
+
+async def read_response(reader):
+    # Returns (status, keep_alive, etag) after reading one response with its Content-Length body
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError("connection closed")
+    status = int(status_line.split()[1])
+    length = 0
+    keep_alive = status_line.startswith(b"HTTP/1.1")
+    etag = None
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.partition(b":")
+        name = name.strip().lower()
+        if name == b"content-length":
+            length = int(value)
+        elif name == b"etag":
+            etag = value.strip().decode()
+        elif name == b"connection":
+            keep_alive = value.strip().lower() == b"keep-alive" or (keep_alive and value.strip().lower() != b"close")
+    if length:
+        await reader.readexactly(length)
+    return status, keep_alive, etag
+
+
+async def client_loop(host, port, deadline, latencies, errors, conditional=False):
+    # One keep-alive connection per client, reopened whenever the server closes it
+    request = f"GET {PATH} HTTP/1.1\r\nHost: {host}\r\nConnection: keep-alive\r\n\r\n".encode()
+    writer = None
+    etag = None
+    while time.monotonic() < deadline:
+        started = time.perf_counter()
+        try:
+            if writer is None:
+                reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), 10)
+            if conditional and etag:
+                writer.write(request[:-2] + f"If-None-Match: {etag}\r\n\r\n".encode())
+            else:
+                writer.write(request)
+            status, keep_alive, response_etag = await asyncio.wait_for(read_response(reader), 10)
+            etag = response_etag or etag
+            if status in (200, 304):
+                latencies.append(time.perf_counter() - started)
+            else:
+                errors.append(status)
+        except (OSError, ValueError, asyncio.TimeoutError, asyncio.IncompleteReadError) as e:
+            errors.append(type(e).__name__)
+            keep_alive = False
+            await asyncio.sleep(0.01)
+        if not keep_alive and writer is not None:
+            writer.close()
+            writer = None
+    if writer is not None:
+        writer.close()
+
+
+def check_unread_body(host, port, timeout=5.0):
+    # Returns the requests whose unread body was answered as a second request, or kept open
+    hidden = f"GET {PATH} HTTP/1.1\r\nHost: {host}\r\n\r\n".encode()
+    failures = []
+    for method, path in (("POST", "/nope"), ("PUT", "/api/control")):
+        request = (f"{method} {path} HTTP/1.1\r\nHost: {host}\r\nConnection: keep-alive\r\n"
+                   f"Content-Length: {len(hidden)}\r\n\r\n").encode() + hidden
+        received = b""
+        closed = True
+        with socket.create_connection((host, port), timeout=timeout) as s:
+            s.sendall(request)
+            try:
+                while True:
+                    chunk = s.recv(65536)
+                    if not chunk:
+                        break
+                    received += chunk
+            except socket.timeout:
+                closed = False
+        responses = received.count(b"HTTP/1.")
+        if responses != 1 or not closed:
+            failures.append(f"{method} {path}: {responses} responses, connection {'closed' if closed else 'left open'}")
+    return failures
+
+
+def report_unread_body(label, host, port):
+    failures = check_unread_body(host, port)
+    print(f"{label:>10} unread request body: {'FAILED - ' + '; '.join(failures) if failures else 'ok'}")
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return float("nan")
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+def run_load(host, port, clients, duration, conditional=False):
+    # All clients run as coroutines on one event loop, so 500 clients do not mean 500
+    # client threads fighting over the GIL and inflating the measured latency
+    latencies = []
+    errors = []
+
+    async def run():
+        deadline = time.monotonic() + duration
+        await asyncio.gather(*(client_loop(host, port, deadline, latencies, errors, conditional) for _ in range(clients)))
+
+    started = time.perf_counter()
+    asyncio.run(run())
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return len(latencies) / elapsed, percentile(latencies, 0.5), percentile(latencies, 0.99), len(errors)
+
+
+def report(label, clients, result):
+    rps, p50, p99, errors = result
+    print(f"{label:>10} {clients:>7} {rps:>10,.0f} {p50 * 1000:>9.1f} {p99 * 1000:>9.1f} {errors:>7}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 50, 500])
+    parser.add_argument("--duration", type=float, default=5.0, help="Seconds per measurement")
+    parser.add_argument("--modes", nargs="+", default=["threaded", "single"], choices=["threaded", "single"])
+    parser.add_argument("--url", help="Test a running server instead of starting one")
+    parser.add_argument("--conditional", action="store_true", help="Revalidate with If-None-Match (304 responses)")
+    args = parser.parse_args()
+
+    print(f"{'mode':>10} {'clients':>7} {'req/s':>10} {'p50 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    if args.url:
+        parsed = urlparse(args.url)
+        report_unread_body("external", parsed.hostname, parsed.port or 80)
+        for clients in args.clients:
+            report("external", clients, run_load(parsed.hostname, parsed.port or 80, clients, args.duration, args.conditional))
+        return
+
+    for mode in args.modes:
+        port = free_port()
+        server = subprocess.Popen([sys.executable, os.path.join(REPO_ROOT, "server.py"), str(port), "--mode", mode, "--quiet"],
+                                  cwd=REPO_ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            if not wait_for_server("127.0.0.1", port):
+                print(f"{mode:>10}: server did not start")
+                continue
+            report_unread_body(mode, "127.0.0.1", port)
+            for clients in args.clients:
+                report(mode, clients, run_load("127.0.0.1", port, clients, args.duration, args.conditional))
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    main()
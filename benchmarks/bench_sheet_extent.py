@@ -0,0 +1,71 @@
+"""
+Benchmark: finding the last data row of 100k-row sheets with the old bottom-up
+ws.cell() scan and with excel_batch.last_data_row, plus cached appends.
+
+Run from the repository root:
+    python benchmarks/bench_sheet_extent.py
+"""
+import os
+import sys
+import time
+
+import openpyxl
+from openpyxl.styles import PatternFill
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from excel_batch import SheetExtentIndex, last_data_row  # noqa: E402
+
+ROWS = 100_000
+COLUMNS = 30
+TRAILING_BLANK_ROWS = 200  # The cell scan recomputes max_column for every row, so keep this small
+
+
+def cell_scan_last_row(ws):
+    # The per-cell scan previously used by append_sample_data_to_excel_fab
+    for row_num in range(ws.max_row, 0, -1):
+        for col_num in range(1, ws.max_column + 1):
+            cell_value = ws.cell(row=row_num, column=col_num).value
+            if cell_value is not None and str(cell_value).strip():
+                return row_num
+    return 0
+
+
+def build_sheet(trailing_blank_rows):
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    for i in range(ROWS):
+        ws.append([f"PD-{i}"] + [i] * (COLUMNS - 1))
+    # Formatted but empty rows push max_row past the data, as in hand-edited logs
+    fill = PatternFill("solid", fgColor="FFFF00")
+    for row_num in range(ROWS + 1, ROWS + trailing_blank_rows + 1):
+        for col_num in range(1, COLUMNS + 1):
+            ws.cell(row=row_num, column=col_num).fill = fill
+    return ws
+
+
+def main():
+    for label, trailing in (("data to the end", 0), (f"{TRAILING_BLANK_ROWS:,} blank rows", TRAILING_BLANK_ROWS)):
+        ws = build_sheet(trailing)
+        timings = []
+        for scan in (cell_scan_last_row, last_data_row):
+            start = time.perf_counter()
+            row = scan(ws)
+            timings.append((time.perf_counter() - start, row))
+        (old_t, old_row), (new_t, new_row) = timings
+        assert old_row == new_row == ROWS
+        print(f"{label:>20}: cell scan {old_t * 1e3:8.1f} ms, last_data_row {new_t * 1e3:8.1f} ms")
+
+    ws = build_sheet(0)
+    index = SheetExtentIndex()
+    start = time.perf_counter()
+    for batch in range(1000):
+        row = index.last_row(ws) + 1
+        for col_num in range(1, COLUMNS + 1):
+            ws.cell(row=row, column=col_num, value=batch)
+        index.set_last_row(ws, row)
+    elapsed = time.perf_counter() - start
+    print(f"{'cached appends':>20}: 1,000 single-row appends in {elapsed * 1e3:.1f} ms, last row {index.last_row(ws):,}")
+
+
+if __name__ == "__main__":
+    main()
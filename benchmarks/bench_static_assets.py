@@ -0,0 +1,96 @@
+"""
+Benchmark: bytes transferred and latency for loading the dashboard page (/), served the
+old way (index.html re-read from disk, no validators or compression) and from
+static_assets.StaticAssetCache, for a first visit with gzip and for reloads that
+revalidate with If-None-Match (304 Not Modified).
+
+Both servers run in this process on keep-alive connections, so the numbers compare the
+serving paths rather than the network.
+
+Run from the repository root:
+    python benchmarks/bench_static_assets.py
+"""
+import http.client
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import server  # noqa: E402
+
+REQUESTS = 2000
+INDEX = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "index.html")
+
+
+class OldIndexHandler(BaseHTTPRequestHandler):
+    # The previous do_GET for '/': read the file on every request, no caching headers
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        with open(INDEX, "rb") as file:
+            body = file.read()
+        self.send_response(200)
+        self.send_header("Content-type", "text/html")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start(handler):
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    return httpd
+
+
+def measure(port, headers, label):
+    conn = http.client.HTTPConnection("127.0.0.1", port)
+    latencies = []
+    transferred = 0
+    status = None
+    for _ in range(REQUESTS):
+        started = time.perf_counter()
+        conn.request("GET", "/", headers=headers)
+        response = conn.getresponse()
+        body = response.read()
+        latencies.append(time.perf_counter() - started)
+        status = response.status
+        # Status line and headers count towards the bytes on the wire too
+        transferred += len(body) + sum(len(k) + len(v) + 4 for k, v in response.getheaders()) + 17
+    conn.close()
+    latencies.sort()
+    print(f"{label:>28}: {status}  {transferred / REQUESTS:7,.0f} B/request  "
+          f"p50 {latencies[len(latencies) // 2] * 1e3:6.3f} ms  p99 {latencies[int(len(latencies) * 0.99)] * 1e3:6.3f} ms")
+    return headers
+
+
+def main():
+    server.ManufacturingAppHandler.log_requests = False
+    old = start(OldIndexHandler)
+    new = start(server.ManufacturingAppHandler)
+    os.chdir(os.path.dirname(INDEX))
+    print(f"index.html: {os.path.getsize(INDEX):,} bytes, {REQUESTS} requests per case")
+
+    measure(old.server_address[1], {}, "old (disk read, no caching)")
+    measure(new.server_address[1], {}, "cached, identity")
+    measure(new.server_address[1], {"Accept-Encoding": "gzip, deflate, br"}, "cached, compressed")
+
+    conn = http.client.HTTPConnection("127.0.0.1", new.server_address[1])
+    conn.request("GET", "/", headers={"Accept-Encoding": "gzip"})
+    response = conn.getresponse()
+    response.read()
+    etag = response.getheader("ETag")
+    conn.close()
+    measure(new.server_address[1], {"Accept-Encoding": "gzip", "If-None-Match": etag}, "cached, reload (304)")
+
+    old.shutdown()
+    new.shutdown()
+
+
+if __name__ == "__main__":
+    main()
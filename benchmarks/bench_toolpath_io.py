@@ -0,0 +1,50 @@
+"""
+Benchmark: streaming scale of large toolpath files in each supported format.
+
+Writes a synthetic toolpath, scales it file-to-file with scale_toolpath_file and reports
+throughput and process memory, which should stay flat as the segment count grows.
+Run from the repository root:
+    python benchmarks/bench_toolpath_io.py [segments]
+"""
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from line_rendering import process_memory_bytes  # noqa: E402
+from toolpath_io import chunk_from_columns, open_toolpath_writer, scale_toolpath_file  # noqa: E402
+
+CHUNK = 100_000
+
+
+def mb(value):
+    return f"{value / (1024 * 1024):.0f} MB" if value else "N/A"
+
+
+def main():
+    segments = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000_000
+    rng = np.random.default_rng(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        for fmt in ("npy", "csv", "gcode"):
+            src = os.path.join(tmp, f"src.{fmt}")
+            dst = os.path.join(tmp, f"dst.{fmt}")
+            with open_toolpath_writer(src) as writer:
+                for start in range(0, segments, CHUNK):
+                    n = min(CHUNK, segments - start)
+                    columns = np.column_stack([rng.uniform(0, 1300, (n, 4)), rng.uniform(1, 300, n),
+                                               np.full(n, 5.0), np.full(n, 2.0)])
+                    writer.write(chunk_from_columns(columns))
+
+            before = process_memory_bytes()
+            start_time = time.perf_counter()
+            rows = scale_toolpath_file(src, dst, (1300, 1100), (650, 550))
+            elapsed = time.perf_counter() - start_time
+            print(f"{fmt:>6}: {rows:,} segments, {os.path.getsize(src) / 1e6:,.0f} MB in, "
+                  f"{rows / elapsed:,.0f} segments/s, memory {mb(before)} -> {mb(process_memory_bytes())}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,363 @@
+import json
+import os
+import threading
+import time
+import uuid
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+# Transactional bulk renames for the File Management tab.
+# A rename is planned in full before anything touches the disk: every source gets its
+# target, and moves that would clobber a file (two sources onto one name, or a target
+# that already exists and is not itself moving away) are rejected up front. Moves onto
+# the name of another moving file (chains and cycles such as a<->b swaps) go through a
+# temporary name in the same folder: phase 1 moves the free files to their targets and
+# the blocked ones to temporary names, phase 2 moves the temporary names to their
+# targets. Each phase runs in batches on a thread pool. A JSON-lines journal records
+# the plan and every completed batch, so a failed run is rolled back automatically
+# and a finished one can be undone later with rollback_renames.
+
+DEFAULT_RENAME_WORKERS = 16
+DEFAULT_JOURNAL_DIR = os.path.join(os.path.expanduser("~"), ".bulk_rename_journals")
+JOURNAL_VERSION = 1
+_INVALID_NAME_CHARS = ("/", "\\", "\x00")
+
+RenameMove = namedtuple("RenameMove", ["source", "target", "temporary"])
+RenameConflict = namedtuple("RenameConflict", ["source", "target", "reason"])
+RenamePlan = namedtuple("RenamePlan", ["moves", "conflicts", "unchanged", "cycles"])
+RenameResult = namedtuple("RenameResult", ["renamed", "errors", "rolled_back", "journal_path", "elapsed"])
+JournalInfo = namedtuple("JournalInfo", ["path", "created", "moves", "completed", "rolled_back"])
+
+
+def transform_name(name, old_string="", new_string="", prefix_string=""):
+    """
+    Applies the File Management rename rule: replace, add the prefix, then turn spaces
+    into underscores and collapse "_-_" to "_".
+    """
+    if old_string:
+        name = name.replace(old_string, new_string)
+    if prefix_string:
+        name = f"{prefix_string}{name}"
+    return name.replace(' ', '_').replace('_-_', '_')
+
+
+def _list_names(folder):
+    # {case-folded name: names on disk}; several names only on a case-sensitive filesystem
+    names = {}
+    try:
+        with os.scandir(folder) as entries:
+            for entry in entries:
+                names.setdefault(entry.name.casefold(), set()).add(entry.name)
+    except OSError:
+        pass
+    return names
+
+
+def _fold(path):
+    return os.path.join(os.path.dirname(path), os.path.basename(path).casefold())
+
+
+def _count_cycles(mapping):
+    # Cycles in the source -> target graph, where every node has at most one successor
+    cycles = 0
+    state = {}
+    for start in mapping:
+        node = start
+        while node in mapping and node not in state:
+            state[node] = start
+            node = mapping[node]
+        if node in mapping and state.get(node) == start:
+            cycles += 1
+    return cycles
+
+
+def plan_renames(renames):
+    """
+    Plans a bulk rename and rejects every move that would overwrite a file.
+
+    Names are compared case-insensitively, as on Windows and macOS filesystems: a target
+    that differs from an existing file only in case is a conflict, while changing the
+    case of a file's own name is allowed.
+
+    Args:
+        renames: Iterable of (source path, new file name); the file stays in its folder.
+
+    Returns:
+        RenamePlan: RenameMove tuples to execute (temporary is set for moves onto the name
+        of another moving file), RenameConflict tuples that were left out, the sources
+        whose name does not change, and the number of rename cycles (swaps).
+    """
+    conflicts = []
+    unchanged = []
+    wanted = {}
+    for source, new_name in renames:
+        source = os.path.abspath(source)
+        if not new_name or new_name in (".", "..") or any(c in new_name for c in _INVALID_NAME_CHARS):
+            conflicts.append(RenameConflict(source, new_name, "invalid file name"))
+            continue
+        target = os.path.join(os.path.dirname(source), new_name)
+        if target == source:
+            unchanged.append(source)
+        elif source in wanted:
+            conflicts.append(RenameConflict(source, target, "listed more than once"))
+        else:
+            wanted[source] = target
+
+    folders = {os.path.dirname(path) for path in wanted}
+    on_disk = {folder: _list_names(folder) for folder in folders}
+
+    def occupants(path):
+        # Paths on disk that path would land on
+        folder = os.path.dirname(path)
+        return {os.path.join(folder, name) for name in on_disk[folder].get(os.path.basename(path).casefold(), ())}
+
+    for source in [s for s in wanted if s not in occupants(s)]:
+        conflicts.append(RenameConflict(source, wanted.pop(source), "source does not exist"))
+
+    by_target = {}
+    for source, target in wanted.items():
+        by_target.setdefault(_fold(target), []).append(source)
+    for sources in by_target.values():
+        if len(sources) > 1:
+            for source in sources:
+                conflicts.append(RenameConflict(source, wanted.pop(source), "several files would get this name"))
+
+    # A target may only be taken by files that are themselves moving away; dropping a
+    # move can block the move onto its source, so repeat until nothing changes
+    while True:
+        blocked = [s for s, t in wanted.items() if any(path not in wanted for path in occupants(t))]
+        if not blocked:
+            break
+        for source in blocked:
+            conflicts.append(RenameConflict(source, wanted.pop(source), "target already exists"))
+
+    # Moves onto the (case-folded) name of another moving file need a temporary name,
+    # which must not be taken either
+    moving = {_fold(source): source for source in wanted}
+    while True:
+        token = uuid.uuid4().hex[:8]
+        moves = []
+        for source, target in wanted.items():
+            temporary = None
+            if moving.get(_fold(target), source) != source:
+                temporary = os.path.join(os.path.dirname(source), f".{os.path.basename(source)}.renaming-{token}")
+            moves.append(RenameMove(source, target, temporary))
+        if not any(move.temporary and occupants(move.temporary) for move in moves):
+            break
+    folded = {_fold(source): _fold(target) for source, target in wanted.items() if _fold(source) != _fold(target)}
+    return RenamePlan(moves, conflicts, unchanged, _count_cycles(folded))
+
+
+class _Journal:
+    # Append-only JSON lines: a small header, the planned moves, then {"phase": n, "done": [indices]}
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = None
+
+    def open(self, moves, kind):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._file = open(self.path, "w", encoding="utf-8")
+        header = {"version": JOURNAL_VERSION, "kind": kind, "created": time.time(), "count": len(moves)}
+        self._file.write(json.dumps(header) + "\n")
+        self._file.write(json.dumps([list(move) for move in moves]) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def record(self, entry):
+        # Synced before the next batch is reported done, so rollback never misses a move
+        with self._lock:
+            self._file.write(json.dumps(entry) + "\n")
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def close(self):
+        if self._file is not None:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+            self._file = None
+
+
+def _read_journal(path):
+    with open(path, encoding="utf-8") as f:
+        header = json.loads(f.readline())
+        moves = [RenameMove(*move) for move in json.loads(f.readline())]
+        done = {1: set(), 2: set()}
+        rolled_back = False
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                break  # Torn final line from a crash
+            if entry.get("rolled_back"):
+                rolled_back = True
+            elif "phase" in entry:
+                done[entry["phase"]].update(entry["done"])
+    return header, moves, done, rolled_back
+
+
+def _run_phase(pool, journal, phase, steps, workers):
+    # steps: [(index, source, destination)]; returns {index: error}
+    def run_batch(batch):
+        done = []
+        errors = {}
+        for index, source, destination in batch:
+            try:
+                os.rename(source, destination)
+                done.append(index)
+            except OSError as e:
+                errors[index] = str(e)
+        if done:
+            journal.record({"phase": phase, "done": done})
+        return errors
+
+    batch_size = max(1, min(2000, len(steps) // (workers * 4)))
+    batches = [steps[i:i + batch_size] for i in range(0, len(steps), batch_size)]
+    errors = {}
+    for batch_errors in pool.map(run_batch, batches):
+        errors.update(batch_errors)
+    return errors
+
+
+def _execute(moves, journal, workers):
+    # Returns {source: error}; on error, phase 2 is skipped and the caller rolls back
+    phase1 = [(i, m.source, m.temporary or m.target) for i, m in enumerate(moves)]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        errors = _run_phase(pool, journal, 1, phase1, workers)
+        if not errors:
+            phase2 = [(i, m.temporary, m.target) for i, m in enumerate(moves) if m.temporary]
+            errors = _run_phase(pool, journal, 2, phase2, workers)
+    return {moves[i].source: error for i, error in errors.items()}
+
+
+def _current_locations(moves, done):
+    # Where each planned file is now. The journal says which steps completed; a crash can
+    # lose the record of the last batch, so a file missing from where the journal puts it
+    # is looked for at its other possible locations.
+    locations = []
+    for i, move in enumerate(moves):
+        if i in done[2] or (i in done[1] and not move.temporary):
+            expected = move.target
+        elif i in done[1]:
+            expected = move.temporary
+        else:
+            expected = move.source
+        if not os.path.lexists(expected):
+            candidates = [path for path in (move.source, move.temporary, move.target) if path and path != expected]
+            expected = next((path for path in candidates if os.path.lexists(path)), expected)
+        locations.append(expected)
+    return locations
+
+
+def _journal_path(journal_dir, kind):
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    return os.path.join(journal_dir, f"{stamp}-{kind}-{uuid.uuid4().hex[:6]}.jsonl")
+
+
+def _undo(moves, done, workers, journal_dir):
+    # Moves every file back to its source through a new plan of its own
+    undo_renames = []
+    for move, location in zip(moves, _current_locations(moves, done)):
+        if location != move.source:
+            undo_renames.append((location, os.path.basename(move.source)))
+    plan = plan_renames(undo_renames)
+    journal = _Journal(_journal_path(journal_dir, "undo"))
+    journal.open(plan.moves, "undo")
+    try:
+        errors = _execute(plan.moves, journal, workers)
+    finally:
+        journal.close()
+    errors.update({c.source: f"could not restore: {c.reason}" for c in plan.conflicts})
+    return plan, errors
+
+
+def execute_renames(plan, workers=DEFAULT_RENAME_WORKERS, journal_dir=DEFAULT_JOURNAL_DIR, rollback_on_error=True):
+    """
+    Executes a RenamePlan, journaling every completed step.
+
+    Args:
+        plan (RenamePlan): From plan_renames; conflicts are not executed.
+        workers (int): Concurrent renames.
+        journal_dir (str): Folder for the journal file.
+        rollback_on_error (bool): Restore every file if any rename fails, so the folder is
+            never left half-renamed.
+
+    Returns:
+        RenameResult: [(source, target)] renamed and still in place, {source: error},
+        whether the batch was rolled back, the journal path and elapsed seconds.
+    """
+    started = time.perf_counter()
+    journal_path = _journal_path(journal_dir, "rename")
+    if not plan.moves:
+        return RenameResult([], {}, False, None, time.perf_counter() - started)
+    journal = _Journal(journal_path)
+    journal.open(plan.moves, "rename")
+    try:
+        errors = _execute(plan.moves, journal, workers)
+    finally:
+        journal.close()
+
+    if errors and rollback_on_error:
+        rollback_renames(journal_path, workers, journal_dir)
+        return RenameResult([], errors, True, journal_path, time.perf_counter() - started)
+    renamed = [(m.source, m.target) for m in plan.moves]
+    if errors:
+        _, _, done, _ = _read_journal(journal_path)
+        renamed = [move for move, location in zip(renamed, _current_locations(plan.moves, done)) if location == move[1]]
+    return RenameResult(renamed, errors, False, journal_path, time.perf_counter() - started)
+
+
+def rollback_renames(journal_path, workers=DEFAULT_RENAME_WORKERS, journal_dir=DEFAULT_JOURNAL_DIR):
+    """
+    Restores the original names of every file renamed under a journal.
+
+    Files whose original name has been taken since are left where they are and reported.
+    Rolling back an already rolled back journal does nothing.
+
+    Returns:
+        RenameResult: [(current path, restored path)], {path: error}, True, the journal path
+        and elapsed seconds.
+    """
+    started = time.perf_counter()
+    _, moves, done, rolled_back = _read_journal(journal_path)
+    if rolled_back:
+        return RenameResult([], {}, True, journal_path, time.perf_counter() - started)
+    undo_plan, errors = _undo(moves, done, workers, journal_dir)
+    with open(journal_path, "a", encoding="utf-8") as f:
+        f.write(json.dumps({"rolled_back": True, "at": time.time()}) + "\n")
+    restored = [(m.source, m.target) for m in undo_plan.moves if m.source not in errors]
+    return RenameResult(restored, errors, True, journal_path, time.perf_counter() - started)
+
+
+def _read_last_line(path, chunk=4096):
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        f.seek(max(0, f.tell() - chunk))
+        lines = f.read().splitlines()
+    return lines[-1].decode("utf-8", "replace") if lines else ""
+
+
+def list_journals(journal_dir=DEFAULT_JOURNAL_DIR, kind="rename", limit=20):
+    """
+    Returns JournalInfo tuples for the newest limit journals in journal_dir, newest first.
+
+    Only each journal's header and last line are read; completed is None.
+    """
+    try:
+        names = sorted((n for n in os.listdir(journal_dir) if n.endswith(".jsonl") and f"-{kind}-" in n), reverse=True)
+    except FileNotFoundError:
+        return []
+    journals = []
+    for name in names[:limit]:
+        path = os.path.join(journal_dir, name)
+        try:
+            with open(path, encoding="utf-8") as f:
+                header = json.loads(f.readline())
+            rolled_back = '"rolled_back": true' in _read_last_line(path)
+        except (OSError, ValueError):
+            continue
+        journals.append(JournalInfo(path, header.get("created"), header.get("count"), None, rolled_back))
+    return journals
@@ -0,0 +1,406 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from directory_listing import DirectoryEntry, DirectoryListing
+from modality_schema import get_schema, name_from_folder, sample_id_from_folder
+
+# SQLite catalog of the Run=/Stage=/Modality= data tree under one or more output roots.
+# A refresh lists the root with os.scandir, then walks the runs in parallel. Stored
+# directory mtimes make it incremental: a run or stage folder is only re-listed when its
+# mtime changed (folders were added or removed), and a modality folder's files are only
+# recounted when its mtime changed. Everything else is a single stat per folder. Files
+# nested in sub-folders of a modality are counted too, but changes that deep only show
+# up when the modality folder itself changes or on a full refresh.
+# Every folder a refresh lists is stored with its mtime and entries, so the File
+# Management tab lists cataloged folders and searches them by name with SQL queries.
+# A stored listing is only used while the folder's mtime still matches; otherwise the
+# caller walks the folder itself.
+
+DEFAULT_CATALOG_PATH = os.path.join(os.path.expanduser("~"), ".data_catalog.sqlite")
+DEFAULT_CATALOG_WORKERS = 16
+
+_SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS runs (
+    path TEXT PRIMARY KEY, root TEXT NOT NULL, sample_id TEXT NOT NULL, mtime REAL, scanned_at REAL
+);
+CREATE TABLE IF NOT EXISTS stages (
+    path TEXT PRIMARY KEY, run_path TEXT NOT NULL, stage TEXT NOT NULL, mtime REAL
+);
+CREATE TABLE IF NOT EXISTS modalities (
+    path TEXT PRIMARY KEY, run_path TEXT NOT NULL, stage TEXT NOT NULL, modality TEXT NOT NULL,
+    mtime REAL, file_count INTEGER, total_bytes INTEGER, latest_mtime REAL
+);
+CREATE TABLE IF NOT EXISTS folders (path TEXT PRIMARY KEY, root TEXT NOT NULL, mtime REAL);
+CREATE TABLE IF NOT EXISTS entries (
+    path TEXT PRIMARY KEY, parent TEXT NOT NULL, name TEXT NOT NULL, is_dir INTEGER NOT NULL, size INTEGER, mtime REAL
+);
+CREATE INDEX IF NOT EXISTS entries_parent ON entries(parent);
+CREATE INDEX IF NOT EXISTS runs_root ON runs(root);
+CREATE INDEX IF NOT EXISTS stages_run ON stages(run_path);
+CREATE INDEX IF NOT EXISTS modalities_run ON modalities(run_path);
+CREATE INDEX IF NOT EXISTS modalities_name ON modalities(modality);
+"""
+
+RefreshStats = namedtuple("RefreshStats", ["runs", "removed_runs", "listed_dirs", "recounted_modalities", "elapsed"])
+
+
+def _dir_mtime(path):
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return None
+
+
+def _entry(entry):
+    # DirectoryEntry for a DirEntry, as directory_listing.scan_directory builds it
+    if entry.is_dir():
+        return DirectoryEntry(entry.name, entry.path, True, 0, 0.0)
+    if entry.is_file():
+        stat = entry.stat()
+        return DirectoryEntry(entry.name, entry.path, False, stat.st_size, stat.st_mtime)
+    return None
+
+
+def _list_folder(path):
+    # All entries of path as DirectoryEntry tuples
+    found = []
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                try:
+                    item = _entry(entry)
+                except OSError:
+                    continue
+                if item is not None:
+                    found.append(item)
+    except OSError:
+        pass
+    return found
+
+
+def _count_files(path, mtime):
+    # Recursive (file count, total bytes, latest file mtime, [(folder, mtime, entries)]),
+    # using the DirEntry stat results
+    count = total = 0
+    latest = 0.0
+    listings = []
+    pending = [(path, mtime)]
+    while pending:
+        folder, folder_mtime = pending.pop()
+        listed = []
+        try:
+            with os.scandir(folder) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            pending.append((entry.path, entry.stat(follow_symlinks=False).st_mtime))
+                            listed.append(DirectoryEntry(entry.name, entry.path, True, 0, 0.0))
+                        elif entry.is_file():
+                            stat = entry.stat()
+                            count += 1
+                            total += stat.st_size
+                            latest = max(latest, stat.st_mtime)
+                            listed.append(DirectoryEntry(entry.name, entry.path, False, stat.st_size, stat.st_mtime))
+                    except OSError:
+                        continue
+        except OSError:
+            continue
+        listings.append((folder, folder_mtime, listed))
+    return count, total, latest, listings
+
+
+def _subdirs(entries, pattern):
+    # [(name, path)] of the sub-folders among entries whose names match pattern
+    found = []
+    for entry in entries:
+        name = name_from_folder(pattern, entry.name)
+        if name is not None and entry.is_dir:
+            found.append((name, entry.path))
+    return found
+
+
+def _subtree_range(path):
+    # Paths strictly below path sort in [path + sep, path + chr(ord(sep) + 1))
+    return path + os.sep, path + chr(ord(os.sep) + 1)
+
+
+class DataCatalog:
+    """
+    Catalog of runs and per-modality file counts, sizes and mtimes, stored in SQLite.
+
+    Safe to share between threads (e.g. via st.cache_resource); database access is serialized.
+
+    Args:
+        db_path (str): SQLite file; created if missing. ":memory:" keeps it in memory.
+        schema (CompiledSchema): Folder patterns for refresh; the default schema file if None.
+    """
+
+    def __init__(self, db_path=DEFAULT_CATALOG_PATH, schema=None):
+        self.db_path = db_path
+        self.schema = schema
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        with self._lock:
+            self._conn.executescript(_SCHEMA_SQL)
+            self._conn.commit()
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def _scan_run(self, schema, run_path, run_mtime, known_run_mtime, known_stages, known_modalities, full):
+        # Runs in a worker thread; only touches the filesystem and the snapshots passed in.
+        # listings holds (folder, mtime, entries, mode) for every folder listed: "replace"
+        # swaps one folder's entries, "tree" also drops everything stored below it first.
+        listed = recounted = 0
+        listings = []
+        if not full and known_run_mtime == run_mtime and known_stages is not None:
+            stages = [(stage, path) for path, (stage, _) in known_stages.items()]
+        else:
+            run_entries = _list_folder(run_path)
+            listings.append((run_path, run_mtime, run_entries, "replace"))
+            stages = _subdirs(run_entries, schema.stage_pattern)
+            listed += 1
+
+        stage_rows = []
+        modality_rows = []
+        for stage, stage_path in stages:
+            stage_mtime = _dir_mtime(stage_path)
+            if stage_mtime is None:
+                continue
+            stage_rows.append((stage_path, run_path, stage, stage_mtime))
+            known_stage = (known_stages or {}).get(stage_path)
+            stage_known_mods = {path: row for path, row in known_modalities.items() if row[1] == stage}
+            if not full and known_stage is not None and known_stage[1] == stage_mtime:
+                modalities = [(row[2], path) for path, row in stage_known_mods.items()]
+            else:
+                stage_entries = _list_folder(stage_path)
+                listings.append((stage_path, stage_mtime, stage_entries, "replace"))
+                modalities = _subdirs(stage_entries, schema.modality_pattern)
+                listed += 1
+            for modality, modality_path in modalities:
+                modality_mtime = _dir_mtime(modality_path)
+                if modality_mtime is None:
+                    continue
+                known = stage_known_mods.get(modality_path)
+                if not full and known is not None and known[3] == modality_mtime:
+                    count, total, latest = known[4], known[5], known[6]
+                else:
+                    count, total, latest, modality_listings = _count_files(modality_path, modality_mtime)
+                    listings.extend((folder, mtime, entries, "tree" if folder == modality_path else "new")
+                                    for folder, mtime, entries in modality_listings)
+                    recounted += 1
+                modality_rows.append((modality_path, run_path, stage, modality, modality_mtime, count, total, latest))
+        return stage_rows, modality_rows, listed, recounted, listings
+
+    def refresh(self, root, schema=None, workers=DEFAULT_CATALOG_WORKERS, full=False):
+        """
+        Brings the catalog for root up to date.
+
+        Args:
+            root (str): Folder holding the run folders.
+            schema (CompiledSchema): Folder patterns; the catalog's schema if None.
+            workers (int): Runs scanned in parallel.
+            full (bool): Re-list and recount everything, ignoring stored mtimes.
+
+        Returns:
+            RefreshStats: runs found, runs removed, folders listed, modality folders
+            recounted and elapsed seconds.
+        """
+        started = time.perf_counter()
+        schema = schema or self.schema or get_schema()
+        root = os.path.abspath(root)
+        # A root cataloged before folder listings were stored needs one full pass
+        full = full or not self._query("SELECT 1 FROM folders WHERE path = ?", (root,))
+        root_mtime = os.stat(root).st_mtime
+        runs = []
+        root_entries = []
+        with os.scandir(root) as entries:
+            for entry in entries:
+                try:
+                    item = _entry(entry)
+                except OSError:
+                    continue
+                if item is None:
+                    continue
+                root_entries.append(item)
+                sample_id = sample_id_from_folder(schema, entry.name)
+                if sample_id is not None and item.is_dir:
+                    runs.append((entry.path, sample_id, entry.stat().st_mtime))
+
+        known_runs = dict(self._query("SELECT path, mtime FROM runs WHERE root = ?", (root,)))
+        known_stages = {}
+        for path, run_path, stage, mtime in self._query(
+                "SELECT s.path, s.run_path, s.stage, s.mtime FROM stages s JOIN runs r ON s.run_path = r.path WHERE r.root = ?", (root,)):
+            known_stages.setdefault(run_path, {})[path] = (stage, mtime)
+        known_modalities = {}
+        for row in self._query(
+                "SELECT m.path, m.run_path, m.stage, m.modality, m.mtime, m.file_count, m.total_bytes, m.latest_mtime "
+                "FROM modalities m JOIN runs r ON m.run_path = r.path WHERE r.root = ?", (root,)):
+            known_modalities.setdefault(row[1], {})[row[0]] = row[1:]
+
+        def scan(run):
+            path, _, mtime = run
+            return self._scan_run(schema, path, mtime, known_runs.get(path), known_stages.get(path),
+                                  known_modalities.get(path, {}), full)
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(scan, runs))
+
+        now = time.time()
+        present = {path for path, _, _ in runs}
+        removed = [path for path in known_runs if path not in present]
+        listed = 1 + sum(r[2] for r in results)
+        recounted = sum(r[3] for r in results)
+        with self._lock:
+            with self._conn:
+                for path in removed:
+                    self._delete_run(path)
+                self._store_listing(root, root, root_mtime, root_entries, "replace")
+                for (path, sample_id, mtime), (stage_rows, modality_rows, _, _, listings) in zip(runs, results):
+                    self._delete_run(path)
+                    self._conn.execute("INSERT INTO runs VALUES (?, ?, ?, ?, ?)", (path, root, sample_id, mtime, now))
+                    self._conn.executemany("INSERT INTO stages VALUES (?, ?, ?, ?)", stage_rows)
+                    self._conn.executemany("INSERT INTO modalities VALUES (?, ?, ?, ?, ?, ?, ?, ?)", modality_rows)
+                    for folder, folder_mtime, entries, mode in listings:
+                        self._store_listing(folder, root, folder_mtime, entries, mode)
+        return RefreshStats(len(runs), len(removed), listed, recounted, time.perf_counter() - started)
+
+    def _delete_run(self, path):
+        self._conn.execute("DELETE FROM modalities WHERE run_path = ?", (path,))
+        self._conn.execute("DELETE FROM stages WHERE run_path = ?", (path,))
+        self._conn.execute("DELETE FROM runs WHERE path = ?", (path,))
+
+    def _delete_tree(self, path):
+        # Caller holds the lock: stored listings of path and of everything below it
+        low, high = _subtree_range(path)
+        self._conn.execute("DELETE FROM entries WHERE path >= ? AND path < ?", (low, high))
+        self._conn.execute("DELETE FROM folders WHERE path = ? OR (path >= ? AND path < ?)", (path, low, high))
+
+    def _store_listing(self, folder, root, mtime, entries, mode):
+        # Caller holds the lock
+        if mode == "tree":
+            self._delete_tree(folder)
+        elif mode == "replace":
+            present = {entry.path for entry in entries if entry.is_dir}
+            for (path,) in self._conn.execute("SELECT path FROM entries WHERE parent = ? AND is_dir", (folder,)).fetchall():
+                if path not in present:
+                    self._delete_tree(path)  # Folder removed since the last listing
+            self._conn.execute("DELETE FROM entries WHERE parent = ?", (folder,))
+        self._conn.executemany("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?)",
+                               [(e.path, folder, e.name, int(e.is_dir), e.size, e.mtime) for e in entries])
+        self._conn.execute("INSERT OR REPLACE INTO folders VALUES (?, ?, ?)", (folder, root, mtime))
+
+    def list_directory(self, path):
+        """
+        Returns the stored listing of a cataloged folder, or None if path was not listed by
+        a refresh or has changed since (its mtime differs), so the caller should walk it.
+
+        Returns:
+            DirectoryListing: as directory_listing.scan_directory would build it.
+        """
+        path = os.path.abspath(path)
+        rows = self._query("SELECT mtime FROM folders WHERE path = ?", (path,))
+        mtime = _dir_mtime(path)
+        if not rows or mtime is None or rows[0][0] != mtime:
+            return None
+        directories = []
+        files = []
+        for name, entry_path, is_dir, size, entry_mtime in self._query(
+                "SELECT name, path, is_dir, size, mtime FROM entries WHERE parent = ? ORDER BY lower(name)", (path,)):
+            (directories if is_dir else files).append(DirectoryEntry(name, entry_path, bool(is_dir), size, entry_mtime))
+        return DirectoryListing(path, mtime, directories, files)
+
+    def has_folder(self, path):
+        """Whether a refresh has listed path (so search_files can search below it)."""
+        return bool(self._query("SELECT 1 FROM folders WHERE path = ?", (os.path.abspath(path),)))
+
+    def search_files(self, path, pattern, limit=1000):
+        """
+        Finds files anywhere below a cataloged folder whose name contains pattern (ignoring
+        ASCII case), as of the last refresh.
+
+        Returns:
+            list: Up to limit DirectoryEntry tuples ordered by name, or None if path is not
+            a cataloged folder.
+        """
+        path = os.path.abspath(path)
+        if not self.has_folder(path):
+            return None
+        low, high = _subtree_range(path)
+        escaped = pattern.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        rows = self._query(
+            "SELECT name, path, size, mtime FROM entries WHERE path >= ? AND path < ? AND NOT is_dir "
+            "AND name LIKE ? ESCAPE '\\' ORDER BY lower(name) LIMIT ?", (low, high, f"%{escaped}%", limit))
+        return [DirectoryEntry(name, entry_path, False, size, mtime) for name, entry_path, size, mtime in rows]
+
+    def has_root(self, root):
+        return bool(self._query("SELECT 1 FROM runs WHERE root = ? LIMIT 1", (os.path.abspath(root),)))
+
+    def last_scanned(self, root):
+        """Time of the last refresh of root (seconds since the epoch), or None."""
+        rows = self._query("SELECT MAX(scanned_at) FROM runs WHERE root = ?", (os.path.abspath(root),))
+        return rows[0][0] if rows else None
+
+    def modality_summary(self, root=None, run_path=None):
+        """
+        Returns one row per run and modality: sample_id, stage, modality, file_count,
+        total_bytes and latest_mtime, for every run under root or for a single run_path.
+        """
+        sql = ("SELECT r.sample_id, m.stage, m.modality, m.file_count, m.total_bytes, m.latest_mtime "
+               "FROM modalities m JOIN runs r ON m.run_path = r.path ")
+        if run_path is not None:
+            sql, params = sql + "WHERE r.path = ?", (os.path.abspath(run_path),)
+        else:
+            sql, params = sql + "WHERE r.root = ?", (os.path.abspath(root),)
+        with self._lock:
+            return pd.read_sql_query(sql + " ORDER BY r.sample_id, m.stage, m.modality", self._conn, params=params)
+
+    def run_summary(self, root):
+        """
+        Returns one row per run under root with its modality count, file count and bytes.
+        """
+        sql = ("SELECT r.sample_id, r.path, COUNT(m.path) AS modalities, COALESCE(SUM(m.file_count), 0) AS file_count, "
+               "COALESCE(SUM(m.total_bytes), 0) AS total_bytes FROM runs r LEFT JOIN modalities m ON m.run_path = r.path "
+               "WHERE r.root = ? GROUP BY r.path ORDER BY r.sample_id")
+        with self._lock:
+            return pd.read_sql_query(sql, self._conn, params=(os.path.abspath(root),))
+
+    def samples_missing(self, root, modality_pattern, min_files=1):
+        """
+        Returns the sample IDs under root with fewer than min_files files in every modality
+        matching modality_pattern (SQL LIKE, e.g. "sem_%" for any SEM modality).
+        """
+        rows = self._query(
+            "SELECT r.sample_id FROM runs r WHERE r.root = ? AND NOT EXISTS ("
+            "SELECT 1 FROM modalities m WHERE m.run_path = r.path AND m.modality LIKE ? AND m.file_count >= ?"
+            ") ORDER BY r.sample_id",
+            (os.path.abspath(root), modality_pattern, min_files))
+        return [row[0] for row in rows]
+
+    def run_layout(self, root):
+        """
+        Returns {sample_id: (run_path, {stage folder name: set of modality folder names})} for root.
+        """
+        layout = {}
+        root = os.path.abspath(root)
+        for sample_id, path in self._query("SELECT sample_id, path FROM runs WHERE root = ?", (root,)):
+            layout[sample_id] = (path, {})
+        for sample_id, stage_path in self._query(
+                "SELECT r.sample_id, s.path FROM stages s JOIN runs r ON s.run_path = r.path WHERE r.root = ?", (root,)):
+            layout[sample_id][1][os.path.basename(stage_path)] = set()
+        for sample_id, modality_path in self._query(
+                "SELECT r.sample_id, m.path FROM modalities m JOIN runs r ON m.run_path = r.path WHERE r.root = ?", (root,)):
+            stage_name = os.path.basename(os.path.dirname(modality_path))
+            layout[sample_id][1].setdefault(stage_name, set()).add(os.path.basename(modality_path))
+        return layout
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,140 @@
+import os
+import threading
+from collections import OrderedDict, namedtuple
+
+# Directory listings for the File Management tab.
+# A folder is read with a single os.scandir pass, and the size and mtime come from the
+# DirEntry stat results; no Path objects and no resolve() per file. Listings are cached
+# by the folder's own mtime, which changes whenever an entry is added, removed or renamed,
+# so a rerun on an unchanged folder costs one os.stat. Filtering, sorting and pagination
+# happen here so the page only renders the rows it shows. Edits to a file's contents do
+# not change the folder mtime; size and modified time are refreshed on the next change to
+# the folder (or with DirectoryListingCache.invalidate).
+
+SORT_KEYS = ("name", "size", "modified")
+DEFAULT_PAGE_SIZE = 100
+
+DirectoryEntry = namedtuple("DirectoryEntry", ["name", "path", "is_dir", "size", "mtime"])
+DirectoryListing = namedtuple("DirectoryListing", ["path", "mtime", "directories", "files"])
+EntryPage = namedtuple("EntryPage", ["entries", "total", "page", "page_count"])
+
+
+def format_size(size):
+    if size < 1024:
+        return f"{size} B"
+    if size < 1024 * 1024:
+        return f"{size / 1024:.1f} KB"
+    return f"{size / (1024 * 1024):.1f} MB"
+
+
+def scan_directory(path):
+    """
+    Lists path with one os.scandir pass.
+
+    Returns:
+        DirectoryListing: the resolved path, its mtime, and DirectoryEntry tuples for the
+        sub-folders and files, each sorted by lower-case name.
+
+    Raises:
+        OSError: If path cannot be listed.
+    """
+    path = os.path.realpath(path)
+    mtime = os.stat(path).st_mtime
+    directories = []
+    files = []
+    with os.scandir(path) as entries:
+        for entry in entries:
+            try:
+                if entry.is_dir():
+                    directories.append(DirectoryEntry(entry.name, entry.path, True, 0, 0.0))
+                elif entry.is_file():
+                    stat = entry.stat()
+                    files.append(DirectoryEntry(entry.name, entry.path, False, stat.st_size, stat.st_mtime))
+            except OSError:
+                continue  # Vanished or unreadable entry
+    directories.sort(key=lambda e: e.name.lower())
+    files.sort(key=lambda e: e.name.lower())
+    return DirectoryListing(path, mtime, directories, files)
+
+
+class DirectoryListingCache:
+    """
+    LRU cache of scan_directory results, revalidated against each folder's mtime.
+
+    Args:
+        max_entries (int): Folders kept in memory.
+    """
+
+    def __init__(self, max_entries=32):
+        self.max_entries = max_entries
+        self._listings = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, path):
+        """
+        Returns the DirectoryListing for path, rescanning only if the folder changed.
+
+        Raises:
+            OSError: If path cannot be listed.
+        """
+        key = os.path.realpath(path)
+        mtime = os.stat(key).st_mtime
+        with self._lock:
+            listing = self._listings.get(key)
+            if listing is not None and listing.mtime == mtime:
+                self._listings.move_to_end(key)
+                return listing
+        listing = scan_directory(key)
+        with self._lock:
+            self._listings[key] = listing
+            self._listings.move_to_end(key)
+            while len(self._listings) > self.max_entries:
+                self._listings.popitem(last=False)
+        return listing
+
+    def invalidate(self, path=None):
+        """Drops the cached listing of path, or every listing if path is None."""
+        with self._lock:
+            if path is None:
+                self._listings.clear()
+            else:
+                self._listings.pop(os.path.realpath(path), None)
+
+
+def filter_entries(entries, pattern=""):
+    """Returns the entries whose name contains pattern, ignoring case."""
+    if not pattern:
+        return entries
+    pattern = pattern.lower()
+    return [e for e in entries if pattern in e.name.lower()]
+
+
+def query_entries(entries, pattern="", sort_by="name", descending=False, page=1, page_size=DEFAULT_PAGE_SIZE):
+    """
+    Filters, sorts and paginates directory entries.
+
+    Args:
+        entries: DirectoryEntry tuples, as in a DirectoryListing (already sorted by name).
+        pattern (str): Case-insensitive substring the name must contain.
+        sort_by (str): One of SORT_KEYS.
+        descending (bool): Reverse the order.
+        page (int): 1-based page number; clamped to the available pages.
+        page_size (int): Entries per page.
+
+    Returns:
+        EntryPage: the entries on the page, the number matching the filter, the page
+        actually returned and the page count.
+    """
+    if sort_by not in SORT_KEYS:
+        raise ValueError(f"Unknown sort key '{sort_by}'. Use one of: {', '.join(SORT_KEYS)}")
+    matching = filter_entries(entries, pattern)
+    if sort_by == "size":
+        matching = sorted(matching, key=lambda e: e.size, reverse=descending)
+    elif sort_by == "modified":
+        matching = sorted(matching, key=lambda e: e.mtime, reverse=descending)
+    elif descending:
+        matching = matching[::-1]
+    page_count = max(1, -(-len(matching) // page_size))
+    page = min(max(1, page), page_count)
+    start = (page - 1) * page_size
+    return EntryPage(matching[start:start + page_size], len(matching), page, page_count)
@@ -0,0 +1,167 @@
+import io
+import weakref
+
+import openpyxl
+from openpyxl.worksheet._read_only import ReadOnlyWorksheet
+
+# Append-only staging of rows into an Excel workbook.
+# The parsed workbook and each sheet's last data row are kept in memory between appends,
+# so adding a batch costs O(new rows). The workbook is only serialized when the bytes are
+# requested (e.g. for a download), and those bytes are reused until the next append.
+# SheetExtentIndex caches each sheet's last data row for workbooks that stay open across
+# appends (StagedWorkbook). One-shot reads such as excel_preview call last_data_row directly.
+
+SCAN_BLOCK_ROWS = 512  # Rows read per block when scanning a sheet upwards for its last data row
+
+
+def _row_has_data(values):
+    # Non-empty, non-whitespace values count as data
+    for value in values:
+        if value is not None and (not isinstance(value, str) or value.strip()):
+            return True
+    return False
+
+
+def last_data_row(ws, block_rows=SCAN_BLOCK_ROWS):
+    """
+    Returns the last row of the worksheet holding a non-blank value, or 0 if there is none.
+
+    Regular worksheets are read upwards from the dimension's max_row in blocks of
+    iter_rows(values_only=True), so a sheet whose last rows hold data costs one block.
+    Read-only worksheets can only stream forwards and are read in a single pass.
+    """
+    if isinstance(ws, ReadOnlyWorksheet):
+        last_row = 0
+        for row_num, values in enumerate(ws.iter_rows(values_only=True), start=1):
+            if _row_has_data(values):
+                last_row = row_num
+        return last_row
+
+    max_col = ws.max_column
+    block_end = ws.max_row
+    while block_end > 0:
+        block_start = max(block_end - block_rows + 1, 1)
+        rows = list(ws.iter_rows(min_row=block_start, max_row=block_end, max_col=max_col, values_only=True))
+        for offset in range(len(rows) - 1, -1, -1):
+            if _row_has_data(rows[offset]):
+                return block_start + offset
+        block_end = block_start - 1
+    return 0
+
+
+class SheetExtentIndex:
+    """
+    Cached last data row per worksheet, kept up to date as rows are appended.
+
+    Each sheet is scanned with last_data_row() the first time it is asked for; after that,
+    writers report the rows they add with set_last_row() and no further scans are needed.
+    Entries are kept per workbook (and dropped with it), so one index can serve sheets of
+    the same title in different workbooks.
+    """
+
+    def __init__(self):
+        self._last_rows = weakref.WeakKeyDictionary()  # workbook -> {sheet title: last data row}
+
+    def last_row(self, ws):
+        sheets = self._last_rows.setdefault(ws.parent, {})
+        if ws.title not in sheets:
+            sheets[ws.title] = last_data_row(ws)
+        return sheets[ws.title]
+
+    def set_last_row(self, ws, row_num):
+        self._last_rows.setdefault(ws.parent, {})[ws.title] = row_num
+
+    def forget(self, ws):
+        self._last_rows.get(ws.parent, {}).pop(ws.title, None)
+
+    def clear(self):
+        self._last_rows.clear()
+
+
+class StagedWorkbook:
+    """
+    A workbook held open in memory for repeated appends.
+
+    Args:
+        source: Optional path or file-like object of an existing workbook to append to.
+            Without one a new workbook is created.
+    """
+
+    def __init__(self, source=None):
+        if source is not None:
+            if hasattr(source, "seek"):
+                source.seek(0)
+            self.wb = openpyxl.load_workbook(source)
+            self.is_new = False
+        else:
+            self.wb = openpyxl.Workbook()
+            self.is_new = True
+        self.extents = SheetExtentIndex()
+        self._serialized = None
+        self.rows_appended = 0
+
+    def sheet(self, sheet_name):
+        """
+        Returns the named worksheet, creating it if needed.
+
+        In a new workbook the empty default "Sheet" is dropped once another sheet is created.
+        """
+        if sheet_name in self.wb.sheetnames:
+            return self.wb[sheet_name]
+        ws = self.wb.create_sheet(title=sheet_name)
+        if self.is_new and "Sheet" in self.wb.sheetnames:
+            default_sheet = self.wb["Sheet"]
+            if not any(default_sheet.iter_rows(values_only=True)):
+                self.extents.forget(default_sheet)
+                self.wb.remove(default_sheet)
+        return ws
+
+    def last_data_row(self, sheet_name):
+        """
+        Returns the last non-blank row of the sheet (0 if empty). Only the first call per sheet scans it.
+        """
+        return self.extents.last_row(self.sheet(sheet_name))
+
+    def append_rows(self, sheet_name, rows, headers=None):
+        """
+        Writes rows after the last data row of the sheet.
+
+        Args:
+            sheet_name (str): Target sheet; created if missing.
+            rows: Iterable of row value sequences.
+            headers: Optional header row, written first if the sheet is empty.
+
+        Returns:
+            int: Number of data rows written.
+        """
+        ws = self.sheet(sheet_name)
+        next_row = self.extents.last_row(ws) + 1
+        if next_row == 1 and headers:
+            for col_idx, header_title in enumerate(headers, start=1):
+                ws.cell(row=next_row, column=col_idx, value=header_title)
+            next_row += 1
+        written = 0
+        for row in rows:
+            for col_idx, cell_value in enumerate(row, start=1):
+                ws.cell(row=next_row, column=col_idx, value=cell_value)
+            next_row += 1
+            written += 1
+        self.extents.set_last_row(ws, next_row - 1)
+        self.rows_appended += written
+        self._serialized = None
+        return written
+
+    @property
+    def is_serialized(self):
+        """Whether to_bytes() would return cached bytes without re-serializing."""
+        return self._serialized is not None
+
+    def to_bytes(self):
+        """
+        Returns the workbook as .xlsx bytes, serializing only if rows were appended since the last call.
+        """
+        if self._serialized is None:
+            buffer = io.BytesIO()
+            self.wb.save(buffer)
+            self._serialized = buffer.getvalue()
+        return self._serialized
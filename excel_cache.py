@@ -0,0 +1,187 @@
+import hashlib
+import os
+import stat
+import threading
+
+import pandas as pd
+
+# Parse-once cache for uploaded Excel sheets.
+# Parsed sheets are stored as Parquet in a per-user cache directory keyed by a hash of the
+# workbook bytes plus the sheet name, so the same upload is parsed once however often
+# Streamlit reruns, and re-uploading an identical file hits the cache too. Only Parquet is
+# ever read back (never pickles), and the directory is private to the user (mode 0700),
+# so nobody else can plant entries. Sheets whose mixed-type columns do not fit Parquet
+# are simply not cached. File modification times track use, and the least recently used
+# files are removed once the directory grows past max_bytes.
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".excel_parse_cache")
+DEFAULT_CACHE_MAX_BYTES = 512 * 1024 * 1024
+_HASH_CHUNK = 1 << 20
+
+try:
+    import pyarrow  # noqa: F401  In requirements.txt; without it sheets are parsed every time
+    HAVE_PARQUET = True
+except ImportError:
+    HAVE_PARQUET = False
+
+
+def content_hash(source):
+    """
+    Returns a hex digest of the bytes of a path or file-like object (rewound afterwards).
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    if hasattr(source, "read"):
+        source.seek(0)
+        for chunk in iter(lambda: source.read(_HASH_CHUNK), b""):
+            digest.update(chunk)
+        source.seek(0)
+    else:
+        with open(source, "rb") as f:
+            for chunk in iter(lambda: f.read(_HASH_CHUNK), b""):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+def make_private_dir(path):
+    """
+    Creates path with mode 0700 if missing, and tightens an existing directory owned by the
+    current user to 0700.
+
+    Raises:
+        PermissionError: If the directory belongs to another user.
+    """
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    if hasattr(os, "getuid"):  # POSIX; on Windows the user profile directory is already private
+        info = os.stat(path)
+        if info.st_uid != os.getuid():
+            raise PermissionError(f"Cache directory '{path}' is owned by another user.")
+        if stat.S_IMODE(info.st_mode) != 0o700:
+            os.chmod(path, 0o700)
+
+
+class SheetParseCache:
+    """
+    On-disk LRU cache of parsed Excel sheets, bounded by total file size.
+
+    Args:
+        cache_dir (str): Directory for cached sheets; created (mode 0700) if missing.
+        max_bytes (int): Total size above which the least recently used sheets are removed.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        make_private_dir(cache_dir)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _base_path(self, digest, sheet_name):
+        sheet_key = hashlib.blake2b(repr(sheet_name).encode(), digest_size=8).hexdigest()
+        return os.path.join(self.cache_dir, f"{digest}-{sheet_key}")
+
+    def read_sheet(self, source, sheet_name=0, digest=None):
+        """
+        Returns the sheet as a DataFrame, as pd.read_excel(source, sheet_name=sheet_name) would.
+
+        Args:
+            source: Path or file-like object of the workbook.
+            sheet_name: Sheet name or index.
+            digest (str): content_hash(source), if the caller already has it.
+        """
+        if not HAVE_PARQUET:
+            with self._lock:
+                self.misses += 1
+            if hasattr(source, "seek"):
+                source.seek(0)
+            return pd.read_excel(source, sheet_name=sheet_name)
+
+        digest = digest or content_hash(source)
+        base = self._base_path(digest, sheet_name)
+        df = self._load(base)
+        if df is not None:
+            with self._lock:
+                self.hits += 1
+            return df
+
+        with self._lock:
+            self.misses += 1
+        if hasattr(source, "seek"):
+            source.seek(0)
+        df = pd.read_excel(source, sheet_name=sheet_name)
+        self._store(base, df)
+        self._evict()
+        return df
+
+    def _load(self, base):
+        path = base + ".parquet"
+        try:
+            df = pd.read_parquet(path)
+        except (OSError, ValueError, ImportError):
+            return None
+        try:
+            os.utime(path)  # Mark as recently used
+        except OSError:
+            pass
+        return df
+
+    def _store(self, base, df):
+        # Write to a temporary name and rename, so concurrent readers never see partial files
+        tmp_path = f"{base}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            df.to_parquet(tmp_path)
+            os.replace(tmp_path, base + ".parquet")
+        except (OSError, ValueError, TypeError, NotImplementedError):
+            # Mixed-type object columns or non-string headers do not fit Parquet, and a cache
+            # that cannot be written is just a cache miss next time
+            pass
+        finally:
+            if os.path.exists(tmp_path):
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+
+    def _entries(self):
+        entries = []
+        with os.scandir(self.cache_dir) as it:
+            for entry in it:
+                if entry.is_file() and not entry.name.endswith(".tmp"):
+                    info = entry.stat()
+                    entries.append((info.st_mtime, info.st_size, entry.path))
+        return entries
+
+    def _evict(self):
+        with self._lock:
+            entries = self._entries()
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                    total -= size
+                except OSError:
+                    pass
+
+    def clear(self):
+        with self._lock:
+            for _, _, path in self._entries():
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def stats(self):
+        """
+        Cache counters and on-disk size, for reporting in the UI.
+        """
+        with self._lock:
+            entries = self._entries()
+            return {
+                "entries": len(entries),
+                "cached_bytes": sum(size for _, size, _ in entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "format": "parquet" if HAVE_PARQUET else "none",
+            }
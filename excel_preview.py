@@ -0,0 +1,99 @@
+import os
+from collections import namedtuple
+from zipfile import BadZipFile
+
+import openpyxl
+import pandas as pd
+from openpyxl.utils.exceptions import InvalidFileException
+
+from excel_batch import last_data_row
+
+# Cheap previews of uploaded Excel sheets.
+# The workbook is opened with openpyxl read_only=True, which streams the sheet XML, so a
+# preview reads only the header and the first few rows. The row count comes from the
+# sheet's dimension metadata. The full sheet is parsed (pd.read_excel) only when an
+# export actually needs it.
+
+DEFAULT_PREVIEW_ROWS = 5
+
+SheetPreview = namedtuple("SheetPreview", ["sheet_names", "sheet_name", "head", "row_count"])
+
+
+def _column_names(header):
+    # Name columns the way pd.read_excel does: blanks become "Unnamed: i", repeats get ".1", ".2", ...
+    names = []
+    seen = {}
+    for i, value in enumerate(header):
+        name = f"Unnamed: {i}" if value is None or (isinstance(value, str) and not value.strip()) else value
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
+
+
+def read_sheet_preview(source, sheet_name=None, n_rows=DEFAULT_PREVIEW_ROWS):
+    """
+    Reads the header, the first n_rows data rows and the data row count of one sheet.
+
+    Args:
+        source: Path or file-like object of the workbook.
+        sheet_name (str): Sheet to preview; the first sheet if None or not in the workbook.
+        n_rows (int): Number of data rows to include in head.
+
+    Returns:
+        SheetPreview: sheet_names, the sheet_name previewed, head (a DataFrame like
+        pd.read_excel(...).head(n_rows)) and row_count (data rows below the header). The
+        row count comes from the sheet's dimension, so it can include trailing blank rows
+        that still carry formatting.
+    """
+    # Legacy .xls and other formats openpyxl cannot stream fall back to a full parse. Uploads
+    # are file-like objects with a name; for those openpyxl raises BadZipFile, not
+    # InvalidFileException, on a non-xlsx file.
+    name = getattr(source, "name", source)
+    if isinstance(name, str) and os.path.splitext(name)[1].lower() == ".xls":
+        return _read_sheet_preview_pandas(source, sheet_name, n_rows)
+    if hasattr(source, "seek"):
+        source.seek(0)
+    try:
+        wb = openpyxl.load_workbook(source, read_only=True, data_only=True)
+    except (InvalidFileException, BadZipFile):
+        return _read_sheet_preview_pandas(source, sheet_name, n_rows)
+
+    try:
+        sheet_names = wb.sheetnames
+        if sheet_name not in sheet_names:
+            sheet_name = sheet_names[0]
+        ws = wb[sheet_name]
+        if not ws.max_row or ws.max_row <= 1:
+            # Missing or stub dimension (some writers always store A1): stream the real extent
+            ws.reset_dimensions()
+            last_row = last_data_row(ws)
+        else:
+            last_row = ws.max_row
+
+        rows = []
+        for values in ws.iter_rows(max_row=n_rows + 1, values_only=True):
+            rows.append(values)
+            if len(rows) > n_rows:
+                break
+    finally:
+        wb.close()
+
+    if not rows:
+        return SheetPreview(sheet_names, sheet_name, pd.DataFrame(), 0)
+    head = pd.DataFrame(rows[1:], columns=_column_names(rows[0]))
+    return SheetPreview(sheet_names, sheet_name, head, max(last_row - 1, 0))
+
+
+def _read_sheet_preview_pandas(source, sheet_name, n_rows):
+    if hasattr(source, "seek"):
+        source.seek(0)
+    excel_file = pd.ExcelFile(source)
+    sheet_names = excel_file.sheet_names
+    if sheet_name not in sheet_names:
+        sheet_name = sheet_names[0]
+    df = pd.read_excel(excel_file, sheet_name=sheet_name)
+    return SheetPreview(sheet_names, sheet_name, df.head(n_rows), len(df))
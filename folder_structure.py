@@ -0,0 +1,249 @@
+import os
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from itertools import groupby
+
+from modality_schema import (SchemaError, get_schema, modality_folder_name, sample_id_from_folder, sample_paths,
+                             stage_folder_name)
+from row_export import row_file_name, serialize_rows
+
+# Batch creation of the Run/Stage/Modality folder tree (the Data Structure Creator).
+# A plan lists every directory and file for a whole range of samples up front. Each
+# directory appears once, whatever number of samples share it, and parents come before
+# children, so the tree is built with one os.mkdir per directory, level by level, on a
+# bounded thread pool instead of repeated os.makedirs calls that re-check every parent.
+# File writes then run on the same pool. The layout of each run comes from the compiled
+# modality schema (see modality_schema.py); groups selects which of its groups to create.
+
+DEFAULT_FOLDER_WORKERS = 16
+
+SamplePlan = namedtuple("SamplePlan", ["sample_id", "row", "directories", "files"])
+FolderPlan = namedtuple("FolderPlan", ["save_location", "directories", "files", "samples", "skipped_rows", "duplicates"])
+SampleStatus = namedtuple("SampleStatus", ["sample_id", "row", "success", "created", "error"])
+FolderBuildResult = namedtuple("FolderBuildResult", ["manifest", "directories_created", "files_written", "dry_run", "elapsed"])
+
+
+def _check_groups(schema, groups):
+    unknown = [name for name in groups if name not in schema.groups]
+    if unknown:
+        raise SchemaError(f"Unknown folder group(s): {', '.join(unknown)}. Known: {', '.join(schema.groups)}")
+
+
+def plan_folder_structure(save_location, samples, groups, schema=None, skipped_rows=()):
+    """
+    Plans the folder tree for many samples.
+
+    Args:
+        save_location (str): Existing folder the Run= folders are created in.
+        samples: Iterable of (sample_id, row, csv_text) where csv_text is written to the
+            sample's CSV files and row is the source row number (or None). A sample ID that
+            appears more than once is planned once, with its last row (as row_export does).
+        groups: Names of the schema groups to create (e.g. ["fabrication", "inspection"]).
+        schema (CompiledSchema): Layout to use; the default schema file if None.
+        skipped_rows: Row numbers already rejected, carried into the plan for reporting.
+
+    Returns:
+        FolderPlan: unique directories (parents first), (path, text) files with unique
+        paths, a SamplePlan per sample, the skipped rows and the sample IDs that were
+        duplicated (one entry per extra occurrence).
+    """
+    schema = schema or get_schema()
+    _check_groups(schema, groups)
+    # Last row wins for a repeated sample ID, so no file is written twice concurrently
+    latest = {}
+    duplicates = []
+    for sample_id, row, csv_text in samples:
+        if sample_id in latest:
+            duplicates.append(sample_id)
+        latest[sample_id] = (row, csv_text)
+    directories = {}  # Insertion-ordered set
+    files = {}
+    sample_plans = []
+    for sample_id, (row, csv_text) in latest.items():
+        sample_dirs, sample_files = sample_paths(schema, save_location, sample_id, groups)
+        directories.update(dict.fromkeys(sample_dirs))
+        files.update((path, csv_text) for path in sample_files)
+        sample_plans.append(SamplePlan(sample_id, row, sample_dirs, sample_files))
+    ordered = sorted(directories, key=lambda path: path.count(os.sep))
+    return FolderPlan(save_location, ordered, list(files.items()), sample_plans, list(skipped_rows), duplicates)
+
+
+def plan_from_dataframe(df, save_location, start_row, end_row, groups, schema=None):
+    """
+    Plans the folder tree for rows start_row..end_row (1-based, inclusive) of df.
+
+    Each row's first column is its sample ID and its CSV holds the header plus that row.
+    Blank rows and rows without a usable sample ID end up in skipped_rows.
+    """
+    if start_row < 1 or end_row > len(df) or start_row > end_row:
+        raise ValueError(f"Invalid row range {start_row}-{end_row} for a sheet with {len(df)} rows.")
+    selected = df.iloc[start_row - 1:end_row]
+    header, rows = serialize_rows(selected)
+    blank = selected.isna().all(axis=1).to_numpy()
+    samples = []
+    skipped = []
+    for row_num, value, is_blank, row_text in zip(range(start_row, end_row + 1), selected.iloc[:, 0].tolist(), blank, rows):
+        sample_id = None if is_blank else row_file_name(value)
+        if sample_id is None:
+            skipped.append(row_num)
+        else:
+            samples.append((sample_id, row_num, header + row_text))
+    return plan_folder_structure(save_location, samples, groups, schema, skipped)
+
+
+def scan_runs(save_location, schema=None):
+    """
+    Returns {sample_id: run folder path} for the run folders directly under save_location.
+    """
+    schema = schema or get_schema()
+    runs = {}
+    with os.scandir(save_location) as entries:
+        for entry in entries:
+            sample_id = sample_id_from_folder(schema, entry.name)
+            if sample_id is not None and entry.is_dir():
+                runs[sample_id] = entry.path
+    return runs
+
+
+def _existing_names(path):
+    try:
+        with os.scandir(path) as entries:
+            return {entry.name for entry in entries if entry.is_dir()}
+    except (FileNotFoundError, NotADirectoryError):
+        return None
+
+
+def plan_add_modalities(save_location, stage, modalities, schema=None, workers=DEFAULT_FOLDER_WORKERS, layout=None):
+    """
+    Plans the folders needed to add modalities to every existing run under save_location.
+
+    The run folders are found with one scan of save_location, then each run's stage folder
+    is listed once (in parallel) and only missing stage and modality folders are planned.
+    Runs that already have everything are left out of the plan. With a layout from
+    DataCatalog.run_layout no folder is listed at all; folders the catalog missed are
+    reported as already existing when the plan is executed.
+
+    Args:
+        save_location (str): Folder holding the run folders.
+        stage (str): Stage name, e.g. "source_data".
+        modalities: Modality names, e.g. ["sem_c_0deg"] or a schema group's modalities.
+        schema (CompiledSchema): Folder patterns; the default schema file if None.
+        workers (int): Concurrent directory listings.
+        layout (dict): {sample_id: (run_path, {stage folder: modality folders})} to use
+            instead of scanning save_location.
+
+    Returns:
+        FolderPlan: With no files; skipped_rows and duplicates are always empty.
+
+    Raises:
+        SchemaError: If the stage or a modality name is not a valid folder name, as for
+            names in the schema.
+    """
+    schema = schema or get_schema()
+    stage_folder = stage_folder_name(schema, stage)
+    modality_folders = [modality_folder_name(schema, m) for m in modalities]
+    if layout is not None:
+        runs = sorted((sample_id, run_dir) for sample_id, (run_dir, _) in layout.items())
+        existing = [layout[sample_id][1].get(stage_folder) for sample_id, _ in runs]
+        stage_dirs = [os.path.join(run_dir, stage_folder) for _, run_dir in runs]
+    else:
+        runs = sorted(scan_runs(save_location, schema).items())
+        stage_dirs = [os.path.join(run_dir, stage_folder) for _, run_dir in runs]
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            existing = list(pool.map(_existing_names, stage_dirs))
+
+    directories = []
+    sample_plans = []
+    for (sample_id, _), stage_dir, names in zip(runs, stage_dirs, existing):
+        missing = [] if names is not None else [stage_dir]
+        missing.extend(os.path.join(stage_dir, folder) for folder in modality_folders
+                       if names is None or folder not in names)
+        if missing:
+            directories.extend(missing)
+            sample_plans.append(SamplePlan(sample_id, None, missing, []))
+    directories.sort(key=lambda path: path.count(os.sep))
+    return FolderPlan(save_location, directories, [], sample_plans, [], [])
+
+
+def _mkdir(path):
+    try:
+        os.mkdir(path)
+        return path, True, None
+    except FileExistsError:
+        if os.path.isdir(path):
+            return path, False, None
+        return path, False, f"'{path}' exists and is not a directory"
+    except OSError as e:
+        return path, False, str(e)
+
+
+def _write_file(item):
+    path, text = item
+    try:
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            f.write(text)
+        return path, None
+    except OSError as e:
+        return path, str(e)
+
+
+def execute_folder_plan(plan, workers=DEFAULT_FOLDER_WORKERS, dry_run=False):
+    """
+    Creates the planned directories and files on a thread pool.
+
+    Directories are created one depth level at a time so every parent exists before its
+    children. A failure only affects the samples whose paths it touches.
+
+    Args:
+        plan (FolderPlan): From plan_folder_structure or plan_from_dataframe.
+        workers (int): Maximum concurrent filesystem operations.
+        dry_run (bool): Report the plan as if it succeeded without touching the disk.
+
+    Returns:
+        FolderBuildResult: a SampleStatus per sample (success, created directories, first
+        error), counts of directories newly created and files written, and elapsed seconds.
+    """
+    started = time.perf_counter()
+    if dry_run:
+        manifest = [SampleStatus(s.sample_id, s.row, True, s.directories, None) for s in plan.samples]
+        return FolderBuildResult(manifest, len(plan.directories), len(plan.files), True, time.perf_counter() - started)
+
+    errors = {}
+    directories_created = 0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for _, level in groupby(plan.directories, key=lambda path: path.count(os.sep)):
+            for path, created, error in pool.map(_mkdir, list(level)):
+                directories_created += created
+                if error:
+                    errors[path] = error
+        file_results = list(pool.map(_write_file, plan.files))
+    for path, error in file_results:
+        if error:
+            errors[path] = error
+
+    manifest = []
+    for sample in plan.samples:
+        error = next((errors[p] for p in sample.directories + sample.files if p in errors), None)
+        manifest.append(SampleStatus(sample.sample_id, sample.row, error is None, sample.directories, error))
+    files_written = sum(1 for _, error in file_results if error is None)
+    return FolderBuildResult(manifest, directories_created, files_written, False, time.perf_counter() - started)
+
+
+def format_plan(plan, max_samples=50):
+    """
+    Returns a printable tree of the plan, listing at most max_samples samples.
+    """
+    lines = [f"{plan.save_location}: {len(plan.samples)} sample(s), {len(plan.directories)} folder(s), "
+             f"{len(plan.files)} file(s)"]
+    for sample in plan.samples[:max_samples]:
+        for path in sample.directories + sample.files:
+            lines.append("  " + os.path.relpath(path, plan.save_location))
+    if len(plan.samples) > max_samples:
+        lines.append(f"  ... and {len(plan.samples) - max_samples} more sample(s)")
+    if plan.skipped_rows:
+        lines.append(f"Skipped rows (blank or no sample ID): {', '.join(map(str, plan.skipped_rows))}")
+    if plan.duplicates:
+        lines.append(f"Duplicate sample IDs (last row kept): {', '.join(map(str, dict.fromkeys(plan.duplicates)))}")
+    return "\n".join(lines)
+
@@ -0,0 +1,139 @@
+import numpy as np
+
+from line_geometry import lines_to_array
+
+# Motion-time and throughput estimates for toolpaths in the (N, 2, 2) line representation.
+# Units follow the Line Scaling table: coordinates in mm, speed in mm/s, t_cycle and t_pulse
+# in ms. Each segment is cut at its own speed and fires one pulse of t_pulse ms every
+# t_cycle ms while cutting. Between segments the head makes an idle (non-cutting) move
+# from the end of one segment to the start of the next at rapid_speed.
+
+DEFAULT_RAPID_SPEED = 500.0  # mm/s
+
+
+def segment_lengths(arr):
+    """
+    Returns the length of every segment, shape (N,).
+    """
+    arr = lines_to_array(arr)
+    return np.hypot(arr[:, 1, 0] - arr[:, 0, 0], arr[:, 1, 1] - arr[:, 0, 1])
+
+
+def idle_distances(arr):
+    """
+    Returns the idle travel from the end of each segment to the start of the next, shape (N - 1,).
+    """
+    arr = lines_to_array(arr)
+    gaps = arr[1:, 0] - arr[:-1, 1]
+    return np.hypot(gaps[:, 0], gaps[:, 1])
+
+
+def move_times(distances, speeds, acceleration=None):
+    """
+    Time in seconds to travel each distance at the given speed.
+
+    With acceleration (mm/s^2) each move follows a trapezoidal profile from and to rest:
+    moves too short to reach full speed follow a triangular profile instead.
+    Non-positive or missing speeds give NaN.
+    """
+    distances = np.asarray(distances, dtype=np.float64)
+    speeds = np.broadcast_to(np.asarray(speeds, dtype=np.float64), distances.shape)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        valid_speed = np.where(speeds > 0, speeds, np.nan)
+        if not acceleration:
+            return distances / valid_speed
+        # Distance spent accelerating to and decelerating from full speed
+        ramp_distance = valid_speed ** 2 / acceleration
+        trapezoid = distances / valid_speed + valid_speed / acceleration
+        triangle = 2.0 * np.sqrt(distances / acceleration)
+        return np.where(distances >= ramp_distance, trapezoid, triangle)
+
+
+def toolpath_metrics(arr, speed, t_cycle, t_pulse, rapid_speed=DEFAULT_RAPID_SPEED, acceleration=None):
+    """
+    Computes path length, travel time, pulse counts and estimated cycle time for a toolpath.
+
+    Args:
+        arr: Lines of shape (N, 2, 2) or in the tuple format.
+        speed: Cutting speed per segment (mm/s), shape (N,).
+        t_cycle: Pulse period per segment (ms), shape (N,).
+        t_pulse: Pulse width per segment (ms), shape (N,).
+        rapid_speed (float): Speed of idle moves between segments (mm/s).
+        acceleration (float): Optional acceleration limit (mm/s^2) for trapezoidal profiles.
+
+    Returns:
+        dict: path_length_mm, idle_length_mm, cutting_time_s, idle_time_s, cycle_time_s,
+        pulse_count, pulse_on_time_s and invalid_segments (segments with no usable speed).
+    """
+    arr = lines_to_array(arr)
+    lengths = segment_lengths(arr)
+    cutting_times = move_times(lengths, speed, acceleration)
+    idle = idle_distances(arr)
+    idle_times = move_times(idle, rapid_speed, acceleration)
+
+    t_cycle = np.asarray(t_cycle, dtype=np.float64)
+    t_pulse = np.asarray(t_pulse, dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        pulses = np.floor(cutting_times * 1000.0 / np.where(t_cycle > 0, t_cycle, np.nan))
+    pulses = np.nan_to_num(pulses, nan=0.0, posinf=0.0)
+
+    cutting_time = float(np.nansum(cutting_times))
+    idle_time = float(np.nansum(idle_times))
+    return {
+        "path_length_mm": float(lengths.sum()),
+        "idle_length_mm": float(idle.sum()),
+        "cutting_time_s": cutting_time,
+        "idle_time_s": idle_time,
+        "cycle_time_s": cutting_time + idle_time,
+        "pulse_count": int(pulses.sum()),
+        "pulse_on_time_s": float(np.sum(pulses * np.nan_to_num(t_pulse)) / 1000.0),
+        "invalid_segments": int(np.count_nonzero(np.isnan(cutting_times))),
+    }
+
+
+# How speed and timing follow a change of line length when scaling:
+#   none    - speed, t_cycle and t_pulse are copied through unchanged
+#   time    - speed scales with the line length so each line (and the whole job) takes the
+#             same time; t_cycle/t_pulse unchanged, so pulses per line are kept and their
+#             spacing along the line stretches with it
+#   spacing - speed scales as for "time", and t_cycle/t_pulse scale inversely so the pulse
+#             spacing along the line (speed x t_cycle) and the duty cycle stay the same
+PRESERVE_MODES = ("none", "time", "spacing")
+
+
+def rescale_process_parameters(original, scaled, speed, t_cycle, t_pulse, preserve="time"):
+    """
+    Recomputes per-line speed and timing for scaled lines.
+
+    Works in one broadcast pass: scaled may be (N, 2, 2) or a stack of candidates (M, N, 2, 2),
+    and the results broadcast to match. Zero-length lines keep their parameters.
+
+    Args:
+        original: Original lines, (N, 2, 2).
+        scaled: Scaled lines, (N, 2, 2) or (M, N, 2, 2).
+        speed, t_cycle, t_pulse: Per-line parameters, shape (N,).
+        preserve (str): One of PRESERVE_MODES.
+
+    Returns:
+        tuple: (speed, t_cycle, t_pulse) arrays, shape (N,) or (M, N).
+    """
+    if preserve not in PRESERVE_MODES:
+        raise ValueError(f"Unknown preserve mode '{preserve}'. Use one of: {', '.join(PRESERVE_MODES)}")
+    speed = np.asarray(speed, dtype=np.float64)
+    t_cycle = np.asarray(t_cycle, dtype=np.float64)
+    t_pulse = np.asarray(t_pulse, dtype=np.float64)
+    scaled = np.asarray(scaled, dtype=np.float64)
+    if preserve == "none":
+        shape = scaled.shape[:-2]
+        return np.broadcast_to(speed, shape), np.broadcast_to(t_cycle, shape), np.broadcast_to(t_pulse, shape)
+
+    original_lengths = segment_lengths(original)
+    scaled_lengths = np.hypot(scaled[..., 1, 0] - scaled[..., 0, 0], scaled[..., 1, 1] - scaled[..., 0, 1])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = np.where(original_lengths > 0, scaled_lengths / original_lengths, 1.0)
+    new_speed = speed * ratio
+    if preserve == "time":
+        return new_speed, np.broadcast_to(t_cycle, ratio.shape), np.broadcast_to(t_pulse, ratio.shape)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        inverse = np.where(ratio > 0, 1.0 / ratio, 1.0)
+    return new_speed, t_cycle * inverse, t_pulse * inverse
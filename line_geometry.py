@@ -0,0 +1,202 @@
+import numpy as np
+
+# Line geometry core for the Line Scaling tool.
+# Lines are held as an (N, 2, 2) float64 array: lines[i, 0] is the start point
+# and lines[i, 1] the end point of segment i, each as (x, y). Every transform
+# below works on the whole array in one batched NumPy operation.
+
+
+def lines_to_array(lines):
+    """
+    Converts lines in the ((x1, y1), (x2, y2)) tuple format to an (N, 2, 2) array.
+
+    Args:
+        lines: A list of ((x1, y1), (x2, y2)) tuples or anything array-like with that shape.
+
+    Returns:
+        np.ndarray: A float64 array of shape (N, 2, 2).
+    """
+    if isinstance(lines, np.ndarray) and lines.dtype == np.float64 and lines.ndim == 3:
+        arr = lines
+    else:
+        arr = np.asarray(lines, dtype=np.float64)
+    if arr.size == 0:
+        return np.empty((0, 2, 2), dtype=np.float64)
+    if arr.ndim != 3 or arr.shape[1:] != (2, 2):
+        raise ValueError(f"Expected lines of shape (N, 2, 2), got {arr.shape}")
+    return arr
+
+
+def array_to_lines(arr):
+    """
+    Converts an (N, 2, 2) array back to a list of ((x1, y1), (x2, y2)) tuples.
+    """
+    arr = lines_to_array(arr)
+    return list(zip(map(tuple, arr[:, 0].tolist()), map(tuple, arr[:, 1].tolist())))
+
+
+def affine_transform(arr, matrix):
+    """
+    Applies a 2D affine transform to every point of every line.
+
+    Args:
+        arr (np.ndarray): Lines of shape (N, 2, 2).
+        matrix: A 2x2 linear part, a 2x3 [A | b] matrix or a 3x3 homogeneous matrix.
+
+    Returns:
+        np.ndarray: The transformed lines, shape (N, 2, 2).
+    """
+    arr = lines_to_array(arr)
+    m = np.asarray(matrix, dtype=np.float64)
+    if m.shape == (2, 2):
+        linear, offset = m, np.zeros(2)
+    elif m.shape in ((2, 3), (3, 3)):
+        linear, offset = m[:2, :2], m[:2, 2]
+    else:
+        raise ValueError(f"Affine matrix must be 2x2, 2x3 or 3x3, got {m.shape}")
+    return arr @ linear.T + offset
+
+
+def translate(arr, dx, dy):
+    """
+    Shifts all lines by (dx, dy).
+    """
+    return lines_to_array(arr) + np.array([dx, dy], dtype=np.float64)
+
+
+def scale(arr, scale_x, scale_y, origin=(0.0, 0.0)):
+    """
+    Scales all lines by (scale_x, scale_y) about the given origin.
+    """
+    origin = np.asarray(origin, dtype=np.float64)
+    factors = np.array([scale_x, scale_y], dtype=np.float64)
+    return (lines_to_array(arr) - origin) * factors + origin
+
+
+def rotate(arr, angle_deg, origin=(0.0, 0.0)):
+    """
+    Rotates all lines counter-clockwise by angle_deg degrees about the given origin.
+    """
+    theta = np.deg2rad(angle_deg)
+    c, s = np.cos(theta), np.sin(theta)
+    origin = np.asarray(origin, dtype=np.float64)
+    rotation = np.array([[c, -s], [s, c]])
+    return (lines_to_array(arr) - origin) @ rotation.T + origin
+
+
+def scale_lines_array(arr, old_area, new_area):
+    """
+    Array counterpart of scale_lines: scales lines from old_area to new_area.
+
+    Args:
+        arr: Lines of shape (N, 2, 2) or in the tuple format.
+        old_area (tuple): (width, height) of the original working area.
+        new_area (tuple): (width, height) of the new working area.
+
+    Returns:
+        np.ndarray: The scaled lines, shape (N, 2, 2).
+    """
+    old_width, old_height = old_area
+    new_width, new_height = new_area
+    if old_width == 0 or old_height == 0:
+        raise ValueError("Original working area must have a non-zero width and height.")
+    return scale(arr, new_width / old_width, new_height / old_height)
+
+
+# Scaling modes for fitting lines from the original working area into a new one:
+#   stretch        - independent x/y scaling (the original scale_lines behaviour)
+#   uniform        - one factor for both axes, the largest that fits, anchored at the origin
+#   uniform_center - as uniform, centred in the new area
+#   margin         - independent x/y scaling into the new area shrunk by a per-axis margin
+SCALE_MODES = ("stretch", "uniform", "uniform_center", "margin")
+
+
+def area_scale_offset(old_area, new_areas, mode="stretch", margin=(0.0, 0.0), offset=(0.0, 0.0)):
+    """
+    Computes the per-axis scale factors and offsets that map old_area onto each new area.
+
+    Args:
+        old_area (tuple): (width, height) of the original working area.
+        new_areas: One (width, height) pair or an (M, 2) array of candidate areas.
+        mode (str): One of SCALE_MODES.
+        margin (tuple): (x, y) margin kept clear on each side in "margin" mode.
+        offset (tuple): Extra (x, y) shift added in every mode.
+
+    Returns:
+        tuple: (scale, offset) arrays shaped like new_areas, i.e. (2,) or (M, 2).
+    """
+    if mode not in SCALE_MODES:
+        raise ValueError(f"Unknown scaling mode '{mode}'. Use one of: {', '.join(SCALE_MODES)}")
+    old = np.asarray(old_area, dtype=np.float64)
+    if np.any(old == 0):
+        raise ValueError("Original working area must have a non-zero width and height.")
+    new = np.asarray(new_areas, dtype=np.float64)
+    margin = np.asarray(margin, dtype=np.float64)
+    shift = np.broadcast_to(np.asarray(offset, dtype=np.float64), new.shape).copy()
+
+    if mode == "stretch":
+        factors = new / old
+    elif mode == "margin":
+        factors = (new - 2 * margin) / old
+        shift += margin
+    else:
+        uniform = (new / old).min(axis=-1, keepdims=True)
+        factors = np.broadcast_to(uniform, new.shape).copy()
+        if mode == "uniform_center":
+            shift += (new - old * factors) / 2
+    return factors, shift
+
+
+def scale_lines_to_areas(arr, old_area, new_areas, mode="stretch", margin=(0.0, 0.0), offset=(0.0, 0.0)):
+    """
+    Scales lines into one or many new working areas in a single broadcast operation.
+
+    Args:
+        arr: Lines of shape (N, 2, 2) or in the tuple format.
+        old_area (tuple): (width, height) of the original working area.
+        new_areas: One (width, height) pair, or an (M, 2) array of candidate areas.
+        mode, margin, offset: See area_scale_offset.
+
+    Returns:
+        np.ndarray: (N, 2, 2) for a single area, (M, N, 2, 2) for M areas.
+    """
+    factors, shift = area_scale_offset(old_area, new_areas, mode, margin, offset)
+    arr = lines_to_array(arr)
+    if factors.ndim == 1:
+        return arr * factors + shift
+    return arr[None] * factors[:, None, None, :] + shift[:, None, None, :]
+
+
+def out_of_bounds_mask(arr, area):
+    """
+    Flags coordinates that fall outside the working area, in one vectorized comparison.
+
+    Args:
+        arr: Lines of shape (N, 2, 2) or in the tuple format. NaN coordinates are never flagged.
+        area (tuple): (width, height) of the working area.
+
+    Returns:
+        np.ndarray: Boolean mask of shape (N, 4), columns ordered X start, Y start, X end, Y end.
+    """
+    flat = lines_to_array(arr).reshape(-1, 4)
+    width, height = area
+    upper = np.array([width, height, width, height], dtype=np.float64)
+    # Comparisons with NaN are False, so missing values are never out of bounds
+    return (flat < 0) | (flat > upper)
+
+
+def out_of_bounds_summary(mask, columns=("X start", "Y start", "X end", "Y end")):
+    """
+    Summarises an out_of_bounds_mask as a count and the offending row indices per column.
+
+    Returns:
+        dict: {column: {"count": int, "indices": np.ndarray}} plus "rows" (indices of rows
+        with any out-of-bounds coordinate).
+    """
+    mask = np.asarray(mask, dtype=bool)
+    summary = {}
+    for col_idx, column in enumerate(columns):
+        indices = np.flatnonzero(mask[:, col_idx])
+        summary[column] = {"count": int(indices.size), "indices": indices}
+    summary["rows"] = np.flatnonzero(mask.any(axis=1))
+    return summary
@@ -0,0 +1,225 @@
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict
+
+import matplotlib.pyplot as plt
+import numpy as np
+from matplotlib.collections import LineCollection
+
+from line_geometry import lines_to_array
+
+DEFAULT_PLOT_COLORS = ['blue', 'green', 'red', 'cyan', 'magenta', 'yellow', 'purple', 'orange', 'brown']
+# Above this many segments the collection renderer decimates to pixel resolution
+LOD_DECIMATE_THRESHOLD = 20000
+
+
+def decimate_lines(arr, pixel_size):
+    """
+    Level-of-detail decimation: drops segments that are indistinguishable at the given pixel size.
+
+    Endpoints are snapped to a pixel grid and only the first segment for each distinct
+    (start pixel, end pixel) pair is kept, so the drawn picture is unchanged at that resolution.
+
+    Args:
+        arr (np.ndarray): Lines of shape (N, 2, 2).
+        pixel_size (float): Size of one screen pixel in data units.
+
+    Returns:
+        np.ndarray: Sorted indices of the segments to draw.
+    """
+    arr = lines_to_array(arr)
+    if len(arr) == 0 or pixel_size <= 0:
+        return np.arange(len(arr))
+    snapped = np.floor(arr.reshape(len(arr), 4) / pixel_size).astype(np.int64)
+    _, keep = np.unique(snapped, axis=0, return_index=True)
+    keep.sort()
+    return keep
+
+
+def _unique_points(points, pixel_size):
+    # Indices of the first point in each occupied pixel
+    snapped = np.floor(points / pixel_size).astype(np.int64)
+    _, keep = np.unique(snapped, axis=0, return_index=True)
+    keep.sort()
+    return keep
+
+
+def draw_lines_collection(lines, area, title="Lines", colors_list=None, decimate_threshold=LOD_DECIMATE_THRESHOLD,
+                          figsize=(8, 8), dpi=100):
+    """
+    Draws lines as a single LineCollection plus one scatter for the endpoints.
+
+    The figure matches draw_lines (working-area frame, annotations, per-line colours
+    cycled from colors_list), but the artist count no longer grows with the number of
+    segments. Once there are more than decimate_threshold segments, lines and
+    endpoints are decimated to the visible pixel resolution.
+
+    Args:
+        lines: Lines in the ((x1, y1), (x2, y2)) tuple format or an (N, 2, 2) array.
+        area (tuple): (width, height) of the working area.
+        title (str): Plot title.
+        colors_list (list): Colours cycled per line; defaults to DEFAULT_PLOT_COLORS.
+        decimate_threshold (int): Segment count above which decimation kicks in. None disables it.
+        figsize (tuple): Figure size in inches.
+        dpi (int): Figure resolution, used to work out the pixel size for decimation.
+
+    Returns:
+        matplotlib.figure.Figure: The rendered figure.
+    """
+    arr = lines_to_array(lines)
+    width, height = area
+    fig, ax = plt.subplots(figsize=figsize, dpi=dpi)
+    x_max, y_max = width * 1.08, height * 1.08
+    ax.set_xlim(0, x_max)
+    ax.set_ylim(0, y_max)
+    ax.set_aspect('equal', adjustable='box')
+
+    # Draw the working area edges
+    ax.plot([0, width, width, 0, 0], [0, 0, height, height, 0], color='black', linestyle='-', linewidth=3)
+
+    colors_to_use = colors_list if colors_list is not None and len(colors_list) > 0 else DEFAULT_PLOT_COLORS
+    palette = np.asarray(colors_to_use, dtype=object)
+
+    indices = np.arange(len(arr))
+    pixel_size = None
+    if decimate_threshold is not None and len(arr) > decimate_threshold:
+        # Data units per pixel along the more densely packed axis
+        bbox = ax.get_position()
+        fig_w_px, fig_h_px = fig.get_size_inches() * fig.dpi
+        pixel_size = min(x_max / (bbox.width * fig_w_px), y_max / (bbox.height * fig_h_px))
+        indices = decimate_lines(arr, pixel_size)
+
+    if len(indices):
+        drawn = arr[indices]
+        line_colors = palette[indices % len(palette)]
+        ax.add_collection(LineCollection(drawn, colors=line_colors))
+
+        points = drawn.reshape(-1, 2)
+        point_colors = np.repeat(line_colors, 2)
+        if pixel_size is not None:
+            keep = _unique_points(points, pixel_size)
+            points, point_colors = points[keep], point_colors[keep]
+        ax.scatter(points[:, 0], points[:, 1], c=list(point_colors), s=20, zorder=3)
+
+    # Annotate the width and height of the working area
+    ax.annotate(f"Width: {width}", xy=(width / 2, height * 1.02), ha='center', fontsize=10, color='blue')
+    ax.annotate(f"Height: {height}", xy=(width * 1.02, height / 2), va='center', rotation=-90, fontsize=10, color='blue')
+
+    if pixel_size is not None and len(indices) < len(arr):
+        title = f"{title} ({len(indices):,} of {len(arr):,} segments shown)"
+    ax.set_title(title)
+    ax.set_xlabel("Width")
+    ax.set_ylabel("Height")
+    ax.grid(True)
+
+    return fig
+
+
+def geometry_hash(lines, area, colors_list=None, *extra):
+    """
+    Returns a hex digest identifying a rendering of lines in area with colors_list.
+
+    Any extra arguments (title, render mode, ...) are folded into the key as well.
+    """
+    arr = np.ascontiguousarray(lines_to_array(lines))
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(str(arr.shape).encode())
+    digest.update(arr.tobytes())
+    digest.update(repr((tuple(area), tuple(colors_list or ()), extra)).encode())
+    return digest.hexdigest()
+
+
+def figure_to_png(fig, dpi=None):
+    """
+    Rasterizes a figure to PNG bytes and closes it, so no pyplot figure outlives the call.
+    """
+    buffer = io.BytesIO()
+    try:
+        fig.savefig(buffer, format='png', bbox_inches='tight', dpi=dpi)
+    finally:
+        plt.close(fig)
+    return buffer.getvalue()
+
+
+def process_memory_bytes():
+    """
+    Resident memory of the current process in bytes, or None if it cannot be determined.
+    """
+    try:
+        import psutil  # Optional dependency
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+class FigureCache:
+    """
+    Bounded LRU cache of rendered figures stored as PNG bytes.
+
+    Figures are closed as soon as they are rasterized, and the cache is bounded both by
+    entry count and by total bytes, so memory stays flat however many reruns hit it.
+    """
+
+    def __init__(self, max_entries=32, max_bytes=64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.renders = 0
+
+    def get_or_render(self, key, render_fn):
+        """
+        Returns the PNG bytes for key, calling render_fn() to build the figure on a miss.
+        """
+        with self._lock:
+            png = self._entries.get(key)
+            if png is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return png
+            self.misses += 1
+
+        png = figure_to_png(render_fn())
+
+        with self._lock:
+            self.renders += 1
+            if key not in self._entries:
+                self._entries[key] = png
+                self._bytes += len(png)
+            self._evict()
+        return png
+
+    def _evict(self):
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """
+        Cache counters plus open pyplot figures and process memory, for reporting in the UI.
+        """
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "cached_bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "renders": self.renders,
+                "open_figures": len(plt.get_fignums()),
+                "process_memory_bytes": process_memory_bytes(),
+            }
@@ -0,0 +1,271 @@
+import json
+import threading
+from collections import deque, namedtuple
+
+from machine_store import MachineStore
+
+# Machine status for server.py and server_ngrok.py, with change notification.
+# The hub keeps an in-memory mirror of a MachineStore (shared with the Streamlit app and
+# other processes through SQLite). Its own writes are mirrored at once; writes from other
+# processes are picked up by a watcher thread that checks the database every
+# STORE_POLL_SECONDS. Every change has a version number and is logged, so a client that
+# has seen version v can be sent just the machines changed since v (a delta). The push endpoint
+# /api/machine-status/stream speaks Server-Sent Events:
+#
+#   retry: 3000                       reconnect delay for the browser's EventSource
+#   id: <version>                     echoed back as Last-Event-ID on reconnect
+#   event: snapshot | delta | heartbeat
+#   data: {"version": v, "machines": [...]}   (all machines, changed machines with
+#                                             "delta": true, or none)
+#
+# A reconnecting client gets the deltas it missed, or a full snapshot if they are no
+# longer in the log. Heartbeats keep proxies from closing idle streams and let the page
+# detect a dead connection.
+#
+# Polling clients use GET /api/machine-status. Each payload (the snapshot, or the delta
+# for a ?since=<version>) is serialized once per version and the bytes are reused until
+# the next change. The ETag names the version, so an unchanged floor answers
+# If-None-Match with a bodiless 304.
+
+HEARTBEAT_SECONDS = 15
+RECONNECT_MILLISECONDS = 3000
+CHANGE_LOG_SIZE = 1024
+STORE_POLL_SECONDS = 0.2
+
+StatusUpdate = namedtuple("StatusUpdate", ["event", "version", "machines", "data"])
+StatusResponse = namedtuple("StatusResponse", ["status", "headers", "body"])
+
+
+class MachineStateHub:
+    """
+    Versioned mirror of a MachineStore with a log of recent changes. Thread-safe;
+    wait_for_update blocks until something changes or the timeout passes.
+
+    Args:
+        store (MachineStore): Where the status lives; the shared default database if None.
+        log_size (int): Changes remembered for delta updates.
+        poll_interval (float): Seconds between checks for writes by other processes;
+            None to skip the watcher thread.
+    """
+
+    def __init__(self, store=None, log_size=CHANGE_LOG_SIZE, poll_interval=STORE_POLL_SECONDS):
+        self.store = store if store is not None else MachineStore()
+        self._machines = {}
+        self._version = 0
+        self._log = deque(maxlen=log_size)  # (version, machine id)
+        self._changed = threading.Condition()
+        self._encoded = {}  # since -> StatusUpdate for the current version
+        self._epoch = self.store.epoch  # Same ETags from every server on this database
+        self.closed = False
+        self._stop = threading.Event()
+        self.sync(reload=True)
+        if poll_interval is not None:
+            threading.Thread(target=self._watch, args=(poll_interval,), daemon=True, name="machine-state-watch").start()
+
+    @property
+    def version(self):
+        return self._version
+
+    def close(self):
+        """Ends every open stream and the watcher (e.g. on server shutdown)."""
+        self._stop.set()
+        with self._changed:
+            self.closed = True
+            self._changed.notify_all()
+
+    def _watch(self, poll_interval):
+        failing = False
+        while not self._stop.wait(poll_interval):
+            try:
+                if self.store.data_changed():
+                    self.sync()
+            except Exception as e:  # Keep watching through a locked or briefly missing database
+                if not failing:  # Report an outage once, not on every poll
+                    print(f"Machine state watcher: {e} (retrying every {poll_interval} s)")
+                    failing = True
+                continue
+            if failing:
+                print("Machine state watcher: database available again")
+                failing = False
+
+    def sync(self, reload=False):
+        """
+        Pulls the changes committed since the mirrored version and wakes waiting clients.
+        """
+        with self._changed:
+            version, changes, machines = self.store.changes_since(None if reload else self._version)
+            if version == self._version and not reload:
+                return
+            if changes is None:
+                # Too far behind for the store's log: take every machine, and drop our
+                # log so clients behind this point get a snapshot
+                self._machines = {m['id']: m for m in machines}
+                self._log.clear()
+            else:
+                self._log.extend(changes)
+                self._machines.update((m['id'], m) for m in machines)
+            self._version = version
+            self._encoded.clear()
+            self._changed.notify_all()
+
+    def snapshot(self):
+        """Returns a copy of the status as {'machines': [...]}."""
+        with self._changed:
+            return {'machines': [dict(m) for m in self._machines.values()]}
+
+    def update_machine(self, machine_id, **fields):
+        """
+        Sets fields on a machine in the store and notifies waiting clients if anything changed.
+
+        Returns:
+            bool: False if the machine is unknown or nothing changed.
+        """
+        changed = self.store.update_machine(machine_id, **fields)
+        if changed:
+            self.sync()
+        return changed
+
+    def apply_command(self, machine_id, action):
+        """
+        Applies a control action ('start', 'stop' or 'maintenance'); returns True if the status changed.
+        """
+        changed = self.store.apply_command(machine_id, action)
+        if changed:
+            self.sync()
+        return changed
+
+    def _update_since(self, since):
+        # Caller holds the lock. Encoded once per version and since, then reused.
+        key = None if since is None or since > self._version else since
+        update = self._encoded.get(key)
+        if update is not None:
+            return update
+        if key is None or (self._log and key < self._log[0][0] - 1) or (not self._log and key != self._version):
+            event, machines = 'snapshot', [dict(m) for m in self._machines.values()]
+        else:
+            changed = dict.fromkeys(machine_id for version, machine_id in self._log if version > key)
+            event, machines = 'delta', [dict(self._machines[i]) for i in changed]
+        payload = {'version': self._version, 'machines': machines}
+        if event == 'delta':
+            payload['delta'] = True
+        data = json.dumps(payload).encode()
+        update = StatusUpdate(event, self._version, machines, data)
+        self._encoded[key] = update
+        return update
+
+    def etag(self, since=None):
+        """
+        Returns the ETag of the current response for since. A delta's tag names the version
+        it starts from, so it never matches the snapshot's (or another delta's).
+        """
+        with self._changed:
+            if self._update_since(since).event == 'delta':
+                return f'"{self._epoch}-{self._version}-d{since}"'
+            return f'"{self._epoch}-{self._version}"'
+
+    def status_response(self, since=None, if_none_match=None):
+        """
+        Builds the /api/machine-status response from the cached encoding of this version.
+
+        Args:
+            since (int): Version the client has; the body then lists only the machines
+                changed since (with "delta": true), or every machine if that is too old.
+            if_none_match (str): The request's If-None-Match header.
+
+        Returns:
+            StatusResponse: 304 with no body if the client's ETag matches this response,
+            otherwise 200 with the JSON body bytes.
+        """
+        with self._changed:
+            update = self._update_since(since)
+            etag = self.etag(since)
+        headers = [('ETag', etag), ('Cache-Control', 'no-cache')]
+        if if_none_match:
+            candidates = [tag.strip() for tag in if_none_match.split(',')]
+            if '*' in candidates or etag in [tag[2:] if tag.startswith('W/') else tag for tag in candidates]:
+                return StatusResponse(304, headers, b'')
+        headers.append(('Content-Type', 'application/json'))
+        return StatusResponse(200, headers, update.data)
+
+    def wait_for_update(self, since, timeout=HEARTBEAT_SECONDS):
+        """
+        Returns the update a client at version since needs, waiting up to timeout seconds
+        for a change.
+
+        Args:
+            since (int): Last version the client has, or None for a full snapshot.
+
+        Returns:
+            StatusUpdate: 'snapshot' (every machine), 'delta' (machines changed since
+            since) or 'heartbeat' (nothing changed within timeout).
+        """
+        with self._changed:
+            if since is None or since != self._version:
+                return self._update_since(since)
+            self._changed.wait_for(lambda: self._version != since or self.closed, timeout)
+            if self._version == since:
+                return StatusUpdate('heartbeat', since, [], b'{"version": %d, "machines": []}' % since)
+            return self._update_since(since)
+
+
+_shared_hub = None
+_shared_hub_lock = threading.Lock()
+
+
+def shared_hub():
+    """
+    Returns this process's MachineStateHub on the default store, opening it on first use,
+    so importing a server module does not open the database or start the watcher.
+    """
+    global _shared_hub
+    with _shared_hub_lock:
+        if _shared_hub is None:
+            _shared_hub = MachineStateHub()
+        return _shared_hub
+
+
+def close_shared_hub():
+    """Closes the hub returned by shared_hub(), if it was opened."""
+    global _shared_hub
+    with _shared_hub_lock:
+        if _shared_hub is not None:
+            _shared_hub.close()
+            _shared_hub = None
+
+
+def parse_last_event_id(value):
+    """Returns the version in a Last-Event-ID header or ?since= value, or None."""
+    try:
+        return int(value) if value else None
+    except ValueError:
+        return None
+
+
+def format_sse(update, retry=None):
+    """
+    Encodes a StatusUpdate as one Server-Sent Events message (bytes).
+    """
+    lines = []
+    if retry is not None:
+        lines.append(f"retry: {retry}")
+    if update.event != 'heartbeat':
+        lines.append(f"id: {update.version}")
+    lines.append(f"event: {update.event}")
+    return ("\n".join(lines) + "\ndata: ").encode() + update.data + b"\n\n"
+
+
+def sse_stream(hub, last_event_id=None, heartbeat=HEARTBEAT_SECONDS):
+    """
+    Yields the SSE messages for one client until the hub is closed.
+
+    The first message carries the reconnect delay, and is a snapshot, or the deltas missed
+    since Last-Event-ID when the client is reconnecting.
+    """
+    since = parse_last_event_id(last_event_id)
+    update = hub.wait_for_update(since, 0)
+    yield format_sse(update, retry=RECONNECT_MILLISECONDS)
+    since = update.version
+    while not hub.closed:
+        update = hub.wait_for_update(since, heartbeat)
+        yield format_sse(update)
+        since = update.version
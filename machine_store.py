@@ -0,0 +1,213 @@
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+# Machine status shared by the Streamlit app, server.py and server_ngrok.py (and any
+# equipment adapter), stored in one SQLite database in WAL mode.
+# WAL lets readers in every process run while one writer commits. With synchronous=NORMAL
+# a commit does not wait for an fsync, so single-row updates run in the thousands per
+# second, and update_many applies a whole batch in one transaction. Each write runs in a
+# BEGIN IMMEDIATE transaction: the row update, the global version bump and the change-log
+# entry commit together or not at all. Updates that change nothing leave the version alone.
+# Machines are looked up by their integer primary key. Other processes notice writes
+# through PRAGMA data_version and read what changed from the change log (see
+# machine_state.MachineStateHub).
+
+DEFAULT_STATE_PATH = os.environ.get(
+    "MACHINE_STATE_DB", os.path.join(os.path.expanduser("~"), ".machine_state.sqlite"))
+STORE_LOG_SIZE = 4096  # Change-log entries kept for delta readers
+BUSY_TIMEOUT_MS = 5000
+
+MACHINE_FIELDS = ("name", "status", "uptime", "comments")
+
+# Control actions and the status they put a machine in
+ACTION_STATUS = {"start": "Running", "stop": "Idle", "maintenance": "Maintenance"}
+
+# Machines a new database starts with
+DEFAULT_MACHINES = [
+    {"id": 1, "name": "Primer", "status": "Idle", "uptime": "0h", "comments": ""},
+    {"id": 2, "name": "Coater", "status": "Idle", "uptime": "0h", "comments": ""},
+    {"id": 3, "name": "Nanoimprint Lithography", "status": "Idle", "uptime": "0h", "comments": ""},
+    {"id": 4, "name": "DRIE (ANFF)", "status": "Maintenance", "uptime": "0h", "comments": "Needs calibration"},
+    {"id": 5, "name": "Dicer (ANFF)", "status": "Idle", "uptime": "0h", "comments": ""},
+    {"id": 6, "name": "SEM (ANFF)", "status": "Running", "uptime": "1h 15m", "comments": "Imaging new samples"},
+]
+
+_SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS machines (
+    id INTEGER PRIMARY KEY, name TEXT NOT NULL, status TEXT NOT NULL, uptime TEXT NOT NULL DEFAULT '0h',
+    comments TEXT NOT NULL DEFAULT '', version INTEGER NOT NULL DEFAULT 0, updated_at REAL
+);
+CREATE TABLE IF NOT EXISTS changes (version INTEGER PRIMARY KEY, machine_id INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+"""
+_SELECT_MACHINE = "SELECT id, name, status, uptime, comments FROM machines"
+
+
+def _row_dict(row):
+    return {"id": row[0], "name": row[1], "status": row[2], "uptime": row[3], "comments": row[4]}
+
+
+class MachineStore:
+    """
+    SQLite-backed machine status. Safe to share between threads; every process opens its
+    own MachineStore on the same file.
+
+    Args:
+        path (str): Database file, created and seeded if missing (MACHINE_STATE_DB
+            environment variable, else ~/.machine_state.sqlite). ":memory:" for a private store.
+        seed: Machines to create in a new database; DEFAULT_MACHINES if None.
+    """
+
+    def __init__(self, path=DEFAULT_STATE_PATH, seed=None):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None,
+                                     timeout=BUSY_TIMEOUT_MS / 1000)
+        self._data_version = None
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+            self._conn.executescript(_SCHEMA_SQL)
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute("INSERT OR IGNORE INTO meta VALUES ('version', '0')")
+                self._conn.execute("INSERT OR IGNORE INTO meta VALUES ('epoch', ?)", (uuid.uuid4().hex[:8],))
+                if self._conn.execute("SELECT COUNT(*) FROM machines").fetchone()[0] == 0:
+                    self._conn.executemany(
+                        "INSERT INTO machines (id, name, status, uptime, comments, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+                        [(m["id"], m["name"], m["status"], m.get("uptime", "0h"), m.get("comments", ""), time.time())
+                         for m in (seed or DEFAULT_MACHINES)])
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self.epoch = self._conn.execute("SELECT value FROM meta WHERE key = 'epoch'").fetchone()[0]
+            self._data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def machines(self):
+        """Returns every machine as a dict, ordered by id."""
+        with self._lock:
+            return [_row_dict(row) for row in self._conn.execute(_SELECT_MACHINE + " ORDER BY id")]
+
+    def machine(self, machine_id):
+        """Returns one machine as a dict, or None."""
+        with self._lock:
+            row = self._conn.execute(_SELECT_MACHINE + " WHERE id = ?", (machine_id,)).fetchone()
+        return _row_dict(row) if row else None
+
+    def version(self):
+        """Returns the number of changes committed so far, by any process."""
+        with self._lock:
+            return int(self._conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()[0])
+
+    def _apply(self, updates):
+        # Caller holds the lock. One transaction: update rows, bump the version per change
+        # and log it. Returns the ids of the machines that changed.
+        changed = []
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            version = int(self._conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()[0])
+            now = time.time()
+            for machine_id, fields in updates:
+                unknown = [name for name in fields if name not in MACHINE_FIELDS]
+                if unknown:
+                    raise ValueError(f"Unknown machine field(s): {', '.join(unknown)}")
+                if not fields:
+                    continue
+                columns = list(fields)
+                values = [fields[c] for c in columns]
+                cursor = self._conn.execute(
+                    f"UPDATE machines SET {', '.join(f'{c} = ?' for c in columns)}, version = ?, updated_at = ? "
+                    f"WHERE id = ? AND ({' OR '.join(f'{c} IS NOT ?' for c in columns)})",
+                    values + [version + 1, now, machine_id] + values)
+                if cursor.rowcount:
+                    version += 1
+                    self._conn.execute("INSERT INTO changes VALUES (?, ?)", (version, machine_id))
+                    changed.append(machine_id)
+            if changed:
+                self._conn.execute("UPDATE meta SET value = ? WHERE key = 'version'", (str(version),))
+                if version // 256 != (version - len(changed)) // 256:
+                    self._conn.execute("DELETE FROM changes WHERE version <= ?", (version - STORE_LOG_SIZE,))
+            self._conn.execute("COMMIT")
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        return changed
+
+    def update_machine(self, machine_id, **fields):
+        """
+        Sets fields (name, status, uptime, comments) on one machine atomically.
+
+        Returns:
+            bool: False if the machine is unknown or nothing changed.
+
+        Raises:
+            ValueError: For a field that is not in MACHINE_FIELDS.
+        """
+        with self._lock:
+            return bool(self._apply([(machine_id, fields)]))
+
+    def update_many(self, updates):
+        """
+        Applies many (machine_id, {field: value}) updates in one transaction, e.g. a polling
+        cycle of an equipment adapter. Returns the number of updates that changed something.
+        """
+        with self._lock:
+            return len(self._apply(updates))
+
+    def apply_command(self, machine_id, action):
+        """
+        Applies a control action ('start', 'stop' or 'maintenance'); returns True if the status changed.
+        """
+        status = ACTION_STATUS.get(str(action).lower())
+        try:
+            machine_id = int(machine_id)
+        except (TypeError, ValueError):
+            return False
+        return status is not None and self.update_machine(machine_id, status=status)
+
+    def changes_since(self, version):
+        """
+        Reads what changed after version (None for everything), in one consistent read.
+
+        Returns:
+            (current version, [(version, machine id)] or None if the log no longer reaches
+            back to version, [changed machine dicts] or every machine if the log is None)
+        """
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                current = int(self._conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()[0])
+                if current == version:
+                    return current, [], []
+                oldest = self._conn.execute("SELECT MIN(version) FROM changes").fetchone()[0]
+                if version is None or version > current or oldest is None or oldest > version + 1:
+                    machines = [_row_dict(row) for row in self._conn.execute(_SELECT_MACHINE + " ORDER BY id")]
+                    return current, None, machines
+                changes = self._conn.execute(
+                    "SELECT version, machine_id FROM changes WHERE version > ? ORDER BY version", (version,)).fetchall()
+                ids = sorted({machine_id for _, machine_id in changes})
+                rows = self._conn.execute(
+                    _SELECT_MACHINE + f" WHERE id IN ({', '.join('?' * len(ids))})", ids).fetchall()
+                return current, changes, [_row_dict(row) for row in rows]
+            finally:
+                self._conn.execute("COMMIT")
+
+    def data_changed(self):
+        """
+        True if another connection (e.g. another process) committed since the last call
+        (or since the store was opened).
+        """
+        with self._lock:
+            data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+            changed = data_version != self._data_version
+            self._data_version = data_version
+        return changed
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,160 @@
+import json
+import os
+from collections import namedtuple
+from functools import lru_cache
+
+# Declarative Run/Stage/Modality layout for the Data Structure Creator.
+# The schema (modality_schema.json by default, or a YAML file when PyYAML is installed)
+# names the folder patterns and groups of modalities that can be switched on together:
+#
+#   run       - run folder pattern, must contain {sample_id} once, e.g. "Run={sample_id}"
+#   stage     - stage folder pattern, e.g. "Stage={name}"
+#   modality  - modality folder pattern, e.g. "Modality={name}"
+#   stages    - stage folders every run gets, whichever groups are selected
+#   groups    - name -> {label, stage, modalities, csv}, where csv says where the sample's
+#               CSV goes: "stage", "modality" (every modality folder of the group) or null
+#
+# A schema is compiled once into paths relative to the run folder, so laying out a batch
+# of samples only joins the run folder onto precomputed strings.
+
+DEFAULT_SCHEMA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "modality_schema.json")
+CSV_LOCATIONS = ("stage", "modality", None)
+
+CompiledGroup = namedtuple("CompiledGroup", ["name", "label", "stage", "modalities", "directories", "csv_directories"])
+CompiledSchema = namedtuple("CompiledSchema", ["run_prefix", "run_suffix", "stage_pattern", "modality_pattern", "stage_directories", "groups"])
+
+
+class SchemaError(ValueError):
+    """Raised when a modality schema is malformed."""
+
+
+def load_schema(path=DEFAULT_SCHEMA_PATH):
+    """
+    Reads a schema file: JSON, or YAML (.yaml/.yml) if PyYAML is installed.
+    """
+    with open(path, encoding="utf-8") as f:
+        if path.lower().endswith((".yaml", ".yml")):
+            try:
+                import yaml  # Optional dependency
+            except ImportError:
+                raise SchemaError("YAML schemas need PyYAML (pip install pyyaml); use a .json schema instead.")
+            return yaml.safe_load(f)
+        return json.load(f)
+
+
+def _folder_name(pattern, name, what):
+    folder = pattern.format(name=name)
+    if not name or folder in (".", "..") or any(c in folder for c in ("/", "\\", "\x00")):
+        raise SchemaError(f"Invalid {what} name '{name}'.")
+    return folder
+
+
+def compile_schema(schema):
+    """
+    Validates a schema dict and compiles it into a CompiledSchema.
+
+    Raises:
+        SchemaError: If a pattern, group or csv location is invalid.
+    """
+    try:
+        run_pattern = schema["run"]
+        stage_pattern = schema.get("stage", "Stage={name}")
+        modality_pattern = schema.get("modality", "Modality={name}")
+        raw_groups = schema["groups"]
+    except (KeyError, TypeError, AttributeError) as e:
+        raise SchemaError(f"Schema is missing {e}.")
+    if run_pattern.count("{sample_id}") != 1:
+        raise SchemaError("The run pattern must contain {sample_id} exactly once.")
+    run_prefix, run_suffix = run_pattern.split("{sample_id}")
+    stage_directories = [_folder_name(stage_pattern, stage, "stage") for stage in schema.get("stages", [])]
+
+    groups = {}
+    for name, group in raw_groups.items():
+        stage = group.get("stage", "source_data")
+        modalities = list(group.get("modalities", []))
+        csv = group.get("csv")
+        if csv not in CSV_LOCATIONS:
+            raise SchemaError(f"Group '{name}': csv must be one of {CSV_LOCATIONS}, not {csv!r}.")
+        stage_dir = _folder_name(stage_pattern, stage, "stage")
+        modality_dirs = [os.path.join(stage_dir, _folder_name(modality_pattern, m, "modality")) for m in modalities]
+        csv_directories = [stage_dir] if csv == "stage" else (modality_dirs if csv == "modality" else [])
+        groups[name] = CompiledGroup(name, group.get("label", name), stage, modalities,
+                                     [stage_dir] + modality_dirs, csv_directories)
+    return CompiledSchema(run_prefix, run_suffix, stage_pattern, modality_pattern, stage_directories, groups)
+
+
+@lru_cache(maxsize=8)
+def _compiled(path, mtime):
+    return compile_schema(load_schema(path))
+
+
+def get_schema(path=DEFAULT_SCHEMA_PATH):
+    """
+    Returns the compiled schema at path, recompiling only when the file changes.
+    """
+    return _compiled(path, os.path.getmtime(path))
+
+
+def stage_folder_name(schema, name):
+    """
+    Returns the folder name of a stage, e.g. "Stage=source_data".
+
+    Raises:
+        SchemaError: If name is empty or would leave the run folder (a path separator, "..").
+    """
+    return _folder_name(schema.stage_pattern, name, "stage")
+
+
+def modality_folder_name(schema, name):
+    """
+    Returns the folder name of a modality, e.g. "Modality=sem_c_0deg".
+
+    Raises:
+        SchemaError: If name is empty or would leave the stage folder (a path separator, "..").
+    """
+    return _folder_name(schema.modality_pattern, name, "modality")
+
+
+def run_folder_name(schema, sample_id):
+    return f"{schema.run_prefix}{sample_id}{schema.run_suffix}"
+
+
+def _match_pattern(prefix, suffix, folder_name):
+    if len(folder_name) <= len(prefix) + len(suffix) or not folder_name.startswith(prefix) or not folder_name.endswith(suffix):
+        return None
+    return folder_name[len(prefix):len(folder_name) - len(suffix)]
+
+
+def sample_id_from_folder(schema, folder_name):
+    """
+    Returns the sample ID of a run folder name, or None if the name does not match the run pattern.
+    """
+    return _match_pattern(schema.run_prefix, schema.run_suffix, folder_name)
+
+
+def name_from_folder(pattern, folder_name):
+    """
+    Returns the name in a stage or modality folder name ("Modality=sem_c_0deg" -> "sem_c_0deg"),
+    or None if it does not match pattern.
+    """
+    prefix, _, suffix = pattern.partition("{name}")
+    return _match_pattern(prefix, suffix, folder_name)
+
+
+def sample_paths(schema, save_location, sample_id, groups):
+    """
+    Returns (directories, csv_paths) for one sample and the selected group names.
+
+    Directories are absolute and include the run folder; shared folders appear once.
+    """
+    run_dir = os.path.join(save_location, run_folder_name(schema, sample_id))
+    directories = dict.fromkeys([run_dir] + [os.path.join(run_dir, rel) for rel in schema.stage_directories])
+    csv_paths = {}
+    csv_name = f"{sample_id}.csv"
+    for name in groups:
+        group = schema.groups[name]
+        for rel in group.directories:
+            directories[os.path.join(run_dir, rel)] = None
+        for rel in group.csv_directories:
+            csv_paths[os.path.join(run_dir, rel, csv_name)] = None
+    return list(directories), list(csv_paths)
@@ -0,0 +1,245 @@
+import math
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from kinematics import idle_distances
+from line_geometry import lines_to_array
+
+# Travel-minimizing segment ordering for toolpaths.
+# Segments are reordered (and optionally reversed) to cut non-cutting idle travel between
+# the end of one segment and the start of the next. A nearest-neighbour tour is built with
+# a uniform grid spatial index, then refined with 2-opt moves over grid neighbour lists
+# until no move improves or the time budget runs out. Endpoint ids are 2 * segment for a
+# segment's start and 2 * segment + 1 for its end.
+
+DEFAULT_TIME_BUDGET = 5.0  # seconds
+DEFAULT_NEIGHBORS = 8
+
+PathOrderResult = namedtuple(
+    "PathOrderResult",
+    ["order", "flipped", "original_travel", "optimized_travel", "two_opt_moves", "elapsed"]
+)
+
+
+class GridIndex:
+    """
+    Uniform grid over 2D points for nearest-neighbour queries with deletion.
+
+    The cell size is picked so each cell holds about points_per_cell points.
+    """
+
+    def __init__(self, points, points_per_cell=2.0):
+        self.points = np.asarray(points, dtype=np.float64)
+        # Plain lists: scalar reads from Python lists are much cheaper than from arrays
+        self.xs = self.points[:, 0].tolist()
+        self.ys = self.points[:, 1].tolist()
+        self.origin = self.points.min(axis=0) if len(self.points) else np.zeros(2)
+        extent = (self.points.max(axis=0) - self.origin) if len(self.points) else np.ones(2)
+        area = max(float(extent[0]) * float(extent[1]), 1e-12)
+        self.cell_size = max(math.sqrt(area * points_per_cell / max(len(self.points), 1)), float(extent.max()) / 4096, 1e-9)
+        cells = np.floor((self.points - self.origin) / self.cell_size).astype(np.int64)
+        self.max_cell = cells.max(axis=0) if len(cells) else np.zeros(2, dtype=np.int64)
+        self.cells = {}
+        for point_id, (cx, cy) in enumerate(cells.tolist()):
+            self.cells.setdefault((cx, cy), []).append(point_id)
+
+    def _cell_of(self, x, y):
+        return (int(math.floor((x - self.origin[0]) / self.cell_size)),
+                int(math.floor((y - self.origin[1]) / self.cell_size)))
+
+    def _ring(self, cx, cy, r):
+        # Cells at Chebyshev distance exactly r from (cx, cy)
+        if r == 0:
+            yield cx, cy
+            return
+        for dx in range(-r, r + 1):
+            yield cx + dx, cy - r
+            yield cx + dx, cy + r
+        for dy in range(-r + 1, r):
+            yield cx - r, cy + dy
+            yield cx + r, cy + dy
+
+    def nearest(self, x, y, alive, max_rings=32):
+        """
+        Returns the id of the nearest point with alive[id] truthy, or -1 if none is found within max_rings.
+
+        Dead ids are pruned from the cells as they are encountered.
+        """
+        cx, cy = self._cell_of(x, y)
+        best_id, best_d2 = -1, math.inf
+        xs, ys = self.xs, self.ys
+        for r in range(max_rings + 1):
+            # Anything in ring r is at least (r - 1) * cell_size away
+            if best_id >= 0 and ((r - 1) * self.cell_size) ** 2 > best_d2:
+                break
+            for cell in self._ring(cx, cy, r):
+                ids = self.cells.get(cell)
+                if not ids:
+                    continue
+                live = [i for i in ids if alive[i]]
+                if len(live) != len(ids):
+                    if live:
+                        self.cells[cell] = live
+                    else:
+                        del self.cells[cell]
+                for i in live:
+                    d2 = (xs[i] - x) ** 2 + (ys[i] - y) ** 2
+                    if d2 < best_d2:
+                        best_id, best_d2 = i, d2
+        return best_id
+
+    def neighbors(self, x, y, k):
+        """
+        Returns up to k point ids from the 3x3 block of cells around (x, y), nearest first.
+        """
+        cx, cy = self._cell_of(x, y)
+        ids = []
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                ids.extend(self.cells.get((cx + dx, cy + dy), ()))
+        if len(ids) > k:
+            pts = self.points[ids]
+            d2 = (pts[:, 0] - x) ** 2 + (pts[:, 1] - y) ** 2
+            ids = [ids[i] for i in np.argsort(d2)[:k]]
+        return ids
+
+
+def travel_distance(arr, order=None, flipped=None):
+    """
+    Total idle travel of lines cut in the given order, with flipped segments run end to start.
+    """
+    return float(idle_distances(apply_order(arr, order, flipped)).sum())
+
+
+def apply_order(arr, order=None, flipped=None):
+    """
+    Returns the lines reordered by order, with segments marked in flipped (indexed by
+    original segment) reversed. Per-line parameters can be reordered with param[order].
+    """
+    arr = lines_to_array(arr)
+    if flipped is not None:
+        arr = np.where(np.asarray(flipped, dtype=bool)[:, None, None], arr[:, ::-1], arr)
+    return arr if order is None else arr[np.asarray(order)]
+
+
+def _nearest_neighbour_tour(points, n, allow_flip):
+    index = GridIndex(points)
+    alive = bytearray(b"\x01") * (2 * n)
+    if not allow_flip:
+        # Only start points are candidates for the next move
+        alive[1::2] = bytes(n)
+    order = [0] * n
+    flipped = np.zeros(n, dtype=bool)
+    xs, ys = index.xs, index.ys
+
+    # Keep the original first segment as the starting move
+    current = 0
+    for step in range(n):
+        seg = current >> 1
+        order[step] = seg
+        if current & 1:
+            flipped[seg] = True
+        alive[2 * seg] = alive[2 * seg + 1] = 0
+        if step == n - 1:
+            break
+        exit_id = current ^ 1  # Leave through the other end of the segment
+        nxt = index.nearest(xs[exit_id], ys[exit_id], alive)
+        if nxt < 0:
+            # Remaining points are far away: fall back to a vectorized scan
+            candidates = np.flatnonzero(np.frombuffer(alive, dtype=np.uint8))
+            d2 = ((points[candidates] - points[exit_id]) ** 2).sum(axis=1)
+            nxt = int(candidates[np.argmin(d2)])
+        current = nxt
+    return np.asarray(order, dtype=np.int64), flipped
+
+
+def _two_opt(order, flipped, index, neighbors, deadline):
+    n = len(order)
+    # Arrays keep block reversals vectorized; coordinates come from the index's plain lists
+    order = order.copy()
+    flip = flipped.astype(np.int64)
+    position = np.empty(n, dtype=np.int64)
+    position[order] = np.arange(n)
+    xs, ys = index.xs, index.ys
+    hypot = math.hypot
+    moves = 0
+
+    improved = True
+    while improved and time.perf_counter() < deadline:
+        improved = False
+        for a in range(n - 1):
+            if a % 256 == 0 and time.perf_counter() >= deadline:
+                break
+            seg_a = order[a]
+            exit_a = 2 * seg_a + 1 - flip[seg_a]
+            for point_id in index.neighbors(xs[exit_a], ys[exit_a], neighbors):
+                seg_b = point_id >> 1
+                # Only endpoints that are currently the exit of their segment give a valid move
+                if (point_id & 1) == flip[seg_b]:
+                    continue
+                b = position[seg_b]
+                i, j = (a, b) if a < b else (b, a)
+                if i == j:
+                    continue
+                seg_i, seg_i1, seg_j = order[i], order[i + 1], order[j]
+                end_i = 2 * seg_i + 1 - flip[seg_i]
+                start_i1 = 2 * seg_i1 + flip[seg_i1]
+                end_j = 2 * seg_j + 1 - flip[seg_j]
+                old = hypot(xs[end_i] - xs[start_i1], ys[end_i] - ys[start_i1])
+                new = hypot(xs[end_i] - xs[end_j], ys[end_i] - ys[end_j])
+                if j + 1 < n:
+                    seg_j1 = order[j + 1]
+                    start_j1 = 2 * seg_j1 + flip[seg_j1]
+                    old += hypot(xs[end_j] - xs[start_j1], ys[end_j] - ys[start_j1])
+                    new += hypot(xs[start_i1] - xs[start_j1], ys[start_i1] - ys[start_j1])
+                if new < old - 1e-9:
+                    # Reverse positions i+1..j: order flips and so does every segment's direction
+                    block = order[i + 1:j + 1][::-1].copy()
+                    order[i + 1:j + 1] = block
+                    position[block] = np.arange(i + 1, j + 1)
+                    flip[block] ^= 1
+                    moves += 1
+                    improved = True
+                    break
+    return order, flip.astype(bool), moves
+
+
+def optimize_segment_order(arr, allow_flip=True, time_budget=DEFAULT_TIME_BUDGET, neighbors=DEFAULT_NEIGHBORS):
+    """
+    Reorders (and optionally flips) segments to minimize idle travel.
+
+    The nearest-neighbour construction always completes; 2-opt refinement then runs until
+    no improving move is left or time_budget seconds have passed in total. 2-opt reverses
+    runs of segments, so it is only used when allow_flip is True.
+
+    Args:
+        arr: Lines of shape (N, 2, 2) or in the tuple format.
+        allow_flip (bool): Whether segments may be cut end to start.
+        time_budget (float): Seconds allowed for the whole optimization.
+        neighbors (int): Neighbour candidates per endpoint tried by 2-opt.
+
+    Returns:
+        PathOrderResult: order (original segment indices in cutting order), flipped (per
+        original segment), idle travel before and after, 2-opt moves applied and elapsed seconds.
+    """
+    started = time.perf_counter()
+    arr = lines_to_array(arr)
+    n = len(arr)
+    original_travel = travel_distance(arr)
+    if n < 2:
+        return PathOrderResult(np.arange(n), np.zeros(n, dtype=bool), original_travel, original_travel, 0, 0.0)
+
+    points = arr.reshape(-1, 2)
+    order, flipped = _nearest_neighbour_tour(points, n, allow_flip)
+    moves = 0
+    if allow_flip and time.perf_counter() < started + time_budget:
+        # The construction index has pruned every visited point, so 2-opt gets a fresh one
+        order, flipped, moves = _two_opt(order, flipped, GridIndex(points), neighbors, started + time_budget)
+
+    optimized_travel = travel_distance(arr, order, flipped)
+    if optimized_travel > original_travel:
+        # Never hand back something worse than what we were given
+        order, flipped, optimized_travel = np.arange(n), np.zeros(n, dtype=bool), original_travel
+    return PathOrderResult(order, flipped, original_travel, optimized_travel, moves, time.perf_counter() - started)
@@ -0,0 +1,150 @@
+from functools import lru_cache
+
+# Sample-name generation for fabricated samples, usable outside Streamlit (e.g. from the MES).
+# Name format: PD-{material}{master:02}0{anti_sticking}{salinisation}-0{resin}-0{resist}-{initials}-{suffix}
+# where suffix runs A..Z, AA..AZ, BA.. like spreadsheet columns.
+
+FAB_MATERIALS_MAPPING = {"Silicon": "SA00", "PET Sheet": "PB", "Float Glass": "GB"}
+FAB_ANTI_STICKING_MAPPING = {"OP-F17G163": 1, "1H,1H,2H,2Hperfluorooctyl-trichlorosilane": 2}
+FAB_RESIN_MAPPING = {"PS90": 1, "PS380": 2, "OrmoStamp": 3, "UV-PDMS KER-4690 A and B": 4}
+FAB_RESIST_MAPPING = {"OP-PR192": 1, "mr-UVCur26SF": 2, "MM1158A": 3, "SU8": 4, "mr-InkNIL26SF_XP": 5, "OrmoJet_XP": 6}
+
+
+class SampleNameError(ValueError):
+    """Raised when a sample-name component is not a known material, agent, resin or resist."""
+
+
+def spreadsheet_suffix(index):
+    """
+    Returns the spreadsheet-style suffix for a zero-based index: 0 -> A, 25 -> Z, 26 -> AA.
+    """
+    if index < 0:
+        raise ValueError("Suffix index must be non-negative.")
+    letters = []
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        letters.append(chr(65 + remainder))
+    return "".join(reversed(letters))
+
+
+@lru_cache(maxsize=8)
+def _suffix_table(size):
+    return tuple(spreadsheet_suffix(i) for i in range(size))
+
+
+def spreadsheet_suffixes(count, start=0):
+    """
+    Returns count consecutive suffixes starting at zero-based index start.
+    """
+    # Tables are built in powers of two and cached, so repeated batches reuse them
+    size = 1 << max(start + count - 1, 0).bit_length()
+    return list(_suffix_table(max(size, 32))[start:start + count])
+
+
+def sample_name_base(material, master_id, salinisation, anti_sticking, resin, resist, initials):
+    """
+    Builds the sample-name prefix shared by every sample of one combination.
+
+    Raises:
+        SampleNameError: If material, anti_sticking, resin or resist is not recognised.
+    """
+    materials_mapping_number = FAB_MATERIALS_MAPPING.get(material)
+    if materials_mapping_number is None:
+        raise SampleNameError(f"Selected material '{material}' is not valid.")
+    anti_sticking_mapping_number = FAB_ANTI_STICKING_MAPPING.get(anti_sticking)
+    if anti_sticking_mapping_number is None:
+        raise SampleNameError(f"Selected anti-sticking material '{anti_sticking}' is not valid.")
+    resin_mapping_number = FAB_RESIN_MAPPING.get(resin)
+    if resin_mapping_number is None:
+        raise SampleNameError(f"Selected resin material '{resin}' is not valid.")
+    resist_mapping_number = FAB_RESIST_MAPPING.get(resist)
+    if resist_mapping_number is None:
+        raise SampleNameError(f"Selected resist material '{resist}' is not valid.")
+
+    formatted_master_id = str(master_id).zfill(2)  # Pad with leading zero if single digit
+    return (f"PD-{materials_mapping_number}{formatted_master_id}0{anti_sticking_mapping_number}{salinisation}"
+            f"-0{resin_mapping_number}-0{resist_mapping_number}-{initials}")
+
+
+def generate_sample_names(material, master_id, salinisation, anti_sticking, resin, resist, initials, num_samples,
+                          existing=None):
+    """
+    Generates num_samples sample names for one combination.
+
+    Args:
+        existing: Optional set of names already in use. Suffixes taken by those names are
+            skipped, so the new names continue after them.
+
+    Returns:
+        list: The generated names.
+    """
+    base = sample_name_base(material, master_id, salinisation, anti_sticking, resin, resist, initials)
+    return _names_for_base(base, num_samples, existing)
+
+
+def _names_for_base(base, num_samples, existing):
+    prefix = f"{base}-"
+    if not existing:
+        return [prefix + suffix for suffix in spreadsheet_suffixes(num_samples)]
+    names = []
+    start = 0
+    while len(names) < num_samples:
+        # Over-generate a little, then drop suffixes already in use
+        needed = num_samples - len(names)
+        candidates = [prefix + suffix for suffix in spreadsheet_suffixes(needed + 8, start)]
+        start += len(candidates)
+        names.extend(name for name in candidates if name not in existing)
+    return names[:num_samples]
+
+
+def generate_sample_name_batch(combinations, existing=None):
+    """
+    Generates names for many combinations at once.
+
+    Args:
+        combinations: Iterable of dicts with keys material, master_id, salinisation,
+            anti_sticking, resin, resist, initials and num_samples.
+        existing: Optional set of names already in use; see generate_sample_names. Names
+            minted earlier in the same batch are also treated as taken.
+
+    Returns:
+        list: All generated names, combination by combination.
+    """
+    taken = set(existing) if existing else set()
+    names = []
+    for combo in combinations:
+        combo = dict(combo)
+        num_samples = int(combo.pop("num_samples"))
+        new_names = _names_for_base(sample_name_base(**combo), num_samples, taken)
+        taken.update(new_names)
+        names.extend(new_names)
+    return names
+
+
+class SampleNameRegistry:
+    """
+    In-memory set of issued sample names that only ever mints unused ones.
+
+    Useful for long-running callers (e.g. a nightly MES job) that mint many batches.
+    """
+
+    def __init__(self, existing_names=()):
+        self.names = set(existing_names)
+
+    def __contains__(self, name):
+        return name in self.names
+
+    def __len__(self):
+        return len(self.names)
+
+    def mint(self, material, master_id, salinisation, anti_sticking, resin, resist, initials, num_samples):
+        new_names = generate_sample_names(material, master_id, salinisation, anti_sticking, resin, resist, initials,
+                                          num_samples, existing=self.names)
+        self.names.update(new_names)
+        return new_names
+
+    def mint_batch(self, combinations):
+        new_names = generate_sample_name_batch(combinations, existing=self.names)
+        self.names.update(new_names)
+        return new_names
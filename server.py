@@ -1,40 +1,129 @@
-from http.server import HTTPServer, SimpleHTTPRequestHandler
+from http.server import HTTPServer, ThreadingHTTPServer, SimpleHTTPRequestHandler
+from concurrent.futures import ThreadPoolExecutor
+import argparse
 import socket
+import threading
 import json
 from urllib.parse import parse_qs, urlparse
 import os
 import sys
 
+from static_assets import StaticAssetCache
+from machine_state import close_shared_hub, parse_last_event_id, shared_hub, sse_stream
+
+# Serving modes:
+#   threaded (default) - ThreadingHTTPServer whose connections run on a bounded thread pool,
+#                        with HTTP/1.1 keep-alive, an idle/read timeout per connection and a
+#                        cap on open connections (extra clients get an immediate 503)
+#   single             - the original one-request-at-a-time HTTPServer
+# A slow client or a stalled /api/control body now only ties up its own worker, and only
+# until KEEPALIVE_TIMEOUT. Load test: python benchmarks/bench_server_load.py
+
+DEFAULT_MAX_CONNECTIONS = 512
+KEEPALIVE_TIMEOUT = 15  # Seconds a connection may sit idle or stall mid-request
+MAX_BODY_BYTES = 64 * 1024
+INDEX_PATH = 'index.html'
+STATIC_ASSETS = StaticAssetCache()  # index.html held in memory, precompressed, revalidated by ETag
+
 class ManufacturingAppHandler(SimpleHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive; every response carries a Content-Length
+    timeout = KEEPALIVE_TIMEOUT
+    disable_nagle_algorithm = True  # Headers and body go out as separate writes
+    log_requests = True
+    supports_push = True  # Each open stream holds a worker, so single mode does not offer it
+
+    def log_message(self, format, *args):
+        if self.log_requests:
+            super().log_message(format, *args)
+
+    def parse_request(self):
+        if not super().parse_request():
+            return False
+        # A body nobody reads would be parsed as the next request on this connection
+        length = (self.headers.get('Content-Length') or '0').strip()
+        self._body_unread = bool(self.headers.get('Transfer-Encoding')) or length != '0'
+        return True
+
+    def send_response(self, code, message=None):
+        super().send_response(code, message)
+        if getattr(self, '_body_unread', False):
+            self._body_unread = False
+            self.send_header('Connection', 'close')  # Also sets close_connection
+
+    def send_error(self, code, message=None, explain=None):
+        # send_error always closes the connection and sends its own Connection header
+        self._body_unread = False
+        self.close_connection = True
+        super().send_error(code, message, explain)
+
+    def _send_body(self, body, content_type, status=200):
+        self.send_response(status)
+        self.send_header('Content-type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, payload, status=200):
+        self._send_body(json.dumps(payload).encode(), 'application/json', status)
+
+    def _send_asset(self, path, head=False):
+        response = STATIC_ASSETS.response(path, self.headers, head)
+        self.send_response(response.status)
+        for name, value in response.headers:
+            self.send_header(name, value)
+        self.end_headers()  # A 304 never has a body, so keep-alive needs no Content-Length
+        if response.body:
+            self.wfile.write(response.body)
+
+    def _stream_status(self):
+        # Server-Sent Events: snapshot, then deltas and heartbeats until the client leaves
+        if not self.supports_push:
+            self._send_json({'status': 'error', 'message': 'Push updates need the threaded server mode'}, 503)
+            return
+        self.close_connection = True  # The stream's end is the end of the connection
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('X-Accel-Buffering', 'no')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        try:
+            for message in sse_stream(shared_hub(), self.headers.get('Last-Event-ID')):
+                self.wfile.write(message)
+        except (BrokenPipeError, ConnectionResetError, socket.timeout):
+            pass
+
+    def do_HEAD(self):
+        if urlparse(self.path).path in ('/', '/index.html'):
+            self._send_asset(INDEX_PATH, head=True)
+            return
+        return SimpleHTTPRequestHandler.do_HEAD(self)
+
     def do_GET(self):
         # Parse the URL
         parsed_path = urlparse(self.path)
         
-        # Serve the main page
-        if parsed_path.path == '/':
-            self.send_response(200)
-            self.send_header('Content-type', 'text/html')
-            self.end_headers()
-            
-            with open('index.html', 'rb') as file:
-                self.wfile.write(file.read())
+        # Serve the main page from the in-memory asset cache
+        if parsed_path.path in ('/', '/index.html'):
+            self._send_asset(INDEX_PATH)
             return
 
-        # API endpoint for machine status (mock data)
+        # API endpoint for machine status (from the shared store)
         elif parsed_path.path == '/api/machine-status':
-            self.send_response(200)
-            self.send_header('Content-type', 'application/json')
+            since = parse_qs(parsed_path.query).get('since', [None])[0]
+            response = shared_hub().status_response(parse_last_event_id(since), self.headers.get('If-None-Match'))
+            self.send_response(response.status)
+            for name, value in response.headers:
+                self.send_header(name, value)
+            if response.status != 304:
+                self.send_header('Content-Length', str(len(response.body)))
             self.end_headers()
-            
-            # Mock machine status data
-            status = {
-                'machines': [
-                    {'id': 1, 'name': 'CNC Machine 1', 'status': 'Running', 'uptime': '12h 30m'},
-                    {'id': 2, 'name': 'Assembly Line A', 'status': 'Idle', 'uptime': '8h 45m'},
-                    {'id': 3, 'name': '3D Printer', 'status': 'Maintenance', 'uptime': '0h'}
-                ]
-            }
-            self.wfile.write(json.dumps(status).encode())
+            self.wfile.write(response.body)
+            return
+
+        # Push channel for status changes
+        elif parsed_path.path == '/api/machine-status/stream':
+            self._stream_status()
             return
             
         # Handle other static files
@@ -46,21 +135,88 @@ class ManufacturingAppHandler(SimpleHTTPRequestHandler):
 
         # Handle machine control commands
         if parsed_path.path == '/api/control':
-            content_length = int(self.headers['Content-Length'])
+            try:
+                content_length = int(self.headers['Content-Length'])
+            except (TypeError, ValueError):
+                self.close_connection = True
+                self._send_json({'status': 'error', 'message': 'Content-Length required'}, 411)
+                return
+            if content_length < 0 or content_length > MAX_BODY_BYTES:
+                self.close_connection = True
+                self._send_json({'status': 'error', 'message': 'Request body too large'}, 413)
+                return
+            # A stalled body read times out after KEEPALIVE_TIMEOUT and drops the connection
             post_data = self.rfile.read(content_length)
-            command = json.loads(post_data.decode('utf-8'))
+            self._body_unread = False
+            try:
+                command = json.loads(post_data.decode('utf-8'))
+                if not isinstance(command, dict):
+                    raise ValueError("expected a JSON object")
+            except ValueError as e:
+                self._send_json({'status': 'error', 'message': f'Invalid command: {e}'}, 400)
+                return
 
-            # Mock response
+            # Mock response; the status change reaches every page through the push channel
+            shared_hub().apply_command(command.get('machine_id'), command.get('action', ''))
             response = {
                 'status': 'success',
                 'message': f"Command '{command.get('action', '')}' sent to machine {command.get('machine_id', '')}"
             }
+            self._send_json(response)
+            return
 
-            self.send_response(200)
-            self.send_header('Content-type', 'application/json')
-            self.end_headers()
-            self.wfile.write(json.dumps(response).encode())
+        self._send_json({'status': 'error', 'message': 'Not found'}, 404)  # Closes if a body was sent
+
+class SingleRequestHandler(ManufacturingAppHandler):
+    # HTTP/1.0 closes after each response, so one keep-alive client cannot hold the server
+    protocol_version = "HTTP/1.0"
+    supports_push = False
+
+class BoundedThreadingHTTPServer(ThreadingHTTPServer):
+    """
+    ThreadingHTTPServer that runs connections on a fixed-size thread pool and refuses
+    connections beyond max_connections with a 503 instead of queueing them.
+    """
+
+    def __init__(self, server_address, handler_class, max_connections=DEFAULT_MAX_CONNECTIONS):
+        self.max_connections = max_connections
+        self.request_queue_size = max(5, min(max_connections, 1024))  # listen() backlog for connection bursts
+        self._slots = threading.BoundedSemaphore(max_connections)
+        self._pool = ThreadPoolExecutor(max_workers=max_connections, thread_name_prefix="http")
+        super().__init__(server_address, handler_class)
+
+    def process_request(self, request, client_address):
+        if not self._slots.acquire(blocking=False):
+            try:
+                request.sendall(b"HTTP/1.1 503 Service Unavailable\r\nRetry-After: 1\r\n"
+                                b"Content-Length: 0\r\nConnection: close\r\n\r\n")
+            except OSError:
+                pass
+            self.shutdown_request(request)
             return
+        self._pool.submit(self._process_in_pool, request, client_address)
+
+    def _process_in_pool(self, request, client_address):
+        try:
+            self.process_request_thread(request, client_address)
+        finally:
+            self._slots.release()
+
+    def server_close(self):
+        close_shared_hub()  # Ends open status streams so their workers can exit
+        super().server_close()
+        if sys.version_info >= (3, 9):
+            self._pool.shutdown(wait=False, cancel_futures=True)  # Drop connections not yet started
+        else:
+            self._pool.shutdown(wait=False)  # Python 3.7/3.8 have no cancel_futures
+
+def make_server(port, mode="threaded", max_connections=DEFAULT_MAX_CONNECTIONS, host='0.0.0.0'):
+    """
+    Creates the HTTP server for mode ("threaded" or "single") bound to host:port.
+    """
+    if mode == "single":
+        return HTTPServer((host, port), SingleRequestHandler)
+    return BoundedThreadingHTTPServer((host, port), ManufacturingAppHandler, max_connections)
 
 def get_local_ip():
     try:
@@ -83,24 +239,22 @@ def get_local_ip():
         print(f"Note: Could not determine network IP ({str(e)})")
         return '127.0.0.1'
 
-def try_port(port):
+def try_port(port, mode="threaded", max_connections=DEFAULT_MAX_CONNECTIONS):
     try:
-        server_address = ('0.0.0.0', port)
-        httpd = HTTPServer(server_address, ManufacturingAppHandler)
-        return httpd
+        return make_server(port, mode, max_connections)
     except Exception as e:
         return None
 
-def run_server():
+def run_server(ports=None, mode="threaded", max_connections=DEFAULT_MAX_CONNECTIONS):
     # List of ports to try (commonly open ports)
-    ports = [8080, 80, 3000, 5000, 8000]
+    ports = ports or [8080, 80, 3000, 5000, 8000]
     
     # Try each port until one works
     httpd = None
     used_port = None
     
     for port in ports:
-        httpd = try_port(port)
+        httpd = try_port(port, mode, max_connections)
         if httpd:
             used_port = port
             break
@@ -109,6 +263,7 @@ def run_server():
         print("Error: Could not find an available port. Please try running with a specific port:")
         print("Example: python server.py 9000")
         sys.exit(1)
+    shared_hub()  # Open the machine status store (machine_store.py) before taking requests
 
     local_ip = get_local_ip()
     print(f"\nAdvanced Manufacturing Web App Server running at:")
@@ -128,24 +283,37 @@ def run_server():
     except Exception:
         pass
         
+    if mode == "single":
+        print("\nServing one request at a time (single mode)")
+    else:
+        print(f"\nServing up to {max_connections} concurrent connections (threaded mode)")
     print("\nPress Ctrl+C to stop the server")
-    httpd.serve_forever()
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
 
 if __name__ == '__main__':
-    if len(sys.argv) > 1:
+    parser = argparse.ArgumentParser(description="Advanced Manufacturing web app server")
+    parser.add_argument("port", nargs="?", help="Port to use (default: try common ports)")
+    parser.add_argument("--mode", choices=["threaded", "single"], default="threaded",
+                        help="threaded: concurrent connections with keep-alive; single: one request at a time")
+    parser.add_argument("--max-connections", type=int, default=DEFAULT_MAX_CONNECTIONS,
+                        help="Open connections served at once in threaded mode; more are refused with 503")
+    parser.add_argument("--quiet", action="store_true", help="Do not log every request")
+    args = parser.parse_args()
+    ManufacturingAppHandler.log_requests = not args.quiet
+
+    if args.port is not None:
         # If port specified as command line argument
         try:
-            port = int(sys.argv[1])
-            httpd = try_port(port)
-            if httpd:
-                print(f"\nUsing specified port: {port}")
-                run_server()
-            else:
-                print(f"Error: Could not use port {port}")
-                sys.exit(1)
+            port = int(args.port)
         except ValueError:
             print("Error: Port must be a number")
             sys.exit(1)
+        run_server([port], args.mode, args.max_connections)
     else:
         # Try common ports
-        run_server() 
\ No newline at end of file
+        run_server(mode=args.mode, max_connections=args.max_connections)
\ No newline at end of file
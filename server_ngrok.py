@@ -1,30 +1,37 @@
-from flask import Flask, send_file, jsonify, request
+from flask import Flask, Response, jsonify, request
 from pyngrok import ngrok
 import json
 import os
 
+from static_assets import StaticAssetCache
+from machine_state import parse_last_event_id, shared_hub, sse_stream
+
 app = Flask(__name__)
 
-# Mock data for machine status
-MACHINE_STATUS = {
-    'machines': [
-        {'id': 1, 'name': 'CNC Machine 1', 'status': 'Running', 'uptime': '12h 30m'},
-        {'id': 2, 'name': 'Assembly Line A', 'status': 'Idle', 'uptime': '8h 45m'},
-        {'id': 3, 'name': '3D Printer', 'status': 'Maintenance', 'uptime': '0h'}
-    ]
-}
+# index.html held in memory, precompressed and revalidated by ETag (see static_assets.py)
+STATIC_ASSETS = StaticAssetCache()
+INDEX_PATH = os.path.join(app.root_path, 'index.html')
 
 @app.route('/')
 def home():
-    return send_file('index.html')
+    asset = STATIC_ASSETS.response(INDEX_PATH, request.headers, head=request.method == 'HEAD')
+    return Response(asset.body, status=asset.status, headers=asset.headers)
 
 @app.route('/api/machine-status')
 def machine_status():
-    return jsonify(MACHINE_STATUS)
+    # Machine status from the shared store, opened on first use (see machine_state.py)
+    response = shared_hub().status_response(parse_last_event_id(request.args.get('since')), request.headers.get('If-None-Match'))
+    return Response(response.body, status=response.status, headers=response.headers)
+
+@app.route('/api/machine-status/stream')
+def machine_status_stream():
+    return Response(sse_stream(shared_hub(), request.headers.get('Last-Event-ID')), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
 
 @app.route('/api/control', methods=['POST'])
 def control_machine():
     command = request.json
+    shared_hub().apply_command(command.get('machine_id'), command.get('action', ''))
     response = {
         'status': 'success',
         'message': f"Command '{command.get('action', '')}' sent to machine {command.get('machine_id', '')}"
@@ -0,0 +1,155 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+import threading
+from collections import namedtuple
+from email.utils import formatdate, parsedate_to_datetime
+
+# In-memory static assets (index.html) for server.py and server_ngrok.py.
+# Each asset is read once, precompressed with gzip (and brotli when the brotli package is
+# installed) and given a content-hash ETag and a Last-Modified date. A request costs one
+# os.stat to check the file's mtime and size; the asset is only reloaded when they change.
+# Responses carry Cache-Control: no-cache, so browsers always revalidate but get a bodiless
+# 304 Not Modified while the file is unchanged.
+
+try:
+    import brotli  # Optional dependency, enables Content-Encoding: br
+    HAVE_BROTLI = True
+except ImportError:
+    HAVE_BROTLI = False
+
+GZIP_LEVEL = 9
+MIN_COMPRESS_BYTES = 256  # Smaller bodies are sent as they are
+CACHE_CONTROL = "no-cache"
+
+StaticAsset = namedtuple("StaticAsset", ["path", "mtime", "size", "etag", "last_modified", "content_type", "bodies"])
+AssetResponse = namedtuple("AssetResponse", ["status", "headers", "body"])
+
+
+def _encode_asset(path, stat):
+    with open(path, "rb") as f:
+        body = f.read()
+    bodies = {"identity": body}
+    if len(body) >= MIN_COMPRESS_BYTES:
+        compressed = gzip.compress(body, GZIP_LEVEL, mtime=0)
+        if len(compressed) < len(body):
+            bodies["gzip"] = compressed
+        if HAVE_BROTLI:
+            compressed = brotli.compress(body)
+            if len(compressed) < len(body):
+                bodies["br"] = compressed
+    content_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+    if content_type.startswith("text/") or content_type in ("application/javascript", "application/json"):
+        content_type += "; charset=utf-8"
+    etag = hashlib.blake2b(body, digest_size=12).hexdigest()
+    return StaticAsset(path, stat.st_mtime, stat.st_size, etag, formatdate(stat.st_mtime, usegmt=True), content_type, bodies)
+
+
+class StaticAssetCache:
+    """
+    Static files held in memory with their precompressed variants, reloaded when the file's
+    mtime or size changes. Safe to share between server threads.
+    """
+
+    def __init__(self):
+        self._assets = {}
+        self._lock = threading.Lock()
+
+    def get(self, path):
+        """
+        Returns the StaticAsset for path, reloading it if the file changed.
+
+        Raises:
+            OSError: If the file cannot be read.
+        """
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        asset = self._assets.get(path)
+        if asset is not None and asset.mtime == stat.st_mtime and asset.size == stat.st_size:
+            return asset
+        with self._lock:
+            asset = self._assets.get(path)
+            if asset is None or asset.mtime != stat.st_mtime or asset.size != stat.st_size:
+                asset = _encode_asset(path, stat)
+                self._assets[path] = asset
+        return asset
+
+    def response(self, path, request_headers, head=False):
+        """
+        Builds the response for a GET (or HEAD) of a cached file.
+
+        Args:
+            path (str): File to serve.
+            request_headers: Mapping with the request's headers (case-insensitive get(), as
+                http.server and Flask provide).
+            head (bool): Leave out the body.
+
+        Returns:
+            AssetResponse: 200 with the best encoding the client accepts, or 304 when
+            If-None-Match / If-Modified-Since show the client's copy is current.
+        """
+        asset = self.get(path)
+        encoding = choose_encoding(request_headers.get("Accept-Encoding", ""), asset.bodies)
+        etag = variant_etag(asset, encoding)
+        headers = [
+            ("ETag", etag),
+            ("Last-Modified", asset.last_modified),
+            ("Cache-Control", CACHE_CONTROL),
+            ("Vary", "Accept-Encoding"),
+        ]
+        if is_not_modified(asset, request_headers.get("If-None-Match"), request_headers.get("If-Modified-Since")):
+            return AssetResponse(304, headers, b"")
+        body = asset.bodies[encoding]
+        headers.append(("Content-Type", asset.content_type))
+        headers.append(("Content-Length", str(len(body))))
+        if encoding != "identity":
+            headers.append(("Content-Encoding", encoding))
+        return AssetResponse(200, headers, b"" if head else body)
+
+
+def variant_etag(asset, encoding):
+    # Each encoding is a different representation, so it gets its own strong ETag
+    return f'"{asset.etag}"' if encoding == "identity" else f'"{asset.etag}-{encoding}"'
+
+
+def choose_encoding(accept_encoding, bodies):
+    """
+    Returns the key in bodies to send for an Accept-Encoding header: "br", "gzip" or "identity".
+    """
+    accepted = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if coding:
+            accepted[coding.strip().lower()] = quality
+    for encoding in ("br", "gzip"):
+        if encoding in bodies and accepted.get(encoding, accepted.get("*", 0.0)) > 0:
+            return encoding
+    return "identity"
+
+
+def is_not_modified(asset, if_none_match, if_modified_since):
+    """
+    True if the conditional request headers show the client already has this asset.
+
+    If-None-Match wins over If-Modified-Since, as in RFC 9110. Any encoding variant's ETag
+    matches, since they all carry the same content.
+    """
+    if if_none_match:
+        if if_none_match.strip() == "*":
+            return True
+        candidates = {tag.strip()[2:] if tag.strip().startswith("W/") else tag.strip() for tag in if_none_match.split(",")}
+        return any(variant_etag(asset, encoding) in candidates for encoding in asset.bodies)
+    if if_modified_since:
+        try:
+            return int(asset.mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError, IndexError):
+            return False
+    return False
@@ -1,41 +1,53 @@
 import streamlit as st
 import time
 import os
+import html
 import pandas as pd
 from pathlib import Path
 import matplotlib.pyplot as plt
 import numpy as np
 from datetime import date
-import openpyxl
-from openpyxl import load_workbook
-import io
 import tempfile # For creating temporary batch file
 import atexit # For cleaning up temporary file
+from line_geometry import lines_to_array, array_to_lines, scale_lines_to_areas, out_of_bounds_mask, out_of_bounds_summary
+from kinematics import toolpath_metrics, rescale_process_parameters, DEFAULT_RAPID_SPEED
+from path_order import optimize_segment_order, apply_order, DEFAULT_TIME_BUDGET
+from area_sweep import candidate_areas, sweep_working_areas
+from toolpath_io import read_toolpath, scale_toolpath_file, open_toolpath_writer, ToolpathChunk
+from line_rendering import draw_lines_collection, LOD_DECIMATE_THRESHOLD, FigureCache, geometry_hash, DEFAULT_PLOT_COLORS as PLOT_COLORS
+from excel_batch import StagedWorkbook
+from excel_preview import read_sheet_preview
+from excel_cache import SheetParseCache, HAVE_PARQUET
+from row_export import export_rows
+from folder_structure import plan_folder_structure, plan_from_dataframe, plan_add_modalities, execute_folder_plan, format_plan
+from modality_schema import SchemaError, get_schema
+from data_catalog import DataCatalog
+from bulk_rename import plan_renames, execute_renames, rollback_renames, list_journals, transform_name
+from machine_store import MachineStore
+from directory_listing import DirectoryListingCache, query_entries, format_size, SORT_KEYS, DEFAULT_PAGE_SIZE
+from sample_names import generate_sample_names, SampleNameError
 
 # Function definitions moved to the top
-def scale_lines(lines, old_area, new_area):
+def scale_lines(lines, old_area, new_area, mode="stretch", margin=(0.0, 0.0)):
     """
     Scales lines based on the resizing of the working area.
+    Accepts and returns the ((x1, y1), (x2, y2)) tuple format; the scaling itself
+    runs as one batched operation in line_geometry (see SCALE_MODES there for mode).
     """
-    old_width, old_height = old_area
-    new_width, new_height = new_area
+    return array_to_lines(scale_lines_to_areas(lines_to_array(lines), old_area, new_area, mode=mode, margin=margin))
 
-    # Scaling factors
-    scale_x = new_width / old_width
-    scale_y = new_height / old_height
+# Segment count above which "Auto" rendering switches to a single LineCollection
+COLLECTION_RENDER_MIN_SEGMENTS = 500
 
-    # Scale the lines
-    scaled_lines = [
-        ((x1 * scale_x, y1 * scale_y), (x2 * scale_x, y2 * scale_y))
-        for ((x1, y1), (x2, y2)) in lines
-    ]
-
-    return scaled_lines
-
-def draw_lines(lines, area, title="Lines", colors_list=None):
+def draw_lines(lines, area, title="Lines", colors_list=None, mode="auto", decimate_threshold=LOD_DECIMATE_THRESHOLD):
     """
     Draws lines on a plot.
+    mode is "per_line" (one ax.plot per segment), "collection" (one LineCollection plus
+    one endpoint scatter, decimated above decimate_threshold segments) or "auto".
     """
+    if mode == "collection" or (mode == "auto" and len(lines) > COLLECTION_RENDER_MIN_SEGMENTS):
+        return draw_lines_collection(lines, area, title=title, colors_list=colors_list, decimate_threshold=decimate_threshold)
+
     width, height = area
     fig, ax = plt.subplots(figsize=(8, 8))
     ax.set_xlim(0, (width * 1.08))
@@ -63,22 +75,23 @@ def draw_lines(lines, area, title="Lines", colors_list=None):
     
     return fig
 
-# Helper function for styling out-of-bounds coordinates in the DataFrame
-def highlight_out_of_bounds_styler(row, new_w, new_h):
-    styles = pd.Series('', index=row.index)
-    # Check Scaled X start
-    if pd.notna(row['Scaled X start']) and (row['Scaled X start'] < 0 or row['Scaled X start'] > new_w):
-        styles['Scaled X start'] = 'background-color: orange'
-    # Check Scaled Y start
-    if pd.notna(row['Scaled Y start']) and (row['Scaled Y start'] < 0 or row['Scaled Y start'] > new_h):
-        styles['Scaled Y start'] = 'background-color: orange'
-    # Check Scaled X end
-    if pd.notna(row['Scaled X end']) and (row['Scaled X end'] < 0 or row['Scaled X end'] > new_w):
-        styles['Scaled X end'] = 'background-color: orange'
-    # Check Scaled Y end
-    if pd.notna(row['Scaled Y end']) and (row['Scaled Y end'] < 0 or row['Scaled Y end'] > new_h):
-        styles['Scaled Y end'] = 'background-color: orange'
-    return styles
+@st.cache_resource
+def get_line_figure_cache():
+    """
+    Process-wide LRU cache of rendered Line Scaling figures, shared across reruns and sessions.
+    """
+    return FigureCache(max_entries=32)
+
+# Columns checked by the out-of-bounds highlighting, in line_geometry.out_of_bounds_mask order
+SCALED_COORD_COLUMNS = ['Scaled X start', 'Scaled Y start', 'Scaled X end', 'Scaled Y end']
+# Above this many rows only the out-of-bounds rows are rendered with styling
+STYLED_ROW_LIMIT = 1000
+
+# Helper function for styling out-of-bounds coordinates in the DataFrame.
+# Used with Styler.apply(axis=None, subset=SCALED_COORD_COLUMNS): one mask for the whole table.
+def highlight_out_of_bounds(df, new_w, new_h):
+    mask = out_of_bounds_mask(df[SCALED_COORD_COLUMNS].to_numpy(dtype=np.float64).reshape(-1, 2, 2), (new_w, new_h))
+    return pd.DataFrame(np.where(mask, 'background-color: orange', ''), index=df.index, columns=SCALED_COORD_COLUMNS)
 
 def format_coordinates_to_decimal_places(line, decimals=2):
     """
@@ -97,8 +110,8 @@ def format_coordinates_to_decimal_places(line, decimals=2):
     return formatted_start, formatted_end
 
 # Constants and Mappings for Fabricated Sample Exporter
+# The name-code mappings (FAB_*_MAPPING) live in sample_names.py so they can be used outside the app
 FAB_MATERIALS = ["Silicon", "PET Sheet", "Float Glass"]
-FAB_MATERIALS_MAPPING = {"Silicon": "SA00", "PET Sheet": "PB", "Float Glass": "GB"}
 FAB_MASTER_IDS = [str(i) for i in range(0, 100)]  # Master Mould choices (0-99 for ID part of name)
 
 # This mapping seems to be for specific, existing master names, which differs from the 0-99 ID.
@@ -120,11 +133,8 @@ FAB_REVERSE_MASTER_NAME_MAPPING = {v: k for k, v in FAB_MASTER_NAME_DESCRIPTIVE_
 
 FAB_SALINISATION = [chr(65 + i) for i in range(26)]  # A-Z
 FAB_ANTI_STICKING = ["OP-F17G163", "1H,1H,2H,2Hperfluorooctyl-trichlorosilane"]
-FAB_ANTI_STICKING_MAPPING = {"OP-F17G163": 1, "1H,1H,2H,2Hperfluorooctyl-trichlorosilane": 2}
 FAB_RESIN = ["PS90", "PS380", "OrmoStamp", "UV-PDMS KER-4690 A and B"]
-FAB_RESIN_MAPPING = {"PS90": 1, "PS380": 2, "OrmoStamp": 3, "UV-PDMS KER-4690 A and B": 4}
 FAB_RESIST = ["OP-PR192", "mr-UVCur26SF", "MM1158A", "SU8", "mr-InkNIL26SF_XP", "OrmoJet_XP"]
-FAB_RESIST_MAPPING = {"OP-PR192": 1, "mr-UVCur26SF": 2, "MM1158A": 3, "SU8": 4, "mr-InkNIL26SF_XP": 5, "OrmoJet_XP": 6}
 FAB_PRIMER = ["Morphotonics Primer", "OrmoPrime20", "mr-APS1", "OP-APMEX"]
 # FAB_PRIMER_MAPPING = {"Morphotonics Primer": 1, "OrmoPrime20": 2, "mr-APS1": 3, "OP-APMEX": 4} # Not used in sample name
 FAB_PILLAR_PATTERN = ["Pillar with mesa", "Half Pyramids"]
@@ -159,45 +169,34 @@ default_lines = [
 default_speed = [58.1, 282.7, 66.9, 138.9, 53.5, 229.7, 229.7, 111.5]
 default_t_cycle = [5, 20, 5, 5, 5, 20, 20, 5]
 default_t_pulse = [2, 2, 2, 2, 2, 2, 2, 2]
-PLOT_COLORS = ['blue', 'green', 'red', 'cyan', 'magenta', 'yellow', 'purple', 'orange', 'brown'] # Also moved related constant
+SCALE_MODE_LABELS = {"Stretch to fit (independent X/Y)": "stretch", "Uniform fit": "uniform",
+                     "Uniform fit, centred": "uniform_center", "Stretch inside margins": "margin"}
+PRESERVE_MODE_LABELS = {"Keep speed and timing": "none", "Preserve process time": "time",
+                        "Preserve time and pulse spacing": "spacing"}
+TOOLPATH_TABLE_MAX_ROWS = 1000 # Larger toolpath files are scaled straight to disk instead of edited in the table
+FM_SEARCH_LIMIT = 1000 # Files returned by a File Management search of the data catalog
 
 # Function to generate sample name for Fabricated Sample Exporter
-def generate_sample_name_fab(materials_fab, master_id_fab, salinisation_fab, anti_sticking_fab, resin_fab, resist_fab, initials_fab, num_samples_fab):
-    sample_names = []
-    
-    materials_mapping_number = FAB_MATERIALS_MAPPING.get(materials_fab)
-    if materials_mapping_number is None:
-        st.error(f"Selected material '{materials_fab}' is not valid.")
-        return []
-        
-    anti_sticking_mapping_number = FAB_ANTI_STICKING_MAPPING.get(anti_sticking_fab)
-    if anti_sticking_mapping_number is None:
-        st.error(f"Selected anti-sticking material '{anti_sticking_fab}' is not valid.")
-        return []
-    
-    resin_mapping_number = FAB_RESIN_MAPPING.get(resin_fab)
-    if resin_mapping_number is None:
-        st.error(f"Selected resin material '{resin_fab}' is not valid.")
+def generate_sample_name_fab(materials_fab, master_id_fab, salinisation_fab, anti_sticking_fab, resin_fab, resist_fab, initials_fab, num_samples_fab, existing_names=None):
+    """
+    Streamlit wrapper around sample_names.generate_sample_names: invalid selections are
+    reported with st.error and give an empty list. Names in existing_names are skipped.
+    """
+    try:
+        return generate_sample_names(materials_fab, master_id_fab, salinisation_fab, anti_sticking_fab,
+                                     resin_fab, resist_fab, initials_fab, num_samples_fab, existing=existing_names)
+    except SampleNameError as e:
+        st.error(str(e))
         return []
 
-    resist_mapping_number = FAB_RESIST_MAPPING.get(resist_fab)
-    if resist_mapping_number is None:
-        st.error(f"Selected resist material '{resist_fab}' is not valid.")
-        return []
-        
-    # Resin Name Format from notebook: PD-{materials_mapping_number}{master}0{anti_sticking_mapping_number}{salinisation}-0{resin_mapping_number}-0{resist_mapping_number}-{initials}
-    # Ensuring master_id_fab is formatted correctly (e.g., two digits if that's the convention from 'master' list range 0-99)
-    # The notebook uses `master` directly which is `str(i) for i in range(0,100)`.
-    # If master_id_fab needs to be padded (e.g. 01, 02), this should be handled. Assuming it's used as is for now.
-    formatted_master_id_fab = master_id_fab.zfill(2) # Pad with leading zero if single digit
-    resin_name_base = f"PD-{materials_mapping_number}{formatted_master_id_fab}0{anti_sticking_mapping_number}{salinisation_fab}-0{resin_mapping_number}-0{resist_mapping_number}-{initials_fab}"
-    
-    for i in range(num_samples_fab):
-        sample_letter = chr(65 + i)
-        full_sample_name = f"{resin_name_base}-{sample_letter}"
-        sample_names.append(full_sample_name)
-    
-    return sample_names
+FAB_EXCEL_HEADERS = [
+    "Sample Name", "Internal Name", "Material", "Master Name", "Date", 
+    "IPS Name", "Anti Sticking", "Resin", "Anti Sticking 2", "Resist", 
+    "No of Prints", "Temperature", "Pressure", "UV", "UV Time", "Speed", 
+    "Im_gap", "Im_pressure", "Del_gap", "Del_pressure", "Vacuum", 
+    "Pillar Pattern", "Pillar Array", "Primer", "PET", "Metallisation",
+    "Metalised Material", "Singulation", "Comments", "Usability"
+]
 
 # Function to append generated samples to the excel sheet for Fabricated Sample Exporter
 def append_sample_data_to_excel_fab(uploaded_file_obj, target_sheet_name, sample_names_fab, internal_name_fab, material_fab, master_name_for_excel_fab, 
@@ -205,88 +204,81 @@ def append_sample_data_to_excel_fab(uploaded_file_obj, target_sheet_name, sample
                                  temperature_fab, pressure_fab, uv_fab, uv_time_fab, speed_fab, im_gap_fab, im_pressure_fab, 
                                  del_gap_fab, del_pressure_fab, vacuum_fab, pillar_pattern_fab, pillar_array_fab, primer_fab, 
                                  pet_fab, metallisation_fab, metalised_material_fab, singulation_fab, comments_fab, usability_fab):
+    """
+    Appends the samples to the staged workbook kept in session state and returns it.
+    The workbook is opened once per batch (from uploaded_file_obj, or new) and stays parsed
+    between appends; it is only serialized when the batch is downloaded.
+    """
     try:
-        # Try to load from staged workbook buffer first
-        if st.session_state.fab_staged_workbook_buffer and hasattr(st.session_state.fab_staged_workbook_buffer, 'getvalue') and st.session_state.fab_staged_workbook_buffer.getvalue():
-            st.session_state.fab_staged_workbook_buffer.seek(0)
-            wb = openpyxl.load_workbook(st.session_state.fab_staged_workbook_buffer)
-        elif uploaded_file_obj:
-            wb = openpyxl.load_workbook(uploaded_file_obj)
-        else:
-            wb = openpyxl.Workbook()
-
-        if target_sheet_name not in wb.sheetnames:
-            ws = wb.create_sheet(title=target_sheet_name)
-        else:
-            ws = wb[target_sheet_name]
-        
-        # If creating a brand new workbook and the default "Sheet" exists and is empty, and target is not "Sheet"
-        # or if "Sheet" exists, is empty, and target is "Sheet", use it. Otherwise, if it exists and has data, remove it
-        # if we intend to create a new sheet with a different name.
-        # This logic is complex, simplifying for now: if creating new and target is not "Sheet", remove "Sheet" if it exists empty.
-        if not uploaded_file_obj and not (st.session_state.fab_staged_workbook_buffer and st.session_state.fab_staged_workbook_buffer.getvalue()) and "Sheet" in wb.sheetnames and target_sheet_name != "Sheet":
-            # Check if the default "Sheet" is empty before removing
-            default_sheet_check = wb["Sheet"]
-            if not any(default_sheet_check.iter_rows(values_only=True)):
-                 wb.remove(default_sheet_check)
-            # Re-create or get the target sheet if it was the default one and got removed above.
-            if target_sheet_name not in wb.sheetnames:
-                ws = wb.create_sheet(title=target_sheet_name)
-            else:
-                ws = wb[target_sheet_name]
-
-
-        # Find the true last row with data
-        true_last_data_row = 0
-        if ws.max_row > 0: # Only check if there are any rows reported by max_row
-            for row_num in range(ws.max_row, 0, -1):
-                row_has_data = False
-                for col_num in range(1, ws.max_column + 1):
-                    cell_value = ws.cell(row=row_num, column=col_num).value
-                    if cell_value is not None and str(cell_value).strip(): # Check for non-empty, non-whitespace values
-                        row_has_data = True
-                        break
-                if row_has_data:
-                    true_last_data_row = row_num
-                    break
-        
-        next_row_to_write = true_last_data_row + 1
-        
-        # Write headers if the sheet is effectively empty (true_last_data_row is 0)
-        if true_last_data_row == 0:
-            headers = [
-                "Sample Name", "Internal Name", "Material", "Master Name", "Date", 
-                "IPS Name", "Anti Sticking", "Resin", "Anti Sticking 2", "Resist", 
-                "No of Prints", "Temperature", "Pressure", "UV", "UV Time", "Speed", 
-                "Im_gap", "Im_pressure", "Del_gap", "Del_pressure", "Vacuum", 
-                "Pillar Pattern", "Pillar Array", "Primer", "PET", "Metallisation",
-                "Metalised Material", "Singulation", "Comments", "Usability"
-            ] 
-            for col_idx, header_title in enumerate(headers):
-                ws.cell(row=next_row_to_write, column=col_idx + 1).value = header_title
-            next_row_to_write += 1 # Move to next row for actual data
-       
-        # Write the actual sample data rows
-        for sample_name_fab_val in sample_names_fab:
-            today = date.today()
-            formatted_date = today.strftime("%d/%m/%Y")
-            sample_data_list = [
+        staged = st.session_state.fab_staged_workbook
+        if staged is None:
+            staged = StagedWorkbook(uploaded_file_obj)
+            st.session_state.fab_staged_workbook = staged
+
+        formatted_date = date.today().strftime("%d/%m/%Y")
+        rows = (
+            [
                 sample_name_fab_val, internal_name_fab, material_fab, master_name_for_excel_fab, formatted_date, 
                 ips_name_fab, anti_sticking_fab, resin_fab, anti_sticking2_fab, resist_fab, no_of_prints_fab, 
                 temperature_fab, pressure_fab, uv_fab, uv_time_fab, speed_fab, im_gap_fab, im_pressure_fab, 
                 del_gap_fab, del_pressure_fab, vacuum_fab, pillar_pattern_fab, pillar_array_fab, primer_fab,
                 pet_fab, metallisation_fab, metalised_material_fab, singulation_fab, comments_fab, usability_fab
             ]
-            for col_idx, cell_value in enumerate(sample_data_list):
-                ws.cell(row=next_row_to_write, column=col_idx + 1).value = cell_value
-            next_row_to_write += 1 # Increment for the next sample
-        
-        return wb
+            for sample_name_fab_val in sample_names_fab
+        )
+        staged.append_rows(target_sheet_name, rows, headers=FAB_EXCEL_HEADERS)
+        return staged
 
     except Exception as e:
         st.error(f"Error processing Excel data: {str(e)}")
         return None
 
+@st.cache_data(max_entries=16, show_spinner=False)
+def load_sheet_preview(file_key, sheet_name, _source):
+    """
+    Cached read_sheet_preview for an uploaded file; file_key identifies the upload so the
+    file contents are not hashed on every rerun.
+    """
+    return read_sheet_preview(_source, sheet_name)
+
+@st.cache_resource
+def get_excel_parse_cache():
+    """
+    Disk cache of parsed sheets shared by every tab that reads uploaded workbooks.
+    """
+    return SheetParseCache()
+
+@st.cache_resource
+def get_machine_store():
+    """
+    Machine status shared with server.py and server_ngrok.py (see machine_store.py).
+    """
+    return MachineStore()
+
+def save_machine_comment(machine_id, comment_key):
+    # on_change callback, so only the user's own edits are written to the shared store
+    comment = st.session_state[comment_key]
+    get_machine_store().update_machine(machine_id, comments=comment)
+    st.session_state[f"comment_seen_{machine_id}"] = comment
+
+@st.cache_resource
+def get_data_catalog():
+    """
+    SQLite catalog of the Run=/Stage=/Modality= tree shared by the File Management and
+    Data Structure Creator tabs.
+    """
+    return DataCatalog()
+
+def refresh_catalog_after_build(root, schema):
+    # Folders the Data Structure Creator wrote show up in the catalog (and in File
+    # Management listings) right away when the output location is cataloged
+    data_catalog = get_data_catalog()
+    if data_catalog.has_root(root):
+        data_catalog.refresh(root, schema)
+
+def uploaded_file_key(uploaded_file):
+    return (getattr(uploaded_file, "file_id", None), uploaded_file.name, uploaded_file.size)
+
 # Helper function to load sheet names and preview for Fabricated Sample Exporter
 def update_fab_sheet_data(clear_all=False):
     if clear_all:
@@ -301,18 +293,14 @@ def update_fab_sheet_data(clear_all=False):
 
     if uploaded_file:
         try:
-            excel_file_data = pd.ExcelFile(uploaded_file) # pd.ExcelFile can handle UploadedFile objects
-            sheet_names = excel_file_data.sheet_names
+            # Streams only the first rows of the sheet (see excel_preview)
+            preview = load_sheet_preview(uploaded_file_key(uploaded_file), st.session_state.fab_selected_sheet_name, uploaded_file)
+            sheet_names = preview.sheet_names
             st.session_state.fab_excel_sheets_options = sheet_names
             
             if sheet_names:
-                if st.session_state.fab_selected_sheet_name not in sheet_names:
-                    st.session_state.fab_selected_sheet_name = sheet_names[0]
-                
-                if st.session_state.fab_selected_sheet_name:
-                    st.session_state.fab_df_preview = pd.read_excel(excel_file_data, sheet_name=st.session_state.fab_selected_sheet_name)
-                else:
-                    st.session_state.fab_df_preview = None
+                st.session_state.fab_selected_sheet_name = preview.sheet_name
+                st.session_state.fab_df_preview = preview.head
             else:
                 st.session_state.fab_excel_sheets_options = []
                 st.session_state.fab_selected_sheet_name = None
@@ -365,24 +353,11 @@ if 'fab_df_preview' not in st.session_state:
     st.session_state.fab_df_preview = None
 
 # Session state for managing batches of fabricated samples
-if 'fab_staged_workbook_buffer' not in st.session_state: # Stores BytesIO of the workbook being built
-    st.session_state.fab_staged_workbook_buffer = None
+if 'fab_staged_workbook' not in st.session_state: # StagedWorkbook being built, kept parsed between appends
+    st.session_state.fab_staged_workbook = None
 if 'fab_staged_sample_names' not in st.session_state: # Stores list of names in the current batch
     st.session_state.fab_staged_sample_names = []
 
-# Mock data for machine status - Initialize in session state
-if 'machine_status_data' not in st.session_state:
-    st.session_state.machine_status_data = {
-        'machines': [
-            {'id': 1, 'name': 'Primer', 'status': 'Idle', 'uptime': '0h', 'comments': ''},
-            {'id': 2, 'name': 'Coater', 'status': 'Idle', 'uptime': '0h', 'comments': ''},
-            {'id': 3, 'name': 'Nanoimprint Lithography', 'status': 'Idle', 'uptime': '0h', 'comments': ''},
-            {'id': 4, 'name': 'DRIE (ANFF)', 'status': 'Maintenance', 'uptime': '0h', 'comments': 'Needs calibration'},
-            {'id': 5, 'name': 'Dicer (ANFF)', 'status': 'Idle', 'uptime': '0h', 'comments': ''},
-            {'id': 6, 'name': 'SEM (ANFF)', 'status': 'Running', 'uptime': '1h 15m', 'comments': 'Imaging new samples'}
-        ]
-    }
-
 # Session state for Rclone Downloader Tab
 if 'rclone_remote_name' not in st.session_state:
     st.session_state.rclone_remote_name = ""
@@ -451,156 +426,83 @@ if 'tool_run_terminal_cmd_result' in st.session_state and st.session_state.tool_
 
 # Function to rename files
 def rename_files_in_folder(folder_path, old_string, new_string, prefix_string):
+    """
+    Renames every file in folder_path with the File Management rule as one transactional
+    batch (see bulk_rename). Moves that would overwrite a file are skipped and reported.
+    Returns [(old name, new name)] for the files renamed.
+    """
     if not os.path.exists(folder_path):
         st.error(f"The folder {folder_path} does not exist.")
         return []
-    
-    renamed_files = []
-    for filename in os.listdir(folder_path):
-        old_file_path = os.path.join(folder_path, filename)
-        if os.path.isfile(old_file_path):
-            new_filename = filename
-            
-            # Apply old_string to new_string replacement if old_string is provided
-            if old_string:
-                new_filename = new_filename.replace(old_string, new_string)
-
-            # Prepend the prefix_string if provided
-            if prefix_string:
-                new_filename = f"{prefix_string}{new_filename}".replace(' ', '_').replace('_-_', '_')
-            else:
-                new_filename = new_filename.replace(' ', '_').replace('_-_', '_')
 
-            new_file_path = os.path.join(folder_path, new_filename)
-
-            if old_file_path != new_file_path:
-                try:
-                    os.rename(old_file_path, new_file_path)
-                    renamed_files.append((filename, new_filename))
-                except Exception as e:
-                    st.error(f"Error renaming {filename}: {str(e)}")
-    
-    return renamed_files
+    _, files = list_directory_contents(folder_path)
+    plan = plan_renames((f.path, transform_name(f.name, old_string, new_string, prefix_string)) for f in files)
+    for conflict in plan.conflicts:
+        st.error(f"Not renaming {os.path.basename(conflict.source)}: {conflict.reason}")
+    result = execute_renames(plan)
+    for source, error in result.errors.items():
+        st.error(f"Error renaming {os.path.basename(source)}: {error}")
+    return [(os.path.basename(source), os.path.basename(target)) for source, target in result.renamed]
 
 # Function to save Excel rows as CSV files
-def save_rows_as_csv(df, output_folder, start_row, end_row):
+def save_rows_as_csv(df, output_folder, start_row, end_row, fmt="csv"):
+    """
+    Exports rows start_row..end_row (1-based) of df with row_export.export_rows, reporting
+    problems in the app. Returns the RowExportResult, or None if the export failed.
+    """
     try:
-        # Adjust for zero-indexing
-        start_row -= 1
-        end_row -= 1
-
-        # Ensure the row range is valid
-        if start_row < 0 or end_row >= len(df) or start_row > end_row:
-            st.error("Please enter a valid row range.")
-            return []
-
-        saved_files = []
-        # Iterate over the specified rows in the DataFrame
-        for index in range(start_row, end_row + 1):
-            row = df.iloc[index]
-
-            # Check if the row is completely blank
-            if row.isnull().all():
-                continue  # Skip this row if it's blank
-
-            # Get the name from the first column
-            file_name = str(row[0])  # Assuming the name is in the first column
-            
-            # Create a new DataFrame with the header and the current row
-            row_df = pd.DataFrame([row.values], columns=df.columns)
-
-            # Save the row as a CSV file, ensuring the file name is valid
-            if pd.notna(file_name) and file_name:  # Ensure the file name is not NaN or empty
-                file_path = os.path.join(output_folder, f"{file_name}.csv")
-                row_df.to_csv(file_path, index=False)
-                saved_files.append(file_name)
-            else:
-                st.warning(f"Row {index + 1} has an invalid name; skipping.")
-
-        return saved_files
-
+        result = export_rows(df, output_folder, start_row, end_row, fmt=fmt)
+    except ValueError as e:
+        st.error(f"Please enter a valid row range. ({e})")
+        return None
     except Exception as e:
         st.error(f"Error: {str(e)}")
-        return []
+        return None
+
+    if result.skipped_invalid:
+        st.warning(f"{len(result.skipped_invalid)} row(s) have an invalid name and were skipped: "
+                   f"{', '.join(map(str, result.skipped_invalid[:20]))}{' ...' if len(result.skipped_invalid) > 20 else ''}")
+    if result.duplicates:
+        st.warning(f"{len(result.duplicates)} duplicate name(s); the last row with each name was kept.")
+    return result
+
+@st.cache_resource
+def get_directory_listing_cache():
+    """
+    Directory listings shared by every file browser in the app, revalidated by folder mtime.
+    """
+    return DirectoryListingCache()
 
 def list_directory_contents(path):
+    """
+    Returns (directories, files) as DirectoryEntry tuples sorted by name: from the data
+    catalog when a refresh listed the folder and it has not changed since, otherwise from
+    the cached directory walk.
+    """
     try:
-        # Get directories and files
-        items = list(Path(path).glob('*'))
-        directories = [item for item in items if item.is_dir()]
-        files = [item for item in items if item.is_file()]
-        
-        # Sort alphabetically
-        directories.sort(key=lambda x: x.name.lower())
-        files.sort(key=lambda x: x.name.lower())
-        
-        return directories, files
+        listing = get_data_catalog().list_directory(path) or get_directory_listing_cache().get(path)
+        return listing.directories, listing.files
     except Exception as e:
         st.error(f"Error accessing directory: {str(e)}")
         return [], []
 
-def get_file_info(file_path):
-    try:
-        stats = os.stat(file_path)
-        size = stats.st_size
-        modified = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(stats.st_mtime))
-        
-        # Convert size to readable format
-        if size < 1024:
-            size_str = f"{size} B"
-        elif size < 1024 * 1024:
-            size_str = f"{size/1024:.1f} KB"
-        else:
-            size_str = f"{size/(1024*1024):.1f} MB"
-            
-        return size_str, modified
-    except:
-        return "N/A", "N/A"
+def get_file_info(entry):
+    """
+    Returns (size, modified) display strings for a DirectoryEntry.
+    """
+    return format_size(entry.size), time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(entry.mtime))
 
 # Function to create folders based on Sample ID and save CSV
-def create_folders_for_csv(csv_file, file_name, row_df, save_location, fabrication_checked, inspection_checked):
-    created_folders = []
+def create_folders_for_csv(file_name, row_df, save_location, groups):
+    """
+    Creates the folder tree for a single sample (the CSV is saved as f"{file_name}.csv").
+    groups are the modality schema groups to create. Batches of samples go through
+    folder_structure.plan_from_dataframe instead.
+    """
     try:
-        # Folder paths based on the Sample ID
-        run_folder = os.path.join(save_location, f"Run={file_name}")
-        stage_folder = os.path.join(run_folder, "Stage=source_data")
-        
-        # Create the "Stage=source_data" folder
-        os.makedirs(stage_folder, exist_ok=True)
-        created_folders.append(stage_folder)
-
-        # Create folders based on options
-        if fabrication_checked:
-            fabrication_folder = os.path.join(run_folder, "Stage=source_data", "Modality=record_manufacture")
-            os.makedirs(fabrication_folder, exist_ok=True)
-            created_folders.append(fabrication_folder)
-            # Save CSV in the "record_manufacture" folder
-            csv_file_path = os.path.join(fabrication_folder, csv_file)
-            row_df.to_csv(csv_file_path, index=False)
-
-        if inspection_checked:
-            # Create all modality folders except "Modality=record_manufacture"
-            modalities = [
-                "Modality=optical_image",
-                "Modality=sem_c_0deg",
-                "Modality=sem_c_high_angle",
-                "Modality=sem_c_medium_angle",
-                "Modality=sem_p_0deg",
-                "Modality=sem_p_high_angle",
-                "Modality=sem_p_medium_angle"
-            ]
-            
-            for modality in modalities:
-                modality_folder = os.path.join(stage_folder, modality)
-                os.makedirs(modality_folder, exist_ok=True)
-                created_folders.append(modality_folder)
-            
-            # Save the CSV in the stage folder if inspection_checked is true
-            # This is the key part for inspection CSV
-            csv_file_path_inspection = os.path.join(stage_folder, csv_file)
-            row_df.to_csv(csv_file_path_inspection, index=False)
-        
-        return True, created_folders
+        plan = plan_folder_structure(save_location, [(file_name, None, row_df.to_csv(index=False))], groups)
+        status = execute_folder_plan(plan).manifest[0]
+        return (True, status.created) if status.success else (False, status.error)
     except Exception as e:
         return False, str(e)
 
@@ -621,59 +523,68 @@ tab1, tab2, tab_fab_exporter, tab_rclone, tab3, tab4, tab5 = st.tabs([
 
 # Tab 1: Equipment Dashboard
 with tab1:
+    # Status comes from the shared machine store, so it survives refreshes and matches
+    # what the web dashboard (server.py / server_ngrok.py) shows
+    machine_store = get_machine_store()
+    machines = machine_store.machines()
+
     # Create columns for the dashboard
     col1, col2 = st.columns(2)
 
     with col1:
         st.subheader("Equipment Status")
         # Display each machine's status in a card
-        for machine in st.session_state.machine_status_data['machines']:
+        for machine in machines:
+            # The store is shared by every session and server, so its text is escaped before
+            # it goes into raw HTML
+            name, status, uptime, comments = (html.escape(str(machine[field])) for field in ('name', 'status', 'uptime', 'comments'))
             with st.container():
                 st.markdown(f"""
                 <div style='padding: 10px; border: 1px solid #ddd; border-radius: 5px; margin: 10px 0;'>
-                    <h3>{machine['name']}</h3>
+                    <h3>{name}</h3>
                     <p>Status: <span style='color: {'green' if machine['status'] == 'Running' else 'orange' if machine['status'] == 'Idle' else 'red'};'>
-                        {machine['status']}</span></p>
-                    <p>Uptime: {machine['uptime']}</p>
-                    <p>Comments: {machine['comments'] if machine['comments'] else 'N/A'}</p>
+                        {status}</span></p>
+                    <p>Uptime: {uptime}</p>
+                    <p>Comments: {comments if comments else 'N/A'}</p>
                 </div>
                 """, unsafe_allow_html=True)
+        if st.button("🔄 Refresh Status", key="machine_status_refresh"):
+            st.rerun()
 
     with col2:
         st.subheader("Machine Controls")
         # Control panel for each machine
-        for idx, machine in enumerate(st.session_state.machine_status_data['machines']):
+        for machine in machines:
             with st.expander(f"Control {machine['name']}"):
                 # Status control buttons
                 col_start, col_stop, col_maint = st.columns(3)
                 with col_start:
                     if st.button(f"Set Running", key=f"start_{machine['id']}"):
-                        st.session_state.machine_status_data['machines'][idx]['status'] = 'Running'
+                        machine_store.apply_command(machine['id'], 'start')
                         # Potentially update uptime here if logic is added
                         st.success(f"{machine['name']} status set to Running")
                         st.rerun()
                 with col_stop:
                     if st.button(f"Set Idle", key=f"stop_{machine['id']}"):
-                        st.session_state.machine_status_data['machines'][idx]['status'] = 'Idle'
+                        machine_store.apply_command(machine['id'], 'stop')
                         st.warning(f"{machine['name']} status set to Idle")
                         st.rerun()
                 with col_maint:
                     if st.button(f"Set Maintenance", key=f"maint_{machine['id']}"):
-                        st.session_state.machine_status_data['machines'][idx]['status'] = 'Maintenance'
+                        machine_store.apply_command(machine['id'], 'maintenance')
                         st.info(f"{machine['name']} status set to Maintenance")
                         st.rerun()
                 
                 # Comment input
-                # Use a unique key for the text_area and update session_state based on this key's value
+                # The text_area follows the stored comment until the user edits it; edits are
+                # saved by the on_change callback
                 comment_key = f"comment_input_{machine['id']}"
-                # Initialize the text_area with the current comment
-                current_comment = st.session_state.machine_status_data['machines'][idx]['comments']
-                new_comment = st.text_area("Add/Edit Comment:", value=current_comment, key=comment_key, height=100)
-                
-                # Update the comment in session_state if it has changed
-                if new_comment != current_comment:
-                    st.session_state.machine_status_data['machines'][idx]['comments'] = new_comment
-                    st.rerun() # Rerun to reflect comment update immediately in status display
+                seen_key = f"comment_seen_{machine['id']}"
+                if st.session_state.get(seen_key) != machine['comments']:
+                    st.session_state[comment_key] = machine['comments']
+                    st.session_state[seen_key] = machine['comments']
+                st.text_area("Add/Edit Comment:", key=comment_key, height=100,
+                             on_change=save_machine_comment, args=(machine['id'], comment_key))
 
     # System metrics
     st.subheader("System Metrics")
@@ -682,7 +593,7 @@ with tab1:
     with metrics_col1:
         st.metric("Total Uptime", "21h 15m")
     with metrics_col2:
-        st.metric("Active Machines", "1/3")
+        st.metric("Active Machines", f"{sum(m['status'] == 'Running' for m in machines)}/{len(machines)}")
     with metrics_col3:
         st.metric("Efficiency", "85%", "+2%")
 
@@ -703,7 +614,9 @@ with tab2:
             st.session_state.current_directory = resolved_path
             st.session_state.selected_files.clear()
             _, files_in_new_dir = list_directory_contents(st.session_state.current_directory)
-            st.session_state.selected_files.extend([str(f.resolve()) for f in files_in_new_dir])
+            st.session_state.selected_files.extend([f.path for f in files_in_new_dir])
+            st.session_state.fm_file_page = 1
+            st.session_state.fm_dir_page = 1
             # Update the text input field to reflect the new path
             st.session_state.fm_path_input_val = resolved_path 
             return True
@@ -770,42 +683,95 @@ with tab2:
             else:
                 st.info("Already at the top level or cannot go further up.")
     
-    # List directories and files
+    # Catalog counts when the current folder is a cataloged output location or run
+    data_catalog = get_data_catalog()
+    if data_catalog.has_root(st.session_state.current_directory):
+        catalog_runs = data_catalog.run_summary(st.session_state.current_directory)
+        st.caption(f"Data catalog: {len(catalog_runs)} run(s), {int(catalog_runs['file_count'].sum())} file(s), "
+                   f"{catalog_runs['total_bytes'].sum() / 1e6:.1f} MB as of the last refresh.")
+    else:
+        catalog_modalities = data_catalog.modality_summary(run_path=st.session_state.current_directory)
+        if not catalog_modalities.empty:
+            st.caption("Data catalog: modalities of this run as of the last refresh.")
+            st.dataframe(catalog_modalities.drop(columns=["sample_id", "latest_mtime"]), hide_index=True)
+
+    # List directories and files (from the data catalog when it has this folder and the
+    # folder is unchanged, else walked); only the current page of each is rendered
     directories, files = list_directory_contents(st.session_state.current_directory)
-    
+    for page_key in ("fm_dir_page", "fm_file_page"):
+        if page_key not in st.session_state:
+            st.session_state[page_key] = 1
+
+    def fm_page_controls(label, entry_page, page_key):
+        # Previous/next buttons and a position caption for one paginated list
+        if entry_page.page_count <= 1:
+            return
+        prev_col, info_col, next_col = st.columns([1, 3, 1])
+        with prev_col:
+            if st.button("◀ Previous", key=f"{page_key}_prev", disabled=entry_page.page <= 1):
+                st.session_state[page_key] = entry_page.page - 1
+                st.rerun()
+        with info_col:
+            first = (entry_page.page - 1) * DEFAULT_PAGE_SIZE + 1
+            st.caption(f"{label} {first}-{first + len(entry_page.entries) - 1} of {entry_page.total} "
+                       f"(page {entry_page.page} of {entry_page.page_count})")
+        with next_col:
+            if st.button("Next ▶", key=f"{page_key}_next", disabled=entry_page.page >= entry_page.page_count):
+                st.session_state[page_key] = entry_page.page + 1
+                st.rerun()
+
     # Show directories
     if directories:
         st.subheader("📁 Directories")
-        for dir_item in directories: 
-            dir_path_str = str(dir_item.resolve()) 
-            display_key = f"dir_{str(dir_item)}_{dir_item.name}"
+        dir_page = query_entries(directories, page=st.session_state.fm_dir_page)
+        for dir_item in dir_page.entries:
+            display_key = f"dir_{dir_item.path}"
             if st.button(f"📁 {dir_item.name}", key=display_key):
-                if fm_update_current_directory_and_select_all(dir_path_str):
-                    st.session_state.fm_path_input_val = dir_path_str 
+                if fm_update_current_directory_and_select_all(dir_item.path):
+                    st.session_state.fm_path_input_val = dir_item.path
                     st.rerun()
-    
-    # File filter - Moved before the conditional display of files
-    file_filter = st.text_input("🔍 Filter files (leave empty to show all):", "", key="fm_file_filter")
+        fm_page_controls("Folders", dir_page, "fm_dir_page")
+
+    # File filter and sort order - Moved before the conditional display of files
+    filter_col, sort_col, order_col = st.columns([3, 1, 1])
+    with filter_col:
+        file_filter = st.text_input("🔍 Filter files (leave empty to show all):", "", key="fm_file_filter")
+        search_subfolders = False
+        if data_catalog.has_folder(st.session_state.current_directory):
+            search_subfolders = st.checkbox("Search all subfolders (data catalog)", key="fm_search_subfolders",
+                                            help="Finds matching files anywhere below this folder, as of the last catalog refresh.")
+    with sort_col:
+        file_sort = st.selectbox("Sort by", SORT_KEYS, key="fm_file_sort")
+    with order_col:
+        file_descending = st.selectbox("Order", ["Ascending", "Descending"], key="fm_file_order") == "Descending"
+
+    # A subfolder search is one catalog query; otherwise the folder's own files are filtered
+    file_pattern = file_filter
+    if search_subfolders and file_filter:
+        files = data_catalog.search_files(st.session_state.current_directory, file_filter, limit=FM_SEARCH_LIMIT)
+        file_pattern = ""
+        if len(files) == FM_SEARCH_LIMIT:
+            st.caption(f"Showing the first {FM_SEARCH_LIMIT} matches; refine the filter to narrow the search.")
 
     # Show files with selection
     if files:
         st.subheader("📄 Files")
-        
-        # Filter files based on the input
-        filtered_files = [
-            file for file in files 
-            if not file_filter or file_filter.lower() in file.name.lower()
-        ]
-
-        if filtered_files: # Only show buttons and table if there are files after filtering
-            # Select All / Deselect All buttons for VISIBLE files
+
+        # Filter, sort and paginate; a changed filter or order starts again at page 1
+        file_query = (file_filter, search_subfolders, file_sort, file_descending)
+        if st.session_state.get("fm_file_query") != file_query:
+            st.session_state.fm_file_query = file_query
+            st.session_state.fm_file_page = 1
+        file_page = query_entries(files, file_pattern, file_sort, file_descending, st.session_state.fm_file_page)
+
+        if file_page.total: # Only show buttons and table if there are files after filtering
+            selected_set = set(st.session_state.selected_files)
+            # Select All / Deselect All buttons for VISIBLE files (every page of the filtered list)
             col_sel_buttons1, col_sel_buttons2 = st.columns(2)
             with col_sel_buttons1:
-                if st.button("Select All Visible Files", key="fm_select_all_visible_btn"):
-                    for file_obj in filtered_files:
-                        resolved_f_path = str(file_obj.resolve())
-                        if resolved_f_path not in st.session_state.selected_files:
-                            st.session_state.selected_files.append(resolved_f_path)
+                if st.button(f"Select All {file_page.total} Matching Files", key="fm_select_all_visible_btn"):
+                    matching = query_entries(files, file_pattern, page_size=max(1, file_page.total)).entries
+                    st.session_state.selected_files.extend(f.path for f in matching if f.path not in selected_set)
                     st.rerun()
             with col_sel_buttons2:
                 if st.button("Deselect All Files", key="fm_deselect_all_btn"):
@@ -823,28 +789,33 @@ with tab2:
             with header_cols[3]:
                 st.write("Modified")
             
-            for file_obj in filtered_files: 
-                size, modified = get_file_info(file_obj) 
-                resolved_file_path_str = str(file_obj.resolve())
+            for file_obj in file_page.entries:
+                size, modified = get_file_info(file_obj)
+                file_path_str = file_obj.path
                 
                 row_cols = st.columns([0.5, 2, 1, 1])
                 with row_cols[0]:
-                    is_selected = st.checkbox(label=f"Select file {file_obj.name}", key=f"select_{resolved_file_path_str}", value=resolved_file_path_str in st.session_state.selected_files, label_visibility="collapsed")
+                    is_selected = st.checkbox(label=f"Select file {file_obj.name}", key=f"select_{file_path_str}", value=file_path_str in selected_set, label_visibility="collapsed")
                     if is_selected:
-                        if resolved_file_path_str not in st.session_state.selected_files:
-                            st.session_state.selected_files.append(resolved_file_path_str)
+                        if file_path_str not in selected_set:
+                            st.session_state.selected_files.append(file_path_str)
+                            selected_set.add(file_path_str)
                     else:
-                        if resolved_file_path_str in st.session_state.selected_files:
-                            st.session_state.selected_files.remove(resolved_file_path_str)
+                        if file_path_str in selected_set:
+                            st.session_state.selected_files.remove(file_path_str)
+                            selected_set.discard(file_path_str)
                 with row_cols[1]:
-                    st.write(file_obj.name)
+                    st.write(os.path.relpath(file_obj.path, st.session_state.current_directory) if search_subfolders and file_filter else file_obj.name)
                 with row_cols[2]:
                     st.write(size)
                 with row_cols[3]:
                     st.write(modified)
+            fm_page_controls("Files", file_page, "fm_file_page")
         else: # Files exist in the directory, but none match the current filter
             st.info("No files match the current filter.")
             
+    elif search_subfolders and file_filter: # Catalog search without a match
+        st.info("No cataloged files below this folder match the filter.")
     else: # No files in the directory at all
         st.info("No files found in this directory.")
 
@@ -860,46 +831,62 @@ with tab2:
         with col2:
             prefix_string = st.text_input("Add Prefix", placeholder="Leave blank to skip")
             
+        def fm_plan_selected_renames():
+            # Planned only on a button press; it lists every folder the selection touches
+            return plan_renames(
+                (file_path, transform_name(os.path.basename(file_path), old_string, new_string, prefix_string))
+                for file_path in st.session_state.selected_files
+            )
+
+        def fm_show_rename_conflicts(plan):
+            if plan.conflicts:
+                st.warning(f"{len(plan.conflicts)} file(s) will not be renamed because the result would overwrite a file:")
+                st.text("\n".join(f"'{os.path.basename(c.source)}' → '{os.path.basename(c.target)}': {c.reason}"
+                                   for c in plan.conflicts[:200]))
+
         if st.button("Preview Changes"):
-            st.write("Preview of changes:")
-            for file_path in st.session_state.selected_files:
-                file = Path(file_path)
-                new_filename = file.name
-                if old_string:
-                    new_filename = new_filename.replace(old_string, new_string)
-                if prefix_string:
-                    new_filename = f"{prefix_string}{new_filename}"
-                new_filename = new_filename.replace(' ', '_').replace('_-_', '_')
-                
-                if new_filename != file.name:
-                    st.text(f"'{file.name}' → '{new_filename}'")
-                
+            rename_plan = fm_plan_selected_renames()
+            st.write(f"Preview of changes: {len(rename_plan.moves)} rename(s)"
+                     + (f", {rename_plan.cycles} swap cycle(s) through temporary names" if rename_plan.cycles else ""))
+            preview = [f"'{os.path.basename(m.source)}' → '{os.path.basename(m.target)}'" for m in rename_plan.moves[:200]]
+            if len(rename_plan.moves) > 200:
+                preview.append(f"... and {len(rename_plan.moves) - 200} more")
+            st.text("\n".join(preview))
+            fm_show_rename_conflicts(rename_plan)
+
         if st.button("Rename Selected Files"):
-            renamed_count = 0
-            for file_path in st.session_state.selected_files:
-                file = Path(file_path)
-                new_filename = file.name
-                if old_string:
-                    new_filename = new_filename.replace(old_string, new_string)
-                if prefix_string:
-                    new_filename = f"{prefix_string}{new_filename}"
-                new_filename = new_filename.replace(' ', '_').replace('_-_', '_')
-                
-                if new_filename != file.name:
-                    try:
-                        new_path = file.parent / new_filename
-                        os.rename(file, new_path)
-                        renamed_count += 1
-                    except Exception as e:
-                        st.error(f"Error renaming {file.name}: {str(e)}")
-            
-            if renamed_count > 0:
-                st.success(f"Successfully renamed {renamed_count} files!")
+            rename_plan = fm_plan_selected_renames()
+            fm_show_rename_conflicts(rename_plan)
+            with st.spinner(f"Renaming {len(rename_plan.moves)} file(s)..."):
+                rename_result = execute_renames(rename_plan)
+            if rename_result.rolled_back:
+                st.error(f"{len(rename_result.errors)} rename(s) failed, so every file was restored to its original name.")
+                for source, error in list(rename_result.errors.items())[:50]:
+                    st.error(f"Error renaming {os.path.basename(source)}: {error}")
+            elif rename_result.renamed:
+                st.success(f"Successfully renamed {len(rename_result.renamed)} files!")
                 st.session_state.selected_files = []
                 st.rerun()
             else:
                 st.info("No files were renamed.")
 
+    # Undo a recent batch rename from its journal
+    recent_journals = [j for j in list_journals(limit=10) if not j.rolled_back]
+    if recent_journals:
+        with st.expander("Undo a Recent Rename"):
+            journal_labels = {
+                f"{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(j.created))} - {j.moves} file(s)": j.path
+                for j in recent_journals
+            }
+            undo_choice = st.selectbox("Rename batch", list(journal_labels), key="fm_undo_journal")
+            if st.button("Undo Rename", key="fm_undo_rename_btn"):
+                undo_result = rollback_renames(journal_labels[undo_choice])
+                for path, error in list(undo_result.errors.items())[:50]:
+                    st.error(f"Could not restore {os.path.basename(path)}: {error}")
+                st.success(f"Restored {len(undo_result.renamed)} file(s) to their original names.")
+                st.session_state.selected_files = []
+                st.rerun()
+
 # New Tab: Fabricated Sample Exporter
 with tab_fab_exporter:
     st.subheader("Fabricated Sample Exporter")
@@ -1083,7 +1070,8 @@ with tab_fab_exporter:
         else:
             generated_names = generate_sample_name_fab(
                 fab_material, fab_master_id, fab_salinisation, fab_anti_sticking,
-                fab_resin, fab_resist, fab_initials, fab_num_samples
+                fab_resin, fab_resist, fab_initials, fab_num_samples,
+                existing_names=set(st.session_state.fab_staged_sample_names)
             )
 
             if generated_names:
@@ -1091,10 +1079,10 @@ with tab_fab_exporter:
                 for name in generated_names:
                     st.text(name)
                 
-                # The append function now uses/updates the staged workbook or uploaded file
-                # and returns the workbook object.
-                modified_workbook = append_sample_data_to_excel_fab(
-                    uploaded_file_obj=st.session_state.fab_uploaded_excel_file if not st.session_state.fab_staged_workbook_buffer else None, # Pass uploaded file only if no staged buffer
+                # The append function uses/updates the staged workbook (opened from the uploaded file on the first append)
+                # and returns it.
+                staged_workbook = append_sample_data_to_excel_fab(
+                    uploaded_file_obj=st.session_state.fab_uploaded_excel_file if st.session_state.fab_staged_workbook is None else None, # Pass uploaded file only if nothing is staged yet
                     target_sheet_name=selected_sheet_for_generation,
                     sample_names_fab=generated_names,
                     internal_name_fab=fab_internal_name, 
@@ -1127,18 +1115,10 @@ with tab_fab_exporter:
                     usability_fab=fab_usability
                 )
                 
-                if modified_workbook:
+                if staged_workbook is not None:
                     try:
-                        # Save workbook to an in-memory buffer for staging
-                        excel_buffer = io.BytesIO()
-                        modified_workbook.save(excel_buffer)
-                        # excel_buffer.seek(0) # No need to seek here, will be done before reading
-                        st.session_state.fab_staged_workbook_buffer = excel_buffer
-                        
-                        # Add generated names to the staged list (avoiding duplicates if re-generating same)
-                        for name in generated_names:
-                            if name not in st.session_state.fab_staged_sample_names:
-                                st.session_state.fab_staged_sample_names.append(name)
+                        # Generated names already skip everything staged, so they can be added as-is
+                        st.session_state.fab_staged_sample_names.extend(generated_names)
                         
                         st.success(f"{len(generated_names)} sample(s) added to the current batch!")
                         # Do not show download button here, it will be separate
@@ -1158,26 +1138,31 @@ with tab_fab_exporter:
         # Determine the download filename for the batch
         batch_download_filename = st.session_state.fab_target_save_path
         if not batch_download_filename:
-            if st.session_state.fab_uploaded_excel_file and not st.session_state.fab_staged_workbook_buffer: # If using uploaded as template for first batch
+            if st.session_state.fab_uploaded_excel_file and st.session_state.fab_staged_workbook is None: # If using uploaded as template for first batch
                 batch_download_filename = st.session_state.fab_uploaded_excel_file.name
             else: # Default name if no path given or if buffer already exists
                 batch_download_filename = "fabricated_samples_batch.xlsx"
         if not batch_download_filename.lower().endswith(".xlsx"):
             batch_download_filename += ".xlsx"
 
-        if st.session_state.fab_staged_workbook_buffer and st.session_state.fab_staged_workbook_buffer.getvalue():
-            st.download_button(
-                label="📥 Download Batch File",
-                data=st.session_state.fab_staged_workbook_buffer.getvalue(), # Getvalue directly here
-                file_name=batch_download_filename,
-                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                key="fab_download_batch_button"
-            )
+        staged_workbook = st.session_state.fab_staged_workbook
+        if staged_workbook is not None:
+            # Serializing a large workbook is the slow part, so it only happens on request
+            if staged_workbook.is_serialized or st.button("Prepare Batch File for Download", key="fab_prepare_batch_button"):
+                with st.spinner("Writing workbook..."):
+                    batch_bytes = staged_workbook.to_bytes()
+                st.download_button(
+                    label="📥 Download Batch File",
+                    data=batch_bytes,
+                    file_name=batch_download_filename,
+                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                    key="fab_download_batch_button"
+                )
         else:
             st.warning("No batch data to download. Add samples first.")
 
         if st.button("Clear Current Batch", key="fab_clear_batch_button"):
-            st.session_state.fab_staged_workbook_buffer = None
+            st.session_state.fab_staged_workbook = None
             st.session_state.fab_staged_sample_names = []
             st.session_state.fab_uploaded_excel_file = None # Also clear uploaded file if batch is cleared, to start fresh
             st.session_state.fab_target_save_path = "" # Clear suggested save path
@@ -1275,7 +1260,7 @@ with tab_rclone:
             if browser_dirs:
                 st.write("Subdirectories (click to navigate):")
                 for i, dir_item in enumerate(browser_dirs):
-                    dir_path_str = str(dir_item.resolve())
+                    dir_path_str = dir_item.path
                     clean_dir_name = "".join(c if c.isalnum() or c in ['_'] else '_' for c in dir_item.name)
                     button_key = f"rclone_browse_dest_nav_to_dir_idx_{i}_{clean_dir_name}"
                     if st.button(f"📁 {dir_item.name}", key=button_key):
@@ -1389,26 +1374,29 @@ with tab3:
     
     if uploaded_file is not None:
         try:
-            # Read Excel file
-            excel_file = pd.ExcelFile(uploaded_file)
-            sheet_name = st.selectbox("Select Sheet", excel_file.sheet_names)
-            
-            # Read the selected sheet
-            df = pd.read_excel(uploaded_file, sheet_name=sheet_name)
+            # Preview only: the full sheet is parsed when the export runs
+            file_key = uploaded_file_key(uploaded_file)
+            sheet_names = load_sheet_preview(file_key, None, uploaded_file).sheet_names
+            sheet_name = st.selectbox("Select Sheet", sheet_names)
+            preview = load_sheet_preview(file_key, sheet_name, uploaded_file)
             
             # Show DataFrame preview
             st.write("Preview of the Excel file:")
-            st.dataframe(df.head())
+            st.dataframe(preview.head)
             
             # Input for row range
             col1, col2 = st.columns(2)
             with col1:
-                start_row = st.number_input("Start Row", min_value=1, max_value=len(df), value=1)
+                start_row = st.number_input("Start Row", min_value=1, max_value=preview.row_count, value=1)
             with col2:
-                end_row = st.number_input("End Row", min_value=1, max_value=len(df), value=min(5, len(df)))
+                end_row = st.number_input("End Row", min_value=1, max_value=preview.row_count, value=min(5, preview.row_count))
             
             # Output folder
             output_folder = st.text_input("Output Folder Path", placeholder="Enter the folder path for CSV files", key="excel_folder")
+            export_format_labels = {"One CSV file per row": "csv", "Single .zip of CSV files": "zip", "Single .tar of CSV files": "tar"}
+            if HAVE_PARQUET:
+                export_format_labels["One Parquet file per sample"] = "parquet"
+            export_format = export_format_labels[st.selectbox("Output Format", list(export_format_labels), key="excel_export_format")]
             
             if st.button("Export Rows"):
                 if not output_folder:
@@ -1416,12 +1404,20 @@ with tab3:
                 elif not os.path.exists(output_folder):
                     st.error("Output folder does not exist.")
                 else:
-                    saved_files = save_rows_as_csv(df, output_folder, start_row, end_row)
-                    if saved_files:
-                        st.success(f"Successfully exported {len(saved_files)} files!")
-                        st.write("Exported files:")
-                        for file_name in saved_files:
-                            st.text(f"- {file_name}.csv")
+                    with st.spinner("Reading sheet..."):
+                        df = get_excel_parse_cache().read_sheet(uploaded_file, sheet_name)
+                    end_row = min(end_row, len(df)) # The preview row count can include trailing blank rows
+                    result = save_rows_as_csv(df, output_folder, start_row, end_row, fmt=export_format)
+                    if result and result.exported:
+                        st.success(f"Successfully exported {len(result.exported)} rows to {result.output} "
+                                   f"in {result.elapsed:.2f} s ({result.rows_per_second:,.0f} rows/s)!")
+                        if result.skipped_blank:
+                            st.caption(f"Skipped {len(result.skipped_blank)} blank row(s).")
+                        with st.expander(f"Exported names ({len(result.exported)})"):
+                            extension = "parquet" if export_format == "parquet" else "csv"
+                            st.text("\n".join(f"- {name}.{extension}" for name in result.exported[:1000]))
+                            if len(result.exported) > 1000:
+                                st.caption(f"... and {len(result.exported) - 1000} more")
                     else:
                         st.warning("No files were exported. Please check your row range and data.")
                         
@@ -1435,33 +1431,40 @@ with tab4:
     # Two methods: Excel file or manual Sample ID
     method = st.radio("Choose Method", ["Upload Excel File", "Enter Sample ID Manually"])
     
-    col1, col2 = st.columns(2)
-    with col1:
-        fabrication = st.checkbox("Include Fabrication Folder")
-    with col2:
-        inspection = st.checkbox("Include Inspection Folders")
+    # One checkbox per group in the modality schema (modality_schema.json)
+    try:
+        folder_schema = get_schema()
+    except (OSError, ValueError) as e:
+        st.error(f"Could not load the modality schema: {e}")
+        folder_schema = None
+    selected_groups = []
+    if folder_schema is not None:
+        group_columns = st.columns(max(len(folder_schema.groups), 1))
+        for column, group in zip(group_columns, folder_schema.groups.values()):
+            with column:
+                if st.checkbox(group.label, key=f"structure_group_{group.name}"):
+                    selected_groups.append(group.name)
     
     if method == "Upload Excel File":
         excel_file = st.file_uploader("Choose Excel File", type=['xlsx', 'xls'], key="structure_excel")
         
         if excel_file is not None:
-            # Read Excel file
-            excel_data = pd.ExcelFile(excel_file)
-            sheet_name = st.selectbox("Select Sheet", excel_data.sheet_names, key="structure_sheet")
-            
-            # Read the selected sheet
-            df = pd.read_excel(excel_file, sheet_name=sheet_name)
+            # Preview only: the full sheet is parsed when the folders are created
+            file_key = uploaded_file_key(excel_file)
+            sheet_names = load_sheet_preview(file_key, None, excel_file).sheet_names
+            sheet_name = st.selectbox("Select Sheet", sheet_names, key="structure_sheet")
+            preview = load_sheet_preview(file_key, sheet_name, excel_file)
             
             # Show DataFrame preview
             st.write("Preview of the Excel file:")
-            st.dataframe(df.head())
+            st.dataframe(preview.head)
             
             # Row range selection
             col1, col2 = st.columns(2)
             with col1:
-                start_row = st.number_input("Start Row", min_value=1, max_value=len(df), value=1, key="structure_start")
+                start_row = st.number_input("Start Row", min_value=1, max_value=preview.row_count, value=1, key="structure_start")
             with col2:
-                end_row = st.number_input("End Row", min_value=1, max_value=len(df), value=min(5, len(df)), key="structure_end")
+                end_row = st.number_input("End Row", min_value=1, max_value=preview.row_count, value=min(5, preview.row_count), key="structure_end")
     else:
         sample_id = st.text_input("Enter Sample ID")
     
@@ -1510,7 +1513,7 @@ with tab4:
             if browser_dirs:
                 st.write("Subdirectories (click to navigate):")
                 for i, dir_item in enumerate(browser_dirs):
-                    dir_path_str = str(dir_item.resolve()) 
+                    dir_path_str = dir_item.path
                     # Sanitize dir_item.name for the key and add index for uniqueness
                     clean_dir_name = "".join(c if c.isalnum() or c in ['_'] else '_' for c in dir_item.name)
                     button_key = f"browse_nav_to_dir_tab4_idx_{i}_{clean_dir_name}"
@@ -1531,6 +1534,7 @@ with tab4:
                 st.rerun()
     # --- End Output Location with Browse ---
     
+    dry_run_structure = st.checkbox("Dry run (show the plan without creating anything)", key="structure_dry_run")
     if st.button("Create Folder Structure"):
         final_save_location = st.session_state.save_location_val 
         if not final_save_location:
@@ -1539,45 +1543,59 @@ with tab4:
             st.error(f"Output location is not a valid directory or does not exist: {final_save_location}")
         else:
             if method == "Upload Excel File" and excel_file is not None:
-                success_count = 0
-                error_messages = []
+                with st.spinner("Reading sheet..."):
+                    df = get_excel_parse_cache().read_sheet(excel_file, sheet_name)
+                end_row = min(end_row, len(df)) # The preview row count can include trailing blank rows
                 
-                # Process Excel rows
-                for index in range(start_row-1, end_row):
-                    row = df.iloc[index]
-                    if not row.isnull().all():
-                        sample_id = str(row[0])
-                        if pd.notna(sample_id) and sample_id:
-                            success, result = create_folders_for_csv(
-                                f"{sample_id}.csv",
-                                sample_id,
-                                pd.DataFrame([row.values], columns=df.columns),
-                                final_save_location,
-                                fabrication,
-                                inspection
-                            )
-                            if success:
-                                success_count += 1
-                            else:
-                                error_messages.append(f"Error with {sample_id}: {result}")
-                
-                if success_count > 0:
-                    st.success(f"Successfully created folder structures for {success_count} samples!")
-                if error_messages:
-                    for msg in error_messages:
-                        st.error(msg)
+                # Plan every folder and file for the whole range, then build them in parallel
+                try:
+                    plan = plan_from_dataframe(df, final_save_location, start_row, end_row, selected_groups, folder_schema)
+                except ValueError as e:
+                    st.error(f"Please enter a valid row range. ({e})")
+                    plan = None
+                if plan is not None:
+                    if dry_run_structure:
+                        st.info("Dry run: nothing was written.")
+                        st.code(format_plan(plan), language=None)
+                    else:
+                        with st.spinner(f"Creating folders for {len(plan.samples)} samples..."):
+                            build = execute_folder_plan(plan)
+                            refresh_catalog_after_build(final_save_location, folder_schema)
+                        succeeded = [status for status in build.manifest if status.success]
+                        failed = [status for status in build.manifest if not status.success]
+                        if succeeded:
+                            st.success(f"Successfully created folder structures for {len(succeeded)} samples "
+                                       f"({build.directories_created} new folders, {build.files_written} files) in {build.elapsed:.2f} s!")
+                        for status in failed[:50]:
+                            st.error(f"Error with {status.sample_id} (row {status.row}): {status.error}")
+                        if len(failed) > 50:
+                            st.error(f"... and {len(failed) - 50} more failed samples (see the manifest).")
+                        if plan.skipped_rows:
+                            st.caption(f"Skipped {len(plan.skipped_rows)} blank row(s) or row(s) without a sample ID.")
+                        if plan.duplicates:
+                            st.warning(f"{len(plan.duplicates)} duplicate sample ID(s); the last row with each ID was kept.")
+                        manifest_df = pd.DataFrame(build.manifest, columns=["sample_id", "row", "success", "created", "error"])
+                        manifest_df["created"] = manifest_df["created"].str.len()
+                        st.download_button(
+                            "📥 Download Manifest (CSV)",
+                            data=manifest_df.rename(columns={"created": "folders"}).to_csv(index=False),
+                            file_name="folder_structure_manifest.csv",
+                            mime="text/csv",
+                            key="structure_manifest_download"
+                        )
                         
             else:  # Manual Sample ID
                 if not sample_id:
                     st.error("Please enter a Sample ID")
+                elif dry_run_structure:
+                    st.info("Dry run: nothing was written.")
+                    st.code(format_plan(plan_folder_structure(final_save_location, [(sample_id, None, "")], selected_groups, folder_schema)), language=None)
                 else:
                     success, result = create_folders_for_csv(
-                        f"{sample_id}.csv",
                         sample_id,
                         pd.DataFrame(),
                         final_save_location,
-                        fabrication,
-                        inspection
+                        selected_groups
                     )
                     if success:
                         st.success(f"Successfully created folder structure for {sample_id}!")
@@ -1587,6 +1605,83 @@ with tab4:
                     else:
                         st.error(f"Error creating folders: {result}")
 
+    # Add new modalities to runs that already exist under the output location
+    if folder_schema is not None:
+        with st.expander("Add Modality to Existing Runs"):
+            st.caption("Reads the existing runs from the data catalog when it has the output location, otherwise "
+                       "scans the Run= folders once; only the missing folders are created.")
+            add_group = st.selectbox("Modalities from schema group", ["(none)"] + list(folder_schema.groups), key="structure_add_group")
+            extra_modalities = st.text_input("Additional modality names (comma separated)", placeholder="e.g. afm_topography", key="structure_add_extra")
+            if add_group != "(none)":
+                add_stage = folder_schema.groups[add_group].stage
+                add_modalities = list(folder_schema.groups[add_group].modalities)
+            else:
+                add_stage = st.text_input("Stage", value="source_data", key="structure_add_stage")
+                add_modalities = []
+            add_modalities += [m.strip() for m in extra_modalities.split(",") if m.strip()]
+
+            if st.button("Add to Existing Runs", key="structure_add_button"):
+                final_save_location = st.session_state.save_location_val
+                if not os.path.isdir(final_save_location):
+                    st.error(f"Output location is not a valid directory or does not exist: {final_save_location}")
+                elif not add_modalities:
+                    st.warning("Choose a schema group or enter at least one modality name.")
+                else:
+                    # The catalog's layout is used while no run was added or removed since its
+                    # last refresh (the output location's listing is still current)
+                    data_catalog = get_data_catalog()
+                    layout = None
+                    if data_catalog.has_root(final_save_location) and data_catalog.list_directory(final_save_location) is not None:
+                        layout = data_catalog.run_layout(final_save_location)
+                    try:
+                        with st.spinner("Reading existing runs..."):
+                            add_plan = plan_add_modalities(final_save_location, add_stage, add_modalities, folder_schema,
+                                                           layout=layout)
+                    except SchemaError as e:
+                        st.error(f"Please enter valid stage and modality names. ({e})")
+                        add_plan = None
+                    if add_plan is not None:
+                        if not add_plan.directories:
+                            st.info("Every run already has these modalities.")
+                        elif dry_run_structure:
+                            st.info("Dry run: nothing was written.")
+                            st.code(format_plan(add_plan), language=None)
+                        else:
+                            build = execute_folder_plan(add_plan)
+                            refresh_catalog_after_build(final_save_location, folder_schema)
+                            failed = [status for status in build.manifest if not status.success]
+                            st.success(f"Created {build.directories_created} folder(s) across {len(add_plan.samples) - len(failed)} run(s).")
+                            for status in failed[:50]:
+                                st.error(f"Error with {status.sample_id}: {status.error}")
+
+        # Indexed view of the runs under the output location
+        with st.expander("Data Catalog"):
+            data_catalog = get_data_catalog()
+            catalog_root = st.session_state.save_location_val
+            last_scanned = data_catalog.last_scanned(catalog_root)
+            st.caption(f"Catalog: {data_catalog.db_path}. Last refresh of this output location: "
+                       + (time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(last_scanned)) if last_scanned else "never"))
+            full_refresh = st.checkbox("Full refresh (recount every modality)", key="catalog_full_refresh")
+            if st.button("Refresh Catalog", key="catalog_refresh_button"):
+                if not os.path.isdir(catalog_root):
+                    st.error(f"Output location is not a valid directory or does not exist: {catalog_root}")
+                else:
+                    with st.spinner("Refreshing the data catalog..."):
+                        stats = data_catalog.refresh(catalog_root, folder_schema, full=full_refresh)
+                    st.success(f"{stats.runs} run(s) cataloged ({stats.removed_runs} removed): listed {stats.listed_dirs} "
+                               f"folder(s), recounted {stats.recounted_modalities} modality folder(s) in {stats.elapsed:.2f} s.")
+            if data_catalog.has_root(catalog_root):
+                st.dataframe(data_catalog.run_summary(catalog_root).drop(columns=["path"]), hide_index=True)
+                missing_col1, missing_col2 = st.columns([3, 1])
+                with missing_col1:
+                    missing_pattern = st.text_input("Find samples missing a modality (SQL LIKE, e.g. sem_%)", key="catalog_missing_pattern")
+                with missing_col2:
+                    missing_min_files = st.number_input("Min. files", min_value=1, value=1, key="catalog_missing_min_files")
+                if missing_pattern:
+                    missing = data_catalog.samples_missing(catalog_root, missing_pattern, int(missing_min_files))
+                    st.write(f"{len(missing)} sample(s) without {missing_min_files}+ file(s) in '{missing_pattern}':")
+                    st.text(", ".join(missing) if missing else "(none)")
+
 # Tab 5: Line Scaling
 with tab5:
     st.subheader("Line Scaling Tool")
@@ -1604,6 +1699,165 @@ with tab5:
         new_width = st.number_input("New Width (mm)", value=650, step=50, key="new_width_ls")
         new_height = st.number_input("New Height (mm)", value=550, step=50, key="new_height_ls")
 
+    col_mode1, col_mode2 = st.columns(2)
+    with col_mode1:
+        scale_mode_label = st.selectbox("Scaling Mode", list(SCALE_MODE_LABELS), key="scale_mode_ls")
+        scale_mode = SCALE_MODE_LABELS[scale_mode_label]
+        if scale_mode == "margin":
+            col_margin1, col_margin2 = st.columns(2)
+            with col_margin1:
+                margin_x = st.number_input("X Margin (mm)", min_value=0.0, value=0.0, step=5.0, key="margin_x_ls")
+            with col_margin2:
+                margin_y = st.number_input("Y Margin (mm)", min_value=0.0, value=0.0, step=5.0, key="margin_y_ls")
+        else:
+            margin_x, margin_y = 0.0, 0.0
+    with col_mode2:
+        preserve_label = st.selectbox(
+            "Speed / Timing Recalculation", list(PRESERVE_MODE_LABELS), key="preserve_mode_ls",
+            help="Preserve time scales speed with line length. Preserve pulse spacing also rescales T cycle/T pulse so pulses stay the same distance apart."
+        )
+        preserve_mode = PRESERVE_MODE_LABELS[preserve_label]
+
+    col_render1, col_render2 = st.columns(2)
+    with col_render1:
+        render_mode_label = st.selectbox(
+            "Rendering Mode", ["Auto", "Per line", "LineCollection"], key="render_mode_ls",
+            help=f"Auto uses a single LineCollection above {COLLECTION_RENDER_MIN_SEGMENTS} segments."
+        )
+        render_mode = {"Auto": "auto", "Per line": "per_line", "LineCollection": "collection"}[render_mode_label]
+    with col_render2:
+        decimate_threshold = st.number_input(
+            "Decimate above (segments)", min_value=0, value=LOD_DECIMATE_THRESHOLD, step=1000, key="decimate_threshold_ls",
+            help="LineCollection mode reduces lines to the visible pixel resolution above this segment count."
+        )
+
+    col_motion1, col_motion2 = st.columns(2)
+    with col_motion1:
+        rapid_speed = st.number_input("Rapid (idle) Speed (mm/s)", min_value=1.0, value=DEFAULT_RAPID_SPEED, step=50.0, key="rapid_speed_ls")
+    with col_motion2:
+        acceleration = st.number_input(
+            "Acceleration (mm/s², 0 = ignore)", min_value=0.0, value=0.0, step=500.0, key="acceleration_ls",
+            help="When set, move times use trapezoidal acceleration-limited profiles."
+        )
+
+    # Streaming import/export for toolpaths too large for the table editor
+    with st.expander("Toolpath Files (CSV, NPY, G-code)"):
+        st.caption("Files are processed chunk by chunk on the server, so large toolpaths never have to fit in the table below.")
+        toolpath_src = st.text_input("Source toolpath file", placeholder="e.g., C:\\toolpaths\\imprint.gcode", key="toolpath_src_ls")
+        toolpath_dst = st.text_input("Destination file for scaled toolpath", placeholder="e.g., C:\\toolpaths\\imprint_scaled.npy", key="toolpath_dst_ls")
+
+        col_tp1, col_tp2, col_tp3 = st.columns(3)
+        with col_tp1:
+            if st.button("Scale File to Disk", key="toolpath_scale_file_btn"):
+                if not toolpath_src or not os.path.isfile(toolpath_src):
+                    st.error("Please enter an existing source toolpath file.")
+                elif not toolpath_dst:
+                    st.error("Please enter a destination file path.")
+                else:
+                    try:
+                        start_time = time.perf_counter()
+                        with st.spinner("Scaling toolpath..."):
+                            rows_written = scale_toolpath_file(
+                                toolpath_src, toolpath_dst, (old_width, old_height), (new_width, new_height),
+                                mode=scale_mode, margin=(margin_x, margin_y), preserve=preserve_mode
+                            )
+                        st.success(f"Scaled {rows_written:,} segments to {toolpath_dst} in {time.perf_counter() - start_time:.2f}s")
+                    except Exception as e:
+                        st.error(f"Error scaling toolpath file: {e}")
+        with col_tp2:
+            if st.button(f"Load into Table (first {TOOLPATH_TABLE_MAX_ROWS} lines)", key="toolpath_load_btn"):
+                if not toolpath_src or not os.path.isfile(toolpath_src):
+                    st.error("Please enter an existing source toolpath file.")
+                else:
+                    try:
+                        loaded = read_toolpath(toolpath_src, max_rows=TOOLPATH_TABLE_MAX_ROWS)
+                        st.session_state.lines = array_to_lines(loaded.lines)
+                        st.session_state.speed = np.nan_to_num(loaded.speed).tolist()
+                        st.session_state.t_cycle = np.nan_to_num(loaded.t_cycle).astype(int).tolist()
+                        st.session_state.t_pulse = np.nan_to_num(loaded.t_pulse).astype(int).tolist()
+                        st.rerun()
+                    except Exception as e:
+                        st.error(f"Error loading toolpath file: {e}")
+        with col_tp3:
+            if st.button("Save Table to Destination", key="toolpath_save_btn"):
+                if not toolpath_dst:
+                    st.error("Please enter a destination file path.")
+                else:
+                    try:
+                        with open_toolpath_writer(toolpath_dst) as writer:
+                            writer.write(ToolpathChunk(
+                                lines_to_array(st.session_state.lines),
+                                np.asarray(st.session_state.speed, dtype=np.float64),
+                                np.asarray(st.session_state.t_cycle, dtype=np.float64),
+                                np.asarray(st.session_state.t_pulse, dtype=np.float64),
+                            ))
+                        st.success(f"Saved {writer.rows_written} lines to {toolpath_dst}")
+                    except Exception as e:
+                        st.error(f"Error saving toolpath file: {e}")
+
+    # Rank many candidate working areas at once instead of retyping the new width/height
+    with st.expander("Working Area Sweep"):
+        st.caption("Scales the current lines into every candidate area with the mode and recalculation chosen above, then ranks by out-of-bounds lines and cycle time.")
+        col_sweep1, col_sweep2 = st.columns(2)
+        with col_sweep1:
+            sweep_w_min = st.number_input("Min Width (mm)", min_value=1.0, value=400.0, step=50.0, key="sweep_w_min_ls")
+            sweep_w_max = st.number_input("Max Width (mm)", min_value=1.0, value=1300.0, step=50.0, key="sweep_w_max_ls")
+            sweep_w_steps = st.number_input("Width Steps", min_value=1, value=10, step=1, key="sweep_w_steps_ls")
+        with col_sweep2:
+            sweep_h_min = st.number_input("Min Height (mm)", min_value=1.0, value=300.0, step=50.0, key="sweep_h_min_ls")
+            sweep_h_max = st.number_input("Max Height (mm)", min_value=1.0, value=1100.0, step=50.0, key="sweep_h_max_ls")
+            sweep_h_steps = st.number_input("Height Steps", min_value=1, value=10, step=1, key="sweep_h_steps_ls")
+        if st.button("Run Sweep", key="sweep_run_btn"):
+            if not st.session_state.lines:
+                st.warning("No lines to scale. Please add lines in the table below.")
+            else:
+                try:
+                    start_time = time.perf_counter()
+                    sweep_results = sweep_working_areas(
+                        st.session_state.lines, (old_width, old_height),
+                        candidate_areas(np.linspace(sweep_w_min, sweep_w_max, int(sweep_w_steps)),
+                                        np.linspace(sweep_h_min, sweep_h_max, int(sweep_h_steps))),
+                        st.session_state.speed, mode=scale_mode, margin=(margin_x, margin_y), preserve=preserve_mode,
+                        rapid_speed=rapid_speed, acceleration=acceleration
+                    )
+                    st.write(f"Ranked {len(sweep_results):,} candidate areas in {time.perf_counter() - start_time:.2f}s (top 100 shown).")
+                    st.dataframe(sweep_results.head(100).style.format(precision=2))
+                    st.download_button(
+                        "📥 Download Full Ranking (CSV)", data=sweep_results.to_csv(index=False),
+                        file_name="working_area_sweep.csv", mime="text/csv", key="sweep_download_btn"
+                    )
+                except Exception as e:
+                    st.error(f"Error during sweep: {e}")
+
+    # Reorder segments to cut idle travel between the end of one line and the start of the next
+    with st.expander("Optimize Segment Order"):
+        col_order1, col_order2 = st.columns(2)
+        with col_order1:
+            order_allow_flip = st.checkbox("Allow reversing line direction", value=True, key="order_allow_flip_ls")
+        with col_order2:
+            order_time_budget = st.number_input("Time budget (s)", min_value=0.1, value=DEFAULT_TIME_BUDGET, step=1.0, key="order_time_budget_ls")
+        if st.button("Optimize Order", key="order_optimize_btn"):
+            if len(st.session_state.lines) < 2:
+                st.info("At least two lines are needed to reorder.")
+            else:
+                with st.spinner("Optimizing segment order..."):
+                    order_result = optimize_segment_order(st.session_state.lines, allow_flip=order_allow_flip, time_budget=order_time_budget)
+                saved = order_result.original_travel - order_result.optimized_travel
+                if saved > 0:
+                    order_idx = order_result.order
+                    st.session_state.lines = array_to_lines(apply_order(st.session_state.lines, order_idx, order_result.flipped))
+                    st.session_state.speed = [st.session_state.speed[i] for i in order_idx]
+                    st.session_state.t_cycle = [st.session_state.t_cycle[i] for i in order_idx]
+                    st.session_state.t_pulse = [st.session_state.t_pulse[i] for i in order_idx]
+                st.session_state.order_result_message = (
+                    f"Idle travel {order_result.original_travel:,.1f} mm → {order_result.optimized_travel:,.1f} mm "
+                    f"(saved {saved:,.1f} mm, {saved / order_result.original_travel * 100 if order_result.original_travel else 0:.1f}%) "
+                    f"in {order_result.elapsed:.2f}s with {order_result.two_opt_moves} 2-opt moves."
+                )
+                st.rerun()
+        if st.session_state.get('order_result_message'):
+            st.success(st.session_state.order_result_message)
+
     # Create input for lines and parameters
     st.subheader("Line Parameters")
     
@@ -1683,7 +1937,7 @@ with tab5:
             new_area = (new_width, new_height)
             
             try:
-                scaled_lines = scale_lines(st.session_state.lines, old_area, new_area)
+                scaled_lines = scale_lines(st.session_state.lines, old_area, new_area, mode=scale_mode, margin=(margin_x, margin_y))
             except Exception as e:
                 st.error(f"Error during scaling: {e}")
                 st.stop()
@@ -1691,61 +1945,138 @@ with tab5:
             # Create visualization
             col_viz1, col_viz2 = st.columns(2)
             
+            # Rendered PNGs are cached process-wide by geometry hash; figures are closed once rasterized
+            line_figure_cache = get_line_figure_cache()
             with col_viz1:
                 st.subheader("Original Lines")
-                fig_original = draw_lines(st.session_state.lines, old_area, title="Original Lines", colors_list=PLOT_COLORS)
-                st.pyplot(fig_original)
+                original_key = geometry_hash(st.session_state.lines, old_area, PLOT_COLORS, "Original Lines", render_mode, decimate_threshold)
+                png_original = line_figure_cache.get_or_render(
+                    original_key,
+                    lambda: draw_lines(st.session_state.lines, old_area, title="Original Lines", colors_list=PLOT_COLORS,
+                                       mode=render_mode, decimate_threshold=decimate_threshold)
+                )
+                st.image(png_original, use_column_width=True)
                 
             with col_viz2:
                 st.subheader("Scaled Lines")
-                fig_scaled = draw_lines(scaled_lines, new_area, title="Scaled Lines", colors_list=PLOT_COLORS)
-                st.pyplot(fig_scaled)
+                scaled_key = geometry_hash(scaled_lines, new_area, PLOT_COLORS, "Scaled Lines", render_mode, decimate_threshold)
+                png_scaled = line_figure_cache.get_or_render(
+                    scaled_key,
+                    lambda: draw_lines(scaled_lines, new_area, title="Scaled Lines", colors_list=PLOT_COLORS,
+                                       mode=render_mode, decimate_threshold=decimate_threshold)
+                )
+                st.image(png_scaled, use_column_width=True)
+
+            with st.expander("Render cache statistics"):
+                cache_stats = line_figure_cache.stats()
+                memory_bytes = cache_stats["process_memory_bytes"]
+                stat_col1, stat_col2, stat_col3, stat_col4 = st.columns(4)
+                stat_col1.metric("Cached figures", f"{cache_stats['entries']} ({cache_stats['cached_bytes'] / 1024:.0f} KB)")
+                stat_col2.metric("Hits / Renders", f"{cache_stats['hits']} / {cache_stats['renders']}")
+                stat_col3.metric("Open Matplotlib figures", cache_stats["open_figures"])
+                stat_col4.metric("Process memory", f"{memory_bytes / (1024 * 1024):.0f} MB" if memory_bytes else "N/A")
 
             # Display scaled results
             st.subheader("Scaled Line Parameters")
             
-            scaled_results_data = []
-            for i, (original_line, scaled_line_coords) in enumerate(zip(st.session_state.lines, scaled_lines)):
-                line_color = PLOT_COLORS[i % len(PLOT_COLORS)]
-                scaled_results_data.append({
-                    "Line": f"Line {i+1}",
-                    "Original X start": round(original_line[0][0], 2),
-                    "Original Y start": round(original_line[0][1], 2),
-                    "Original X end": round(original_line[1][0], 2),
-                    "Original Y end": round(original_line[1][1], 2),
-                    "Scaled X start": round(scaled_line_coords[0][0], 2),
-                    "Scaled Y start": round(scaled_line_coords[0][1], 2),
-                    "Scaled X end": round(scaled_line_coords[1][0], 2),
-                    "Scaled Y end": round(scaled_line_coords[1][1], 2),
-                    "Speed (mm/s)": round(st.session_state.speed[i], 2),
-                    "T cycle (ms)": st.session_state.t_cycle[i],
-                    "T pulse (ms)": st.session_state.t_pulse[i],
-                    "Color": line_color
-                })
-            df_scaled_results = pd.DataFrame(scaled_results_data)
-            
-            # Apply styling to highlight out-of-bounds coordinates and format numbers
-            if not df_scaled_results.empty:
-                styled_df = df_scaled_results.style.apply(
-                    highlight_out_of_bounds_styler, 
-                    new_w=new_width, 
-                    new_h=new_height, 
-                    axis=1,
-                    subset=['Scaled X start', 'Scaled Y start', 'Scaled X end', 'Scaled Y end']
-                ).format({
-                    'Original X start': '{:.2f}',
-                    'Original Y start': '{:.2f}',
-                    'Original X end': '{:.2f}',
-                    'Original Y end': '{:.2f}',
-                    'Scaled X start': '{:.2f}',
-                    'Scaled Y start': '{:.2f}',
-                    'Scaled X end': '{:.2f}',
-                    'Scaled Y end': '{:.2f}',
-                    'Speed (mm/s)': '{:.2f}'
-                })
-                st.dataframe(styled_df)
-            else:
+            original_arr = lines_to_array(st.session_state.lines)
+            scaled_arr = lines_to_array(scaled_lines)
+            line_count = len(original_arr)
+            speed_arr = np.asarray(st.session_state.speed, dtype=np.float64)
+            t_cycle_arr = np.asarray(st.session_state.t_cycle, dtype=np.float64)
+            t_pulse_arr = np.asarray(st.session_state.t_pulse, dtype=np.float64)
+            scaled_speed, scaled_t_cycle, scaled_t_pulse = rescale_process_parameters(
+                original_arr, scaled_arr, speed_arr, t_cycle_arr, t_pulse_arr, preserve=preserve_mode
+            )
+            df_scaled_results = pd.DataFrame({
+                "Line": [f"Line {i+1}" for i in range(line_count)],
+                "Original X start": original_arr[:, 0, 0].round(2),
+                "Original Y start": original_arr[:, 0, 1].round(2),
+                "Original X end": original_arr[:, 1, 0].round(2),
+                "Original Y end": original_arr[:, 1, 1].round(2),
+                "Scaled X start": scaled_arr[:, 0, 0].round(2),
+                "Scaled Y start": scaled_arr[:, 0, 1].round(2),
+                "Scaled X end": scaled_arr[:, 1, 0].round(2),
+                "Scaled Y end": scaled_arr[:, 1, 1].round(2),
+                "Speed (mm/s)": np.round(np.asarray(st.session_state.speed, dtype=np.float64), 2),
+                "T cycle (ms)": st.session_state.t_cycle,
+                "T pulse (ms)": st.session_state.t_pulse,
+                "Scaled Speed (mm/s)": np.round(scaled_speed, 2),
+                "Scaled T cycle (ms)": np.round(scaled_t_cycle, 2),
+                "Scaled T pulse (ms)": np.round(scaled_t_pulse, 2),
+                "Color": np.asarray(PLOT_COLORS, dtype=object)[np.arange(line_count) % len(PLOT_COLORS)],
+            })
+
+            # Motion-time and throughput estimates for original vs scaled lines
+            original_metrics = toolpath_metrics(original_arr, speed_arr, t_cycle_arr, t_pulse_arr, rapid_speed=rapid_speed, acceleration=acceleration)
+            scaled_metrics = toolpath_metrics(scaled_arr, scaled_speed, scaled_t_cycle, scaled_t_pulse, rapid_speed=rapid_speed, acceleration=acceleration)
+
+            def metric_delta(key, fmt):
+                if not original_metrics[key]:
+                    return None
+                return fmt.format(scaled_metrics[key] - original_metrics[key])
+
+            metric_cols = st.columns(5)
+            metric_cols[0].metric("Path Length (mm)", f"{scaled_metrics['path_length_mm']:,.1f}", metric_delta('path_length_mm', "{:,.1f}"))
+            metric_cols[1].metric("Cutting Time (s)", f"{scaled_metrics['cutting_time_s']:,.2f}", metric_delta('cutting_time_s', "{:,.2f}"))
+            metric_cols[2].metric("Idle Travel Time (s)", f"{scaled_metrics['idle_time_s']:,.2f}", metric_delta('idle_time_s', "{:,.2f}"))
+            metric_cols[3].metric("Est. Cycle Time (s)", f"{scaled_metrics['cycle_time_s']:,.2f}", metric_delta('cycle_time_s', "{:,.2f}"))
+            metric_cols[4].metric("Pulses", f"{scaled_metrics['pulse_count']:,}", metric_delta('pulse_count', "{:,}"))
+            st.caption(
+                f"Scaled values, with the change from the original lines "
+                f"(original cycle time {original_metrics['cycle_time_s']:,.2f} s, {original_metrics['pulse_count']:,} pulses)."
+            )
+            if scaled_metrics["invalid_segments"]:
+                st.warning(f"{scaled_metrics['invalid_segments']} lines have no positive speed and are excluded from the time estimates.")
+
+            # Out-of-bounds check on the rounded values shown in the table, in one vectorized pass
+            oob_mask = out_of_bounds_mask(df_scaled_results[SCALED_COORD_COLUMNS].to_numpy(dtype=np.float64).reshape(-1, 2, 2), new_area)
+            oob_summary = out_of_bounds_summary(oob_mask, columns=SCALED_COORD_COLUMNS)
+            oob_rows = oob_summary["rows"]
+            if len(oob_rows):
+                st.warning(
+                    f"{len(oob_rows)} of {line_count} lines fall outside the new working area: "
+                    + ", ".join(f"{column}: {oob_summary[column]['count']}" for column in SCALED_COORD_COLUMNS)
+                )
+
+            number_formats = {
+                'Original X start': '{:.2f}',
+                'Original Y start': '{:.2f}',
+                'Original X end': '{:.2f}',
+                'Original Y end': '{:.2f}',
+                'Scaled X start': '{:.2f}',
+                'Scaled Y start': '{:.2f}',
+                'Scaled X end': '{:.2f}',
+                'Scaled Y end': '{:.2f}',
+                'Speed (mm/s)': '{:.2f}',
+                'Scaled Speed (mm/s)': '{:.2f}',
+                'Scaled T cycle (ms)': '{:.2f}',
+                'Scaled T pulse (ms)': '{:.2f}'
+            }
+
+            def style_scaled_results(df_to_style):
+                # Apply styling to highlight out-of-bounds coordinates and format numbers
+                return df_to_style.style.apply(
+                    highlight_out_of_bounds,
+                    new_w=new_width,
+                    new_h=new_height,
+                    axis=None,
+                    subset=SCALED_COORD_COLUMNS
+                ).format(number_formats)
+
+            if df_scaled_results.empty:
                 st.dataframe(df_scaled_results) # Show empty dataframe if no results
+            elif line_count <= STYLED_ROW_LIMIT:
+                st.dataframe(style_scaled_results(df_scaled_results))
+            else:
+                # Styling every row of a large table dominates render time: only style the offending rows
+                if len(oob_rows):
+                    st.write(f"Out-of-bounds lines ({len(oob_rows)}):")
+                    st.dataframe(style_scaled_results(df_scaled_results.iloc[oob_rows[:STYLED_ROW_LIMIT]]))
+                    if len(oob_rows) > STYLED_ROW_LIMIT:
+                        st.caption(f"Showing the first {STYLED_ROW_LIMIT} out-of-bounds lines.")
+                st.write("All lines:")
+                st.dataframe(df_scaled_results)
 
 # Add a footer with timestamp
 st.markdown("---")
@@ -0,0 +1,355 @@
+import csv
+import os
+import re
+import shutil
+import tempfile
+from abc import ABC, abstractmethod
+from collections import namedtuple
+from itertools import islice
+
+import numpy as np
+
+from kinematics import rescale_process_parameters
+from line_geometry import lines_to_array, scale_lines_to_areas
+
+# Streaming import/export of line-segment toolpaths for the Line Scaling tool.
+# Files are read and written chunk by chunk, so memory stays bounded by the chunk size
+# no matter how large the toolpath is. Supported formats:
+#   - CSV with a header row (x1, y1, x2, y2, speed, t_cycle, t_pulse)
+#   - .npy holding a float64 (N, 7) array in the same column order, read memory-mapped
+#     (a plain (N, 2, 2) lines array is accepted on input too)
+#   - A G-code subset: G0/G1 moves with absolute X/Y and feed F (mm/min). G1 moves are
+#     segments; t_cycle/t_pulse travel in a "; t_cycle=.. t_pulse=.." trailing comment.
+#     Any other G code (arcs, G91 relative, G20 inches, ...) is rejected, not approximated.
+
+DEFAULT_CHUNK_SIZE = 100_000
+TOOLPATH_COLUMNS = ("x1", "y1", "x2", "y2", "speed", "t_cycle", "t_pulse")
+TOOLPATH_FORMATS = {".csv": "csv", ".npy": "npy", ".gcode": "gcode", ".nc": "gcode", ".ngc": "gcode", ".gc": "gcode"}
+
+# One chunk of a toolpath: lines is (n, 2, 2); speed (mm/s), t_cycle and t_pulse (ms) are (n,)
+ToolpathChunk = namedtuple("ToolpathChunk", ["lines", "speed", "t_cycle", "t_pulse"])
+
+_GCODE_WORD = re.compile(r"([GXYF])\s*([-+]?(?:\d+\.?\d*|\.\d+))", re.IGNORECASE)
+_GCODE_PARAM = re.compile(r"(t_cycle|t_pulse)\s*=\s*([-+]?(?:\d+\.?\d*|\.\d+))", re.IGNORECASE)
+_GCODE_SUPPORTED = (0, 1, 21, 90)  # Rapid, linear move, millimetres, absolute coordinates
+_NPY_HEADER_SIZE = 128  # Fixed so the header can be rewritten with the final row count
+
+
+def toolpath_format(path, fmt=None):
+    """
+    Returns "csv", "npy" or "gcode" for path, from fmt if given or else the file extension.
+    """
+    if fmt:
+        if fmt not in ("csv", "npy", "gcode"):
+            raise ValueError(f"Unsupported toolpath format '{fmt}'.")
+        return fmt
+    ext = os.path.splitext(str(path))[1].lower()
+    if ext not in TOOLPATH_FORMATS:
+        raise ValueError(f"Cannot infer toolpath format from extension '{ext}'. Use one of: {', '.join(TOOLPATH_FORMATS)}")
+    return TOOLPATH_FORMATS[ext]
+
+
+def chunk_from_columns(columns):
+    """
+    Builds a ToolpathChunk from an (n, 7) array in TOOLPATH_COLUMNS order.
+    """
+    columns = np.asarray(columns, dtype=np.float64)
+    return ToolpathChunk(columns[:, :4].reshape(-1, 2, 2), columns[:, 4], columns[:, 5], columns[:, 6])
+
+
+def chunk_to_columns(chunk):
+    """
+    Flattens a ToolpathChunk into an (n, 7) float64 array in TOOLPATH_COLUMNS order.
+    """
+    lines = lines_to_array(chunk.lines)
+    return np.column_stack([lines.reshape(-1, 4), chunk.speed, chunk.t_cycle, chunk.t_pulse]).astype(np.float64, copy=False)
+
+
+def read_toolpath_chunks(path, chunk_size=DEFAULT_CHUNK_SIZE, fmt=None):
+    """
+    Streams a toolpath file as ToolpathChunk objects of at most chunk_size segments.
+
+    Missing speed/t_cycle/t_pulse values come through as NaN.
+    """
+    fmt = toolpath_format(path, fmt)
+    if fmt == "csv":
+        return _read_csv_chunks(path, chunk_size)
+    if fmt == "npy":
+        return _read_npy_chunks(path, chunk_size)
+    return _read_gcode_chunks(path, chunk_size)
+
+
+def _read_csv_chunks(path, chunk_size):
+    with open(path, newline="") as f:
+        reader = csv.reader(f)
+        header = [name.strip().lower() for name in next(reader, [])]
+        missing = [name for name in TOOLPATH_COLUMNS[:4] if name not in header]
+        if missing:
+            raise ValueError(f"CSV toolpath '{path}' is missing columns: {', '.join(missing)}")
+        # Column index per field, -1 for optional fields that are absent
+        positions = [header.index(name) if name in header else -1 for name in TOOLPATH_COLUMNS]
+        while True:
+            rows = []
+            line_nums = []
+            for row in islice(reader, chunk_size):
+                if not row:
+                    continue
+                if len(row) != len(header):
+                    raise ValueError(f"CSV toolpath '{path}' line {reader.line_num}: expected {len(header)} columns, got {len(row)}")
+                rows.append([value if value.strip() else "nan" for value in row])
+                line_nums.append(reader.line_num)
+            if not rows:
+                return
+            try:
+                raw = np.array(rows, dtype=np.float64)
+            except ValueError:
+                _raise_bad_csv_value(path, rows, line_nums, header)
+            columns = np.full((len(raw), len(TOOLPATH_COLUMNS)), np.nan)
+            for out_idx, in_idx in enumerate(positions):
+                if in_idx >= 0:
+                    columns[:, out_idx] = raw[:, in_idx]
+            yield chunk_from_columns(columns)
+
+
+def _raise_bad_csv_value(path, rows, line_nums, header):
+    # Only reached when a chunk fails to convert, so the row-by-row search costs nothing normally
+    for row, line_num in zip(rows, line_nums):
+        for name, value in zip(header, row):
+            try:
+                float(value)
+            except ValueError:
+                raise ValueError(f"CSV toolpath '{path}' line {line_num}: column '{name}' is not a number: {value!r}") from None
+    raise ValueError(f"CSV toolpath '{path}' has a value that is not a number")
+
+
+def _read_npy_chunks(path, chunk_size):
+    data = np.load(path, mmap_mode="r")
+    if data.ndim == 3 and data.shape[1:] == (2, 2):
+        data = data.reshape(len(data), 4)
+    if data.ndim != 2 or data.shape[1] not in (4, len(TOOLPATH_COLUMNS)):
+        raise ValueError(f"NPY toolpath '{path}' must be (N, 2, 2), (N, 4) or (N, 7), got {data.shape}")
+    for start in range(0, len(data), chunk_size):
+        # Only this slice is paged in from disk
+        block = np.asarray(data[start:start + chunk_size], dtype=np.float64)
+        if block.shape[1] == 4:
+            block = np.column_stack([block, np.full((len(block), 3), np.nan)])
+        yield chunk_from_columns(block)
+
+
+def _read_gcode_chunks(path, chunk_size):
+    x = y = 0.0
+    feed = np.nan
+    motion = None
+    rows = []
+    with open(path) as f:
+        for line_num, raw_line in enumerate(f, 1):
+            code, _, comment = raw_line.partition(";")
+            code = re.sub(r"\(.*?\)", "", code)
+            words = _GCODE_WORD.findall(code)
+            if not words:
+                continue
+            new_x, new_y = x, y
+            for letter, value in words:
+                letter = letter.upper()
+                if letter == "G":
+                    g = float(value)
+                    if g not in _GCODE_SUPPORTED:
+                        raise ValueError(f"G-code toolpath '{path}' line {line_num}: G{value} is not supported "
+                                         f"(only G0/G1 moves in G21 millimetres and G90 absolute coordinates)")
+                    if g in (0, 1):
+                        motion = int(g)
+                elif letter == "X":
+                    new_x = float(value)
+                elif letter == "Y":
+                    new_y = float(value)
+                elif letter == "F":
+                    feed = float(value) / 60.0  # mm/min -> mm/s
+            if motion == 1 and (new_x, new_y) != (x, y):
+                params = {name.lower(): float(value) for name, value in _GCODE_PARAM.findall(comment)}
+                rows.append((x, y, new_x, new_y, feed, params.get("t_cycle", np.nan), params.get("t_pulse", np.nan)))
+                if len(rows) >= chunk_size:
+                    yield chunk_from_columns(rows)
+                    rows = []
+            x, y = new_x, new_y
+    if rows:
+        yield chunk_from_columns(rows)
+
+
+class ToolpathWriter(ABC):
+    """
+    Streaming toolpath writer. Use open_toolpath_writer() to get one for a path.
+
+    Call write() with each ToolpathChunk and close() (or use it as a context manager)
+    when done; rows_written counts the segments written so far.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.rows_written = 0
+        self._file = None
+
+    def write(self, chunk):
+        columns = chunk_to_columns(chunk)
+        if len(columns):
+            self._write_columns(columns)
+            self.rows_written += len(columns)
+
+    @abstractmethod
+    def _write_columns(self, columns):
+        """Writes an (n, 7) float64 array of segments in TOOLPATH_COLUMNS order."""
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class CsvToolpathWriter(ToolpathWriter):
+    def __init__(self, path):
+        super().__init__(path)
+        self._file = open(path, "w", newline="")
+        self._file.write(",".join(TOOLPATH_COLUMNS) + "\n")
+
+    def _write_columns(self, columns):
+        np.savetxt(self._file, columns, delimiter=",", fmt="%.10g")
+
+
+class NpyToolpathWriter(ToolpathWriter):
+    """
+    Writes an (N, 7) float64 .npy file without knowing N up front: a fixed-size header is
+    reserved, rows are appended as raw float64, and the header is rewritten on close.
+    """
+
+    def __init__(self, path):
+        super().__init__(path)
+        self._file = open(path, "wb")
+        self._write_header(0)
+
+    def _write_header(self, rows):
+        header = "{'descr': '<f8', 'fortran_order': False, 'shape': (%d, %d), }" % (rows, len(TOOLPATH_COLUMNS))
+        magic = np.lib.format.magic(1, 0)
+        padding = _NPY_HEADER_SIZE - len(magic) - 2 - len(header) - 1
+        self._file.seek(0)
+        self._file.write(magic + np.uint16(len(header) + padding + 1).tobytes() + (header + " " * padding + "\n").encode("latin1"))
+
+    def _write_columns(self, columns):
+        self._file.write(np.ascontiguousarray(columns, dtype="<f8").tobytes())
+
+    def close(self):
+        if self._file is not None:
+            self._write_header(self.rows_written)
+        super().close()
+
+
+class GcodeToolpathWriter(ToolpathWriter):
+    """
+    Writes G1 moves for each segment, with a G0 rapid to its start whenever the previous
+    segment ended elsewhere.
+    """
+
+    def __init__(self, path):
+        super().__init__(path)
+        self._file = open(path, "w")
+        self._file.write("G21 ; mm\nG90 ; absolute coordinates\n")
+        self._position = None
+
+    def _write_columns(self, columns):
+        out = []
+        for x1, y1, x2, y2, speed, t_cycle, t_pulse in columns.tolist():
+            if self._position != (x1, y1):
+                out.append(f"G0 X{x1:.4f} Y{y1:.4f}\n")
+            move = f"G1 X{x2:.4f} Y{y2:.4f}"
+            if speed == speed:  # Not NaN
+                move += f" F{speed * 60.0:.4f}"
+            params = [f"{name}={value:g}" for name, value in (("t_cycle", t_cycle), ("t_pulse", t_pulse)) if value == value]
+            if params:
+                move += " ; " + " ".join(params)
+            out.append(move + "\n")
+            self._position = (x2, y2)
+        self._file.writelines(out)
+
+
+def open_toolpath_writer(path, fmt=None):
+    """
+    Returns a ToolpathWriter for path, choosing the format from fmt or the file extension.
+    """
+    fmt = toolpath_format(path, fmt)
+    if fmt == "csv":
+        return CsvToolpathWriter(path)
+    if fmt == "npy":
+        return NpyToolpathWriter(path)
+    return GcodeToolpathWriter(path)
+
+
+def transform_toolpath_file(src_path, dst_path, transform, chunk_size=DEFAULT_CHUNK_SIZE, src_fmt=None, dst_fmt=None):
+    """
+    Streams src_path through transform and writes the result to dst_path.
+
+    The output goes to a temporary file next to dst_path that replaces it only once every
+    chunk is written, so dst_path may be src_path and a failed run leaves dst_path as it was.
+
+    Args:
+        transform: Function taking a ToolpathChunk and returning a ToolpathChunk.
+
+    Returns:
+        int: The number of segments written.
+    """
+    dst_fmt = toolpath_format(dst_path, dst_fmt)
+    fd, tmp_path = tempfile.mkstemp(suffix=".tmp", prefix=os.path.basename(dst_path) + ".",
+                                    dir=os.path.dirname(os.path.abspath(dst_path)))
+    os.close(fd)
+    try:
+        # mkstemp creates the file owner-only; give it the permissions dst_path has (or a file's usual)
+        if os.path.exists(dst_path):
+            shutil.copymode(dst_path, tmp_path)
+        else:
+            os.chmod(tmp_path, 0o644)
+        with open_toolpath_writer(tmp_path, dst_fmt) as writer:
+            for chunk in read_toolpath_chunks(src_path, chunk_size, src_fmt):
+                writer.write(transform(chunk))
+        os.replace(tmp_path, dst_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return writer.rows_written
+
+
+def scale_toolpath_file(src_path, dst_path, old_area, new_area, chunk_size=DEFAULT_CHUNK_SIZE, src_fmt=None, dst_fmt=None,
+                        mode="stretch", margin=(0.0, 0.0), preserve="none"):
+    """
+    Scales every segment of a toolpath file from old_area to new_area, chunk by chunk.
+
+    mode and margin are as in line_geometry.scale_lines_to_areas; preserve is as in
+    kinematics.rescale_process_parameters (by default speed and timing are carried through).
+    """
+    def scale_chunk(chunk):
+        scaled = scale_lines_to_areas(chunk.lines, old_area, new_area, mode=mode, margin=margin)
+        speed, t_cycle, t_pulse = rescale_process_parameters(chunk.lines, scaled, chunk.speed, chunk.t_cycle, chunk.t_pulse, preserve)
+        return ToolpathChunk(scaled, speed, t_cycle, t_pulse)
+
+    return transform_toolpath_file(src_path, dst_path, scale_chunk, chunk_size=chunk_size, src_fmt=src_fmt, dst_fmt=dst_fmt)
+
+
+def read_toolpath(path, max_rows=None, fmt=None):
+    """
+    Reads a whole toolpath into a single ToolpathChunk, stopping after max_rows segments if given.
+    Intended for files small enough to edit in the Line Scaling table.
+    """
+    chunks = []
+    total = 0
+    for chunk in read_toolpath_chunks(path, min(DEFAULT_CHUNK_SIZE, max_rows or DEFAULT_CHUNK_SIZE), fmt):
+        chunks.append(chunk_to_columns(chunk))
+        total += len(chunk.speed)
+        if max_rows is not None and total >= max_rows:
+            break
+    if not chunks:
+        return chunk_from_columns(np.empty((0, len(TOOLPATH_COLUMNS))))
+    columns = np.concatenate(chunks)
+    return chunk_from_columns(columns[:max_rows] if max_rows is not None else columns)